@@ -1,6 +1,45 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
+import importlib
+from typing import TYPE_CHECKING
 
 from ._version import VERSION as __version__
-from .client import KustoClient, KustoConnectionStringBuilder, ClientRequestProperties
-from .data_format import DataFormat
+
+if TYPE_CHECKING:
+    from ._concurrency import AdaptiveConcurrencyLimiter
+    from ._export import ExportFormat
+    from ._hedging import HedgingPolicy
+    from ._models import ConversionOverrides, tuple_row, namedtuple_row, dict_row
+    from .client import KustoClient, KustoConnectionStringBuilder, ClientRequestProperties
+    from .data_format import DataFormat
+
+# The public names are imported from their modules on first access, so that importing the package (or one of its lightweight modules, such as
+# `data_format`) doesn't pull in the HTTP and authentication libraries.
+_LAZY_EXPORTS = {
+    "AdaptiveConcurrencyLimiter": "._concurrency",
+    "ExportFormat": "._export",
+    "HedgingPolicy": "._hedging",
+    "ConversionOverrides": "._models",
+    "tuple_row": "._models",
+    "namedtuple_row": "._models",
+    "dict_row": "._models",
+    "KustoClient": ".client",
+    "KustoConnectionStringBuilder": ".client",
+    "ClientRequestProperties": ".client",
+    "DataFormat": ".data_format",
+}
+
+__all__ = ["__version__"] + list(_LAZY_EXPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
@@ -0,0 +1,180 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import time
+from collections import deque
+from threading import Condition, Lock
+from typing import Optional, Dict, Deque, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits the number of in-flight requests sent to a Kusto cluster, adapting the limit to the feedback of the service (AIMD).
+    Every healthy response grows the limit additively (by roughly one request per round trip), while a throttled (429) response,
+    or a response that took much longer than the recent average, shrinks it multiplicatively.
+    A single limiter can be shared by several clients, either explicitly or via `AdaptiveConcurrencyLimiter.for_cluster`.
+    """
+
+    _shared_limiters: Dict[str, "AdaptiveConcurrencyLimiter"] = {}
+    _shared_limiters_lock = Lock()
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        backoff_ratio: float = 0.5,
+        latency_tolerance: Optional[float] = 2.0,
+        latency_smoothing: float = 0.1,
+        min_backoff_interval_seconds: float = 1.0,
+    ):
+        """
+        :param int initial_limit: The number of concurrent requests allowed before any feedback was received.
+        :param int min_limit: The limit will never shrink below this value.
+        :param int max_limit: The limit will never grow above this value.
+        :param float backoff_ratio: The factor the limit is multiplied by when congestion is detected.
+        :param float latency_tolerance: A response slower than `latency_tolerance` times the average latency is treated as congestion.
+                                        Set to None to react to throttling only.
+        :param float latency_smoothing: The weight of a new sample in the exponentially weighted average latency.
+        :param float min_backoff_interval_seconds: Congestion signals received within this interval of the last backoff are ignored,
+                                                   so a burst of failures of requests that were sent together only shrinks the limit once.
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        if not 0 < backoff_ratio < 1:
+            raise ValueError("backoff_ratio must be between 0 and 1")
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.latency_smoothing = latency_smoothing
+        self.min_backoff_interval_seconds = min_backoff_interval_seconds
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._average_latency: Optional[float] = None
+        self._last_backoff: Optional[float] = None
+
+        self._condition = Condition(Lock())
+        self._async_waiters: "Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]" = deque()
+
+    @classmethod
+    def for_cluster(cls, kusto_uri: str) -> "AdaptiveConcurrencyLimiter":
+        """Returns the limiter shared by all the clients of the given cluster in this process, creating it with default settings if needed."""
+        if kusto_uri in cls._shared_limiters:  # Double-checked locking to avoid unnecessary lock access
+            return cls._shared_limiters[kusto_uri]
+
+        with cls._shared_limiters_lock:
+            if kusto_uri not in cls._shared_limiters:
+                cls._shared_limiters[kusto_uri] = cls()
+            return cls._shared_limiters[kusto_uri]
+
+    @property
+    def limit(self) -> int:
+        """The current number of requests allowed to be in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """The number of requests currently holding a slot."""
+        return self._in_flight
+
+    def _try_acquire(self) -> bool:
+        if self._in_flight < int(self._limit):
+            self._in_flight += 1
+            return True
+        return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until a request slot is available.
+        :param float timeout: Maximal number of seconds to wait, or None to wait indefinitely.
+        :return: True if a slot was acquired, False if the timeout expired.
+        """
+        with self._condition:
+            return self._condition.wait_for(self._try_acquire, timeout)
+
+    async def acquire_async(self):
+        """Waits asynchronously until a request slot is available."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        woken = False
+        while True:
+            with self._condition:
+                if self._try_acquire():
+                    return
+                future = loop.create_future()
+                # A waiter that was woken but lost the slot to another caller keeps its place at the head of the queue
+                if woken:
+                    self._async_waiters.appendleft((loop, future))
+                else:
+                    self._async_waiters.append((loop, future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._condition:
+                    try:
+                        self._async_waiters.remove((loop, future))
+                    except ValueError:
+                        # The waiter was already woken, so the wakeup is passed on to the next waiter
+                        pass
+                    self._wake_async_waiters()
+                raise
+            woken = True
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False):
+        """
+        Releases a request slot and updates the limit according to the outcome of the request.
+        :param float latency: The time in seconds it took the service to respond, or None if the request failed without a response.
+        :param bool throttled: Whether the service rejected the request due to throttling.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self._back_off()
+            elif latency is not None:
+                self._on_latency_sample(latency)
+
+            self._condition.notify_all()
+            self._wake_async_waiters()
+
+    def _on_latency_sample(self, latency: float):
+        if self.latency_tolerance is not None and self._average_latency is not None and latency > self._average_latency * self.latency_tolerance:
+            self._back_off()
+        else:
+            # Additive increase - growing by 1/limit per response grows the limit by one for each window of responses.
+            self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+
+        if self._average_latency is None:
+            self._average_latency = latency
+        else:
+            self._average_latency += self.latency_smoothing * (latency - self._average_latency)
+
+    def _back_off(self):
+        now = time.monotonic()
+        if self._last_backoff is not None and now - self._last_backoff < self.min_backoff_interval_seconds:
+            return
+        self._last_backoff = now
+        self._limit = max(float(self.min_limit), self._limit * self.backoff_ratio)
+
+    def _wake_async_waiters(self):
+        free_slots = int(self._limit) - self._in_flight
+        while self._async_waiters and free_slots > 0:
+            loop, future = self._async_waiters.popleft()
+            # A cancelled waiter doesn't use up a slot
+            if future.done() or loop.is_closed():
+                continue
+            loop.call_soon_threadsafe(_set_future_done, future)
+            free_slots -= 1
+
+    def __repr__(self) -> str:
+        return f"AdaptiveConcurrencyLimiter(limit={self.limit}, in_flight={self.in_flight})"
+
+
+def _set_future_done(future: "asyncio.Future"):
+    if not future.done():
+        future.set_result(None)
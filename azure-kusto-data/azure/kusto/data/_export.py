@@ -0,0 +1,301 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import abc
+import csv
+import functools
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import List, Dict, Any, Iterable, Callable, Optional, Tuple, IO, TYPE_CHECKING
+
+from . import _converters
+from ._converters import _TIMESPAN_PATTERN
+from ._models import ConversionPlan, KustoResultColumn, LazyDynamicValue
+
+if TYPE_CHECKING:
+    import pyarrow
+
+
+class ExportFormat(Enum):
+    """File formats that query results can be exported to with `KustoClient.execute_streaming_query_to_file`."""
+
+    CSV = "csv"
+    JSON_LINES = "jsonl"
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+
+# Rows are accumulated in batches of this size before being converted and written to the file.
+# For Parquet, every batch becomes a single row group.
+DEFAULT_EXPORT_BATCH_SIZE = 65536
+DEFAULT_EXPORT_BUFFER_SIZE = 1024 * 1024
+
+
+def _dynamic_to_text(value: Any) -> Any:
+    return value if value is None or isinstance(value, str) else json.dumps(value, separators=(",", ":"))
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NANOSECONDS_PER_TICK = 100
+_SECONDS_FRACTION_PATTERN = re.compile(r"\.([0-9]+)")
+
+
+def _fraction_to_nanoseconds(fraction: str) -> int:
+    return int(fraction.ljust(9, "0")[:9]) if fraction else 0
+
+
+def _datetime_to_nanoseconds(value: str) -> int:
+    """Converts a Kusto datetime to nanoseconds since the epoch, keeping its 100ns precision which python's datetime can't hold."""
+    match = _SECONDS_FRACTION_PATTERN.search(value)
+    if match:
+        value = value[: match.start()] + value[match.end() :]
+    parsed = _converters.to_datetime(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return (parsed - _EPOCH) // timedelta(seconds=1) * 10**9 + _fraction_to_nanoseconds(match.group(1) if match else "")
+
+
+def _timespan_to_nanoseconds(value: Any) -> int:
+    """Converts a Kusto timespan, either text or a number of ticks, to nanoseconds."""
+    if isinstance(value, (int, float)):
+        return int(value) * _NANOSECONDS_PER_TICK
+    match = _TIMESPAN_PATTERN.match(value)
+    if not match:
+        raise ValueError("Timespan value '{}' cannot be decoded".format(value))
+    seconds, _, fraction = match.group("s").partition(".")
+    total_seconds = ((int(match.group("d") or 0) * 24 + int(match.group("h"))) * 60 + int(match.group("m"))) * 60 + int(seconds)
+    nanoseconds = total_seconds * 10**9 + _fraction_to_nanoseconds(fraction)
+    return -nanoseconds if match.group(1) == "-" else nanoseconds
+
+
+def _encode_lazy_value(value: Any) -> Any:
+    if type(value) is LazyDynamicValue:
+        return value.value
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+def _json_encoder() -> Callable[[Any], bytes]:
+    """Returns a function that encodes a value to compact UTF-8 JSON, using orjson when it is installed."""
+    try:
+        import orjson
+    except ImportError:
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_encode_lazy_value)
+        return lambda value: encoder.encode(value).encode("utf-8")
+    return functools.partial(orjson.dumps, default=_encode_lazy_value)
+
+
+def write_json(fp: IO[bytes], column_names: List[str], rows: Iterable[list], lines: bool = False, batch_size: int = DEFAULT_EXPORT_BATCH_SIZE) -> int:
+    """
+    Writes raw rows as UTF-8 JSON to a binary file object, and returns the number of rows written.
+    :param fp: The file object to write to.
+    :param column_names: The names of the columns.
+    :param rows: The raw rows, as received from the service.
+    :param lines: If False, a single column-oriented object - {column: [values]} - is written, which requires all the rows in memory.
+    Otherwise, every row is written as an object on its own line, `batch_size` rows at a time.
+    :param batch_size: The number of JSON lines encoded and written together.
+    """
+    encode = _json_encoder()
+    if lines:
+        rows_written = 0
+        batch = []
+        for row in rows:
+            batch.append(encode(dict(zip(column_names, row))))
+            if len(batch) >= batch_size:
+                fp.write(b"\n".join(batch) + b"\n")
+                rows_written += len(batch)
+                batch = []
+        if batch:
+            fp.write(b"\n".join(batch) + b"\n")
+            rows_written += len(batch)
+        return rows_written
+
+    rows = rows if isinstance(rows, list) else list(rows)
+    columns = zip(*rows) if rows else [()] * len(column_names)
+    fp.write(b"{")
+    for index, (name, values) in enumerate(zip(column_names, columns)):
+        fp.write((b"," if index else b"") + encode(name) + b":" + encode(values))
+    fp.write(b"}")
+    return len(rows)
+
+
+class _ResultFileWriter(abc.ABC):
+    """Writes the raw rows of a streamed result table to a file, one batch at a time."""
+
+    def __init__(self, path: str, columns: List[Dict[str, str]]):
+        self.path = path
+        self.plan = ConversionPlan([KustoResultColumn(column, index) for index, column in enumerate(columns)])
+        self.column_names = self.plan.column_names
+        self.column_types = self.plan.column_types
+
+    @abc.abstractmethod
+    def write_rows(self, rows: List[list]):
+        pass
+
+    @abc.abstractmethod
+    def close(self):
+        pass
+
+
+class _CsvFileWriter(_ResultFileWriter):
+    def __init__(self, path: str, columns: List[Dict[str, str]], buffer_size: int):
+        super().__init__(path, columns)
+        self._dynamic_indexes = [i for i, column_type in enumerate(self.column_types) if column_type == "dynamic"]
+        self._file = open(path, "w", newline="", encoding="utf-8", buffering=buffer_size)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.column_names)
+
+    def write_rows(self, rows: List[list]):
+        for row in rows:
+            for i in self._dynamic_indexes:
+                row[i] = _dynamic_to_text(row[i])
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _JsonLinesFileWriter(_ResultFileWriter):
+    def __init__(self, path: str, columns: List[Dict[str, str]], buffer_size: int):
+        super().__init__(path, columns)
+        self._file = open(path, "wb", buffering=buffer_size)
+
+    def write_rows(self, rows: List[list]):
+        write_json(self._file, self.column_names, rows, lines=True)
+
+    def close(self):
+        self._file.close()
+
+
+class _ArrowFileWriter(_ResultFileWriter):
+    """Base for the pyarrow based formats - converts every batch of rows to a pyarrow table."""
+
+    def __init__(self, path: str, columns: List[Dict[str, str]]):
+        super().__init__(path, columns)
+        import pyarrow
+
+        self._pa = pyarrow
+        self._column_converters = [self._arrow_converter(column_type) for column_type in self.column_types]
+        self.schema = pyarrow.schema([(name, arrow_type) for name, (arrow_type, _) in zip(self.column_names, self._column_converters)])
+
+    def _arrow_converter(self, column_type: Optional[str]) -> "Tuple[pyarrow.DataType, Optional[Callable[[Any], Any]]]":
+        pa = self._pa
+        if column_type == "bool":
+            return pa.bool_(), None
+        if column_type == "int":
+            return pa.int32(), None
+        if column_type == "long":
+            return pa.int64(), None
+        if column_type == "real":
+            # NaN and infinity are sent as strings
+            return pa.float64(), lambda v: float(v) if isinstance(v, str) else v
+        # Datetimes and timespans are parsed straight to nanoseconds, since python's datetime and timedelta would truncate Kusto's 100ns ticks
+        if column_type == "datetime":
+            return pa.timestamp("ns", tz="UTC"), _datetime_to_nanoseconds
+        if column_type == "timespan":
+            return pa.duration("ns"), _timespan_to_nanoseconds
+        if column_type == "dynamic":
+            return pa.string(), _dynamic_to_text
+        # Decimals are kept as text, since their precision and scale are not known in advance
+        return pa.string(), None
+
+    def _to_table(self, rows: List[list]) -> "pyarrow.Table":
+        arrays = []
+        for i, (arrow_type, convert) in enumerate(self._column_converters):
+            values = [row[i] for row in rows]
+            if convert is not None:
+                values = [None if v is None else convert(v) for v in values]
+            arrays.append(self._pa.array(values, type=arrow_type))
+        return self._pa.Table.from_arrays(arrays, schema=self.schema)
+
+
+class _ParquetFileWriter(_ArrowFileWriter):
+    def __init__(self, path: str, columns: List[Dict[str, str]]):
+        super().__init__(path, columns)
+        import pyarrow.parquet
+
+        self._writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_rows(self, rows: List[list]):
+        self._writer.write_table(self._to_table(rows), row_group_size=len(rows))
+
+    def close(self):
+        self._writer.close()
+
+
+class _ArrowIpcFileWriter(_ArrowFileWriter):
+    def __init__(self, path: str, columns: List[Dict[str, str]]):
+        super().__init__(path, columns)
+        self._sink = self._pa.OSFile(path, "wb")
+        self._writer = self._pa.ipc.new_file(self._sink, self.schema)
+
+    def write_rows(self, rows: List[list]):
+        self._writer.write_table(self._to_table(rows))
+
+    def close(self):
+        self._writer.close()
+        self._sink.close()
+
+
+def _create_writer(path: str, columns: List[Dict[str, str]], file_format: ExportFormat, buffer_size: int) -> _ResultFileWriter:
+    if file_format == ExportFormat.CSV:
+        return _CsvFileWriter(path, columns, buffer_size)
+    if file_format == ExportFormat.JSON_LINES:
+        return _JsonLinesFileWriter(path, columns, buffer_size)
+    if file_format == ExportFormat.PARQUET:
+        return _ParquetFileWriter(path, columns)
+    if file_format == ExportFormat.ARROW:
+        return _ArrowIpcFileWriter(path, columns)
+    raise ValueError("Unsupported export format: {}".format(file_format))
+
+
+class _ResultExport:
+    """
+    Exports a single streamed result table to a file.
+    Rows are buffered up to `batch_size` at a time, so memory use is bounded regardless of the size of the result.
+    If the export fails midway, the partially written file is removed.
+    """
+
+    def __init__(self, path: str, columns: List[Dict[str, str]], file_format: ExportFormat, batch_size: int, buffer_size: int):
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        self.path = path
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._batch = []
+        self._writer = _create_writer(path, columns, ExportFormat(file_format), buffer_size)
+
+    def add_row(self, row: list):
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            self._writer.write_rows(self._batch)
+            self.rows_written += len(self._batch)
+            self._batch = []
+
+    def complete(self) -> int:
+        self.flush()
+        self._writer.close()
+        return self.rows_written
+
+    def abort(self):
+        try:
+            self._writer.close()
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def export_rows(path: str, columns: List[Dict[str, str]], rows: Iterable[list], file_format: ExportFormat, batch_size: int, buffer_size: int) -> int:
+    export = _ResultExport(path, columns, file_format, batch_size, buffer_size)
+    try:
+        for row in rows:
+            export.add_row(row)
+        return export.complete()
+    except BaseException:
+        export.abort()
+        raise
@@ -0,0 +1,83 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import math
+from collections import deque
+from datetime import timedelta
+from threading import Lock
+from typing import Optional, Deque
+
+
+class HedgingPolicy:
+    """
+    Decides when a query should be hedged - sent a second time while the first attempt is still waiting for a response.
+    Hedging cuts the tail latency caused by rare slow nodes, at the cost of executing some queries twice, so it should only be used for
+    read-only queries.
+    By default, a query is hedged once it has waited longer than the tracked 95th percentile of the time to first byte,
+    and at most 5% of the queries are hedged.
+    """
+
+    def __init__(
+        self,
+        delay: Optional[timedelta] = None,
+        percentile: float = 0.95,
+        initial_delay: timedelta = timedelta(seconds=1),
+        min_samples: int = 20,
+        sample_window: int = 1000,
+        max_hedge_ratio: float = 0.05,
+        max_hedge_burst: int = 10,
+    ):
+        """
+        :param timedelta delay: A fixed delay to wait before hedging. If None, the delay follows the tracked latency percentile.
+        :param float percentile: The latency percentile (0 < percentile < 1) to use as the hedging delay.
+        :param timedelta initial_delay: The delay to use until `min_samples` latencies were recorded.
+        :param int min_samples: The number of latency samples required before the percentile is used.
+        :param int sample_window: The number of most recent latency samples the percentile is computed over.
+        :param float max_hedge_ratio: The maximal ratio of hedged queries out of all queries.
+        :param int max_hedge_burst: The maximal number of hedges that can be sent in a row after a quiet period.
+        """
+        if not 0 < percentile < 1:
+            raise ValueError("percentile must be between 0 and 1")
+        if not 0 <= max_hedge_ratio <= 1:
+            raise ValueError("max_hedge_ratio must be between 0 and 1")
+
+        self.delay = delay
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self.max_hedge_burst = max_hedge_burst
+
+        self._samples: Deque[float] = deque(maxlen=sample_window)
+        self._hedge_tokens = 0.0
+        self._lock = Lock()
+
+    def record_latency(self, latency: float):
+        """Records the time in seconds it took an attempt to receive its first byte."""
+        with self._lock:
+            self._samples.append(latency)
+
+    def hedge_delay(self) -> float:
+        """Returns the number of seconds to wait for the first attempt before hedging it."""
+        if self.delay is not None:
+            return self.delay.total_seconds()
+
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return self.initial_delay.total_seconds()
+            ordered = sorted(self._samples)
+
+        return ordered[min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)]
+
+    def on_request(self):
+        """Accounts for a new hedging-enabled request, allowing a fraction of a hedge."""
+        with self._lock:
+            self._hedge_tokens = min(float(self.max_hedge_burst), self._hedge_tokens + self.max_hedge_ratio)
+
+    def try_acquire_hedge(self) -> bool:
+        """Returns whether a hedge may be sent without exceeding the maximal hedge ratio, and if so - accounts for it."""
+        with self._lock:
+            # Allow for floating point error accumulated by adding up fractions of a hedge
+            if self._hedge_tokens < 1 - 1e-9:
+                return False
+            self._hedge_tokens = max(0.0, self._hedge_tokens - 1)
+            return True
@@ -3,13 +3,20 @@
 
 import json
 from abc import ABCMeta, abstractmethod
+from collections import namedtuple
 from decimal import Decimal
 from enum import Enum
-from typing import Iterator, List, Any, Union, Optional, Dict
+from functools import lru_cache
+from typing import Iterator, List, Any, Union, Optional, Dict, Tuple, Callable, NamedTuple, IO, TYPE_CHECKING
+
+import ijson
 
 from . import _converters
 from .exceptions import KustoMultiApiError, KustoStreamingQueryError
 
+if TYPE_CHECKING:
+    import numpy
+
 
 class WellKnownDataSet(Enum):
     """Categorizes data tables according to the role they play in the data set that a Kusto query returns."""
@@ -20,32 +27,56 @@ class WellKnownDataSet(Enum):
     QueryProperties = "QueryProperties"
 
 
-class KustoResultRow:
-    """Iterator over a Kusto result row."""
+class LazyDynamicValue:
+    """
+    A nested value of a dynamic column, kept as the JSON events it was parsed from, and decoded only when it is accessed.
+    The events already hold the value's parsed scalars - what is deferred is building its dicts and lists.
+    Produced by streaming queries executed with `lazy_dynamic=True`.
+    """
 
-    conversion_funcs = {"datetime": _converters.to_datetime, "timespan": _converters.to_timedelta, "decimal": Decimal}
+    __slots__ = ("events", "_value", "_decoded")
 
-    def __init__(self, columns: "List[KustoResultColumn]", row: list):
-        self._value_by_name = {}
-        self._value_by_index = []
+    def __init__(self, events: List[Tuple[str, Any]]):
+        self.events = events
+        self._value = None
+        self._decoded = False
 
-        for i, value in enumerate(row):
-            column = columns[i]
-            try:
-                column_type = column.column_type.lower()
-            except AttributeError:
-                self._value_by_index.append(value)
-                self._value_by_name[columns[i]] = value
-                continue
+    @property
+    def value(self) -> Any:
+        """The decoded value. Decoded on first access."""
+        if not self._decoded:
+            builder = ijson.ObjectBuilder()
+            for event, value in self.events:
+                builder.event(event, value)
+            self._value = builder.value
+            self._decoded = True
+            self.events = None
+        return self._value
+
+    def __repr__(self) -> str:
+        return "LazyDynamicValue({})".format(repr(self._value) if self._decoded else "...")
 
-            # If you are here to read this, you probably hit some datetime/timedelta inconsistencies.
-            # Azure-Data-Explorer(Kusto) supports 7 decimal digits, while the corresponding python types supports only 6.
-            # One example why one might want this precision, is when working with pandas.
-            # In that case, use azure.kusto.data.helpers.dataframe_from_result_table which takes into account the original value.
-            typed_value = self.get_typed_value(column_type, value)
 
-            self._value_by_index.append(typed_value)
-            self._value_by_name[column.column_name] = typed_value
+class KustoResultRow:
+    """Iterator over a Kusto result row."""
+
+    conversion_funcs = {"datetime": _converters.to_datetime, "timespan": _converters.to_timedelta, "decimal": Decimal}
+
+    def __init__(self, columns: "List[KustoResultColumn]", row: list, plan: "Optional[ConversionPlan]" = None):
+        """
+        :param columns: The columns of the table.
+        :param row: The raw values of the row.
+        :param plan: The conversion plan of the table. Tables pass their precompiled plan, otherwise it is compiled from `columns`.
+        """
+        if plan is None:
+            plan = ConversionPlan(columns)
+
+        # If you are here to read this, you probably hit some datetime/timedelta inconsistencies.
+        # Azure-Data-Explorer(Kusto) supports 7 decimal digits, while the corresponding python types supports only 6.
+        # One example why one might want this precision, is when working with pandas.
+        # In that case, use azure.kusto.data.helpers.dataframe_from_result_table which takes into account the original value.
+        self._value_by_index = plan.convert(row, decode_lazy=False)
+        self._value_by_name = dict(zip(plan.column_names, self._value_by_index))
 
     @staticmethod
     def get_typed_value(column_type: str, value: Any) -> Any:
@@ -61,22 +92,34 @@ class KustoResultRow:
 
     def __getitem__(self, key: Union[str, int]) -> Any:
         if isinstance(key, int):
-            return self._value_by_index[key]
-        return self._value_by_name[key]
+            value = self._value_by_index[key]
+        else:
+            value = self._value_by_name[key]
+        return value.value if type(value) is LazyDynamicValue else value
 
     def __len__(self) -> int:
         return self.columns_count
 
+    def _decode_lazy_values(self):
+        for index, name in enumerate(self._value_by_name):
+            value = self._value_by_index[index]
+            if type(value) is LazyDynamicValue:
+                self._value_by_index[index] = self._value_by_name[name] = value.value
+
     def to_dict(self) -> Dict[str, Any]:
+        self._decode_lazy_values()
         return self._value_by_name
 
     def to_list(self) -> list:
+        self._decode_lazy_values()
         return self._value_by_index
 
     def __str__(self) -> str:
+        self._decode_lazy_values()
         return "['{}']".format("', '".join([str(val) for val in self._value_by_index]))
 
     def __repr__(self) -> str:
+        self._decode_lazy_values()
         values = [repr(val) for val in self._value_by_name.values()]
         return "KustoResultRow(['{}'], [{}])".format("', '".join(self._value_by_name), ", ".join(values))
 
@@ -99,6 +142,160 @@ class KustoResultColumn:
         return "KustoResultColumn({},{})".format(json.dumps({"ColumnName": self.column_name, "ColumnType": self.column_type}), self.ordinal)
 
 
+class ConversionOverrides:
+    """
+    Overrides how the raw values of columns are converted, per Kusto type or per column name. Column overrides take precedence.
+    An override is either a function that is called with every non-null raw value, or None to keep the raw values as received.
+    For example:
+        ConversionOverrides(types={"decimal": float}) - decimals as floats instead of `Decimal` objects, which are much cheaper to compute with.
+        ConversionOverrides(types={"decimal": None}) - decimals kept as strings, to be converted later only where they are needed.
+        ConversionOverrides(types={"guid": uuid.UUID}) - guids as `uuid.UUID` objects instead of strings.
+    Types without an override are converted as usual.
+    """
+
+    def __init__(self, types: Optional[Dict[str, Optional[Callable[[Any], Any]]]] = None, columns: Optional[Dict[str, Optional[Callable[[Any], Any]]]] = None):
+        """
+        :param types: The converter of each overridden Kusto type, e.g. "decimal".
+        :param columns: The converter of each overridden column, by column name.
+        """
+        self.types = {column_type.lower(): converter for column_type, converter in (types or {}).items()}
+        self.columns = dict(columns or {})
+
+    def get_converter(self, column_name: str, column_type: Optional[str], default: Optional[Callable[[Any], Any]]) -> Optional[Callable[[Any], Any]]:
+        """Returns the converter to use for a column, given the converter it would otherwise use."""
+        if column_name in self.columns:
+            return self.columns[column_name]
+        if column_type in self.types:
+            return self.types[column_type]
+        return default
+
+
+class ConversionPlan:
+    """
+    How the raw values of a table's rows are converted to python values, compiled once from its columns.
+    Columns that need no conversion are recorded as identity columns and skipped, the others have their converter looked up once.
+    """
+
+    def __init__(self, columns: "List[KustoResultColumn]", overrides: Optional[ConversionOverrides] = None):
+        """
+        :param columns: The columns of the table.
+        :param overrides: Replaces the default conversions of some of the columns.
+        """
+        self.column_names = [column.column_name for column in columns]
+        # The lowercase Kusto type of each column, or None for columns without a type
+        self.column_types: List[Optional[str]] = []
+        self.identity_columns: List[int] = []
+        self.converters: List[Tuple[int, Callable[[Any], Any]]] = []
+        # Dynamic columns, which may hold lazily decoded values
+        self.dynamic_columns: List[int] = []
+
+        for index, column in enumerate(columns):
+            column_type = column.column_type.lower() if isinstance(getattr(column, "column_type", None), str) else None
+            self.column_types.append(column_type)
+            converter = KustoResultRow.conversion_funcs.get(column_type)
+            if overrides is not None:
+                converter = overrides.get_converter(column.column_name, column_type, converter)
+            if converter is not None:
+                self.converters.append((index, converter))
+            else:
+                self.identity_columns.append(index)
+                if column_type == "dynamic":
+                    self.dynamic_columns.append(index)
+        self._namedtuple_type = None
+
+    def convert(self, row: list, decode_lazy: bool = True) -> list:
+        """
+        Returns the typed values of a raw row, as a new list.
+        :param row: The raw values of the row.
+        :param decode_lazy: Whether lazily decoded dynamic values should be decoded, or left as `LazyDynamicValue` objects.
+        """
+        values = list(row)
+        for index, converter in self.converters:
+            value = values[index]
+            if value is not None:
+                values[index] = converter(value)
+        if decode_lazy:
+            self.decode_lazy_values(values)
+        return values
+
+    def decode_lazy_values(self, row: list) -> list:
+        """
+        Replaces the `LazyDynamicValue` objects of a raw row with their decoded values, in place.
+        :param row: The raw values of the row.
+        :return: The same row.
+        """
+        for index in self.dynamic_columns:
+            value = row[index]
+            if type(value) is LazyDynamicValue:
+                row[index] = value.value
+        return row
+
+    @property
+    def namedtuple_type(self) -> "type":
+        """A namedtuple type with a field per column. Shared by all the tables with the same column names."""
+        if self._namedtuple_type is None:
+            self._namedtuple_type = _namedtuple_type(tuple(self.column_names))
+        return self._namedtuple_type
+
+
+@lru_cache(maxsize=128)
+def _namedtuple_type(column_names: Tuple[str, ...]) -> "type":
+    # Column names that are not valid identifiers are renamed to _<index>
+    return namedtuple("KustoRow", column_names, rename=True)
+
+
+# A row factory creates the object that represents a single row, out of the table's conversion plan and the raw row.
+RowFactory = Callable[[ConversionPlan, list], Any]
+
+
+def tuple_row(plan: ConversionPlan, row: list) -> tuple:
+    """Row factory that creates a tuple of the typed values of the row."""
+    return tuple(plan.convert(row))
+
+
+def namedtuple_row(plan: ConversionPlan, row: list) -> NamedTuple:
+    """Row factory that creates a namedtuple of the typed values of the row. The namedtuple type is generated once per schema."""
+    return plan.namedtuple_type._make(plan.convert(row))
+
+
+def dict_row(plan: ConversionPlan, row: list) -> Dict[str, Any]:
+    """Row factory that creates a dict from column name to the typed value of the row."""
+    return dict(zip(plan.column_names, plan.convert(row)))
+
+
+class ColumnProjection:
+    """Selects a subset of the columns of a result table, in the requested order."""
+
+    def __init__(self, json_columns: List[Dict[str, Any]], column_names: List[str]):
+        """
+        :param json_columns: The columns of the table, as received from the service.
+        :param column_names: The names of the columns to select.
+        """
+        names = [column["ColumnName"] for column in json_columns]
+        self.indexes = []
+        for name in column_names:
+            if name not in names:
+                raise ValueError("Column '{}' does not exist in the result table. Available columns: {}".format(name, ", ".join(names)))
+            self.indexes.append(names.index(name))
+
+        self.columns = [json_columns[i] for i in self.indexes]
+        # Whether each column of the table should be kept, for parsers that read the cells of a row in order
+        self.keep = [i in self.indexes for i in range(len(names))]
+        kept_indexes = sorted(set(self.indexes))
+        self._kept_positions = [kept_indexes.index(i) for i in self.indexes]
+        self._is_ordered = self._kept_positions == list(range(len(kept_indexes)))
+
+    def project(self, row: list) -> list:
+        """Selects the requested cells out of a full row."""
+        return [row[i] for i in self.indexes]
+
+    def reorder(self, kept_cells: list) -> list:
+        """Orders the cells of the kept columns, read in table order, in the requested order."""
+        if self._is_ordered:
+            return kept_cells
+        return [kept_cells[i] for i in self._kept_positions]
+
+
 class BaseKustoResultTable(metaclass=ABCMeta):
     def __init__(self, json_table: Dict[str, Any]):
         self.table_name = json_table.get("TableName")
@@ -109,6 +306,18 @@ class BaseKustoResultTable(metaclass=ABCMeta):
         self.raw_columns = json_table["Columns"]
         self.raw_rows = json_table["Rows"]
         self.kusto_result_rows = None
+        self.conversion_overrides: Optional[ConversionOverrides] = None
+        # Used to convert every row of the table - by KustoResultRow, row factories and the DataFrame conversion
+        self.conversion_plan = ConversionPlan(self.columns)
+
+    def set_conversion_overrides(self, overrides: Optional[ConversionOverrides]):
+        """
+        Changes how the values of the table's rows are converted. Rows that were already created are not affected.
+        :param overrides: The conversions to override, or None to restore the default conversions.
+        """
+        self.conversion_overrides = overrides
+        self.conversion_plan = ConversionPlan(self.columns, overrides)
+        self.kusto_result_rows = None
 
     def __bool__(self) -> bool:
         return any(self.columns)
@@ -154,22 +363,59 @@ class BaseStreamingKustoResultTable(BaseKustoResultTable):
 class KustoResultTable(BaseKustoResultTable):
     """Iterator over a Kusto result table."""
 
-    def __init__(self, json_table: Dict[str, Any]):
-        super().__init__(json_table)
+    # Kusto types that have a native numpy representation, and the value that stands in for nulls in the masked arrays
+    numpy_dtypes = {"int": ("int32", 0), "long": ("int64", 0), "real": ("float64", 0.0), "bool": ("bool", False)}
+
+    def __init__(self, json_table: Dict[str, Any], columns: Optional[List[str]] = None):
+        """
+        :param json_table: The table, as received from the service.
+        :param columns: If given, only these columns are kept, in this order. The other cells are dropped before any conversion.
+        """
         errors = [row for row in json_table["Rows"] if isinstance(row, dict)]
         if errors:
             raise KustoMultiApiError(errors)
+        if columns is not None:
+            projection = ColumnProjection(json_table["Columns"], columns)
+            json_table = dict(json_table, Columns=projection.columns, Rows=[projection.project(row) for row in json_table["Rows"]])
+        super().__init__(json_table)
+        # The raw values of each column, transposed from the rows on first use by the columnar conversions
+        self._raw_columns: Optional[List[tuple]] = None
 
     @property
     def rows(self) -> List[KustoResultRow]:
         if not self.kusto_result_rows:
-            self.kusto_result_rows = [KustoResultRow(self.columns, row) for row in self.raw_rows]
+            self.kusto_result_rows = [KustoResultRow(self.columns, row, self.conversion_plan) for row in self.raw_rows]
         return self.kusto_result_rows
 
     def to_dict(self) -> Dict[str, Any]:
         """Converts the table to a dict."""
         return {"name": self.table_name, "kind": self.table_kind, "data": [r.to_dict() for r in self]}
 
+    def to_columnar_dict(self) -> Dict[str, list]:
+        """Converts the table to a dict from column name to the list of the column's typed values."""
+        columns = [list(values) for values in self._get_raw_columns()]
+        for index, converter in self.conversion_plan.converters:
+            columns[index] = [None if value is None else converter(value) for value in columns[index]]
+        return dict(zip(self.conversion_plan.column_names, columns))
+
+    def _get_raw_columns(self) -> List[tuple]:
+        if self._raw_columns is None:
+            self._raw_columns = list(zip(*self.raw_rows)) if self.raw_rows else [() for _ in self.columns]
+        return self._raw_columns
+
+    def write_json(self, fp: IO[bytes], lines: bool = False) -> int:
+        """
+        Writes the table's raw values as UTF-8 JSON to a binary file object. Uses orjson when it is installed.
+        Values are written as received from the service, so datetimes and timespans keep their full precision.
+        :param fp: The file object to write to.
+        :param bool lines: If False, a single column-oriented object is written - {column: [values]}. Otherwise, every row is written as
+        an object on its own line.
+        :return: The number of rows written.
+        """
+        from ._export import write_json
+
+        return write_json(fp, self.conversion_plan.column_names, self.raw_rows, lines)
+
     @property
     def rows_count(self) -> int:
         return len(self.raw_rows)
@@ -182,11 +428,53 @@ class KustoResultTable(BaseKustoResultTable):
             if self.kusto_result_rows:
                 yield self.kusto_result_rows[row_index]
             else:
-                yield KustoResultRow(self.columns, row)
+                yield KustoResultRow(self.columns, row, self.conversion_plan)
 
     def __getitem__(self, key: int) -> KustoResultRow:
         return self.rows[key]
 
+    def iter_rows(self, factory: Optional[RowFactory] = None) -> Iterator[Any]:
+        """
+        Iterates over the rows of the table.
+        :param factory: If given, each row is created by calling `factory(conversion_plan, raw_row)` - for example `tuple_row`, `namedtuple_row` or
+        `dict_row` - instead of as a KustoResultRow. This skips creating the KustoResultRow objects altogether.
+        """
+        if factory is None:
+            return iter(self)
+        plan = self.conversion_plan
+        return (factory(plan, row) for row in self.raw_rows)
+
+    def column_as_numpy(self, name: str) -> "numpy.ma.MaskedArray":
+        """
+        Converts a single int, long, real or bool column to a contiguous numpy array, straight from the raw values of the column.
+        Nulls are masked - use `.filled(value)` to replace them, or `.data` for the underlying array.
+        :param str name: The name of the column.
+        :return: A masked array of the column's values.
+        """
+        import numpy as np
+
+        column = next((c for c in self.columns if c.column_name == name), None)
+        if column is None:
+            raise LookupError(name)
+        column_type = column.column_type.lower()
+        if column_type not in self.numpy_dtypes:
+            raise TypeError("Column '{}' of type '{}' has no numpy representation".format(name, column.column_type))
+        dtype, null_value = self.numpy_dtypes[column_type]
+
+        values = self._get_raw_columns()[column.ordinal]
+        if None not in values:
+            # Reals may contain "NaN" and "(-)Infinity" strings, which numpy parses on its own
+            return np.ma.MaskedArray(np.fromiter(values, dtype=dtype, count=len(values)), mask=np.ma.nomask)
+
+        objects = np.array(values, dtype=object)
+        mask = np.equal(objects, None)
+        objects[mask] = null_value
+        return np.ma.MaskedArray(objects.astype(dtype), mask=mask)
+
+    def to_numpy_columns(self) -> "Dict[str, numpy.ma.MaskedArray]":
+        """Converts all the int, long, real and bool columns of the table to numpy arrays, as returned by `column_as_numpy`."""
+        return {c.column_name: self.column_as_numpy(c.column_name) for c in self.columns if c.column_type.lower() in self.numpy_dtypes}
+
     def __str__(self) -> str:
         d = self.to_dict()
         # enum is not serializable, using value instead
@@ -207,7 +495,45 @@ class KustoStreamingResultTable(BaseStreamingKustoResultTable):
             self.finished = True
             raise
         self.row_count += 1
-        return KustoResultRow(self.columns, row)
+        return KustoResultRow(self.columns, row, self.conversion_plan)
 
     def __iter__(self) -> Iterator[KustoResultRow]:
         return self
+
+    def iter_rows(self, factory: Optional[RowFactory] = None) -> "Union[KustoStreamingResultTable, Iterator[Any]]":
+        """
+        Iterates over the remaining rows of the table.
+        :param factory: If given, each row is created by calling `factory(conversion_plan, raw_row)` - for example `tuple_row`, `namedtuple_row` or
+        `dict_row` - instead of as a KustoResultRow.
+        """
+        if factory is None:
+            return self
+        return self._iter_rows_with_factory(factory)
+
+    def _iter_rows_with_factory(self, factory: RowFactory) -> Iterator[Any]:
+        plan = self.conversion_plan
+        for row in self.iter_raw_rows():
+            yield factory(plan, row)
+
+    def iter_raw_rows(self, decode_lazy: bool = False) -> Iterator[list]:
+        """
+        Iterates over the remaining rows as lists of raw values, as received from the service, without converting them.
+        :param bool decode_lazy: Whether lazily decoded dynamic values should be decoded, or left as `LazyDynamicValue` objects.
+        """
+        decode = self.conversion_plan.decode_lazy_values if decode_lazy and self.conversion_plan.dynamic_columns else None
+        for row in self.raw_rows:
+            self.row_count += 1
+            yield row if decode is None else decode(row)
+        self.finished = True
+
+    def write_json(self, fp: IO[bytes], lines: bool = True) -> int:
+        """
+        Writes the remaining rows' raw values as UTF-8 JSON to a binary file object. Uses orjson when it is installed.
+        :param fp: The file object to write to.
+        :param bool lines: If True, every row is written as an object on its own line, as it is streamed. Otherwise, a single
+        column-oriented object is written - {column: [values]} - which requires reading all the rows into memory first.
+        :return: The number of rows written.
+        """
+        from ._export import write_json
+
+        return write_json(fp, self.conversion_plan.column_names, self.iter_raw_rows(), lines)
@@ -1,40 +1,39 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
 import abc
-import asyncio
 import time
-import webbrowser
 from threading import Lock
 from typing import Callable, Optional, Coroutine, List
 
-from azure.core.exceptions import ClientAuthenticationError
-from azure.identity import ManagedIdentityCredential, AzureCliCredential
-from msal import ConfidentialClientApplication, PublicClientApplication
-
 from ._cloud_settings import CloudSettings, CloudInfo
 from .exceptions import KustoClientError, KustoAioSyntaxError, KustoAsyncUsageError
 
-try:
-    from asgiref.sync import sync_to_async
-except ImportError:
+# The authentication libraries are slow to import, so they are only imported by the token providers that use them, when they are first used.
+
 
-    def sync_to_async(f):
+def sync_to_async(f):
+    try:
+        from asgiref.sync import sync_to_async as asgiref_sync_to_async
+    except ImportError:
         raise KustoAioSyntaxError()
+    return asgiref_sync_to_async(f)
 
 
-try:
-    from azure.identity.aio import ManagedIdentityCredential as AsyncManagedIdentityCredential, AzureCliCredential as AsyncAzureCliCredential
-except ImportError:
+def _async_managed_identity_credential(**kwargs):
+    try:
+        from azure.identity.aio import ManagedIdentityCredential
+    except ImportError:
+        # In case the user doesn't have the aio optional dependency installed, but still tries to use async.
+        raise KustoAioSyntaxError()
+    return ManagedIdentityCredential(**kwargs)
 
-    # These are here in case the user doesn't have the aio optional dependency installed, but still tries to use async.
-    # They will give them a useful error message, and will appease linters.
-    class AsyncManagedIdentityCredential:
-        def __init__(self):
-            raise KustoAioSyntaxError()
 
-    class AsyncAzureCliCredential:
-        def __init__(self):
-            raise KustoAioSyntaxError()
+def _async_azure_cli_credential():
+    try:
+        from azure.identity.aio import AzureCliCredential
+    except ImportError:
+        raise KustoAioSyntaxError()
+    return AzureCliCredential()
 
 
 # constant key names and values used throughout the code
@@ -68,6 +67,8 @@ class TokenProviderBase(abc.ABC):
         self.is_async = is_async
 
         if is_async:
+            import asyncio
+
             self._async_lock = asyncio.Lock()
         else:
             self._lock = Lock()
@@ -315,6 +316,9 @@ class MsiTokenProvider(CloudInfoTokenProvider):
         pass
 
     def _get_token_impl(self) -> Optional[dict]:
+        from azure.core.exceptions import ClientAuthenticationError
+        from azure.identity import ManagedIdentityCredential
+
         try:
             if self._msi_auth_context is None:
                 self._msi_auth_context = ManagedIdentityCredential(**self._msi_args)
@@ -327,9 +331,11 @@ class MsiTokenProvider(CloudInfoTokenProvider):
             raise KustoClientError("Failed to obtain MSI token for '{0}' with [{1}]\n{2}".format(self._kusto_uri, self._msi_args, e))
 
     async def _get_token_impl_async(self) -> Optional[dict]:
+        from azure.core.exceptions import ClientAuthenticationError
+
         try:
             if self._msi_auth_context_async is None:
-                self._msi_auth_context_async = AsyncManagedIdentityCredential(**self._msi_args)
+                self._msi_auth_context_async = _async_managed_identity_credential(**self._msi_args)
 
             msi_token = await self._msi_auth_context_async.get_token(self._scopes[0])
             return {TokenConstants.MSAL_TOKEN_TYPE: TokenConstants.BEARER_TYPE, TokenConstants.MSAL_ACCESS_TOKEN: msi_token.token}
@@ -364,6 +370,8 @@ class AzCliTokenProvider(CloudInfoTokenProvider):
     def _get_token_impl(self) -> Optional[dict]:
         try:
             if self._az_auth_context is None:
+                from azure.identity import AzureCliCredential
+
                 self._az_auth_context = AzureCliCredential()
 
             self._az_token = self._az_auth_context.get_token(self._scopes[0])
@@ -376,7 +384,7 @@ class AzCliTokenProvider(CloudInfoTokenProvider):
     async def _get_token_impl_async(self) -> Optional[dict]:
         try:
             if self._az_auth_context_async is None:
-                self._az_auth_context_async = AsyncAzureCliCredential()
+                self._az_auth_context_async = _async_azure_cli_credential()
 
             self._az_token = await self._az_auth_context_async.get_token(self._scopes[0])
             return {TokenConstants.AZ_TOKEN_TYPE: TokenConstants.BEARER_TYPE, TokenConstants.AZ_ACCESS_TOKEN: self._az_token.token}
@@ -413,6 +421,8 @@ class UserPassTokenProvider(CloudInfoTokenProvider):
         return {"authority": self._cloud_info.authority_uri(self._auth), "client_id": self._cloud_info.kusto_client_app_id, "username": self._user}
 
     def _init_impl(self):
+        from msal import PublicClientApplication
+
         self._msal_client = PublicClientApplication(
             client_id=self._cloud_info.kusto_client_app_id, authority=self._cloud_info.authority_uri(self._auth), proxies=self._proxy_dict
         )
@@ -450,6 +460,8 @@ class DeviceLoginTokenProvider(CloudInfoTokenProvider):
         return {"authority": self._cloud_info.authority_uri(self._auth), "client_id": self._cloud_info.kusto_client_app_id}
 
     def _init_impl(self):
+        from msal import PublicClientApplication
+
         self._msal_client = PublicClientApplication(
             client_id=self._cloud_info.kusto_client_app_id, authority=self._cloud_info.authority_uri(self._auth), proxies=self._proxy_dict
         )
@@ -462,6 +474,8 @@ class DeviceLoginTokenProvider(CloudInfoTokenProvider):
             else:
                 print(flow[TokenConstants.MSAL_DEVICE_MSG])
 
+            import webbrowser
+
             webbrowser.open(flow[TokenConstants.MSAL_DEVICE_URI])
         except KeyError:
             raise KustoClientError("Failed to initiate device code flow")
@@ -507,6 +521,8 @@ class InteractiveLoginTokenProvider(CloudInfoTokenProvider):
         return {"authority": self._cloud_info.authority_uri(self._auth), "client_id": self._cloud_info.kusto_client_app_id}
 
     def _init_impl(self):
+        from msal import PublicClientApplication
+
         self._msal_client = PublicClientApplication(
             client_id=self._cloud_info.kusto_client_app_id, authority=self._cloud_info.authority_uri(self._auth), proxies=self._proxy_dict
         )
@@ -545,6 +561,8 @@ class ApplicationKeyTokenProvider(CloudInfoTokenProvider):
         return {"authority": self._cloud_info.authority_uri(self._auth), "client_id": self._app_client_id}
 
     def _init_impl(self):
+        from msal import ConfidentialClientApplication
+
         self._msal_client = ConfidentialClientApplication(
             client_id=self._app_client_id, client_credential=self._app_key, authority=self._cloud_info.authority_uri(self._auth), proxies=self._proxy_dict
         )
@@ -594,6 +612,8 @@ class ApplicationCertificateTokenProvider(CloudInfoTokenProvider):
         }
 
     def _init_impl(self):
+        from msal import ConfidentialClientApplication
+
         self._msal_client = ConfidentialClientApplication(
             client_id=self._client_id, client_credential=self._cert_credentials, authority=self._cloud_info.authority_uri(self._auth), proxies=self._proxy_dict
         )
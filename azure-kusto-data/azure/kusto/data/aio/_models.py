@@ -1,6 +1,6 @@
-from typing import AsyncIterator
+from typing import AsyncIterator, Any, Optional, Union
 
-from azure.kusto.data._models import KustoResultRow, BaseStreamingKustoResultTable
+from azure.kusto.data._models import KustoResultRow, BaseStreamingKustoResultTable, RowFactory
 
 
 class KustoStreamingResultTable(BaseStreamingKustoResultTable):
@@ -13,7 +13,24 @@ class KustoStreamingResultTable(BaseStreamingKustoResultTable):
             self.finished = True
             raise
         self.row_count += 1
-        return KustoResultRow(self.columns, row)
+        return KustoResultRow(self.columns, row, self.conversion_plan)
 
     def __aiter__(self) -> AsyncIterator[KustoResultRow]:
         return self
+
+    def iter_rows(self, factory: Optional[RowFactory] = None) -> "Union[KustoStreamingResultTable, AsyncIterator[Any]]":
+        """
+        Iterates over the remaining rows of the table.
+        :param factory: If given, each row is created by calling `factory(conversion_plan, raw_row)` - for example `tuple_row`, `namedtuple_row` or
+        `dict_row` - instead of as a KustoResultRow.
+        """
+        if factory is None:
+            return self
+        return self._iter_rows_with_factory(factory)
+
+    async def _iter_rows_with_factory(self, factory: RowFactory) -> AsyncIterator[Any]:
+        plan = self.conversion_plan
+        async for row in self.raw_rows:
+            self.row_count += 1
+            yield factory(plan, row)
+        self.finished = True
@@ -1,13 +1,19 @@
+import asyncio
+import functools
 import io
+import time
 from datetime import timedelta
-from typing import Union, Optional
+from typing import Union, Optional, List
 
 from .response import KustoStreamingResponseDataSet
 from .._decorators import documented_by, aio_documented_by
+from .._export import ExportFormat, _ResultExport, DEFAULT_EXPORT_BATCH_SIZE, DEFAULT_EXPORT_BUFFER_SIZE
+from .._models import WellKnownDataSet
 from ..aio.streaming_response import StreamingDataSetEnumerator, JsonTokenReader
+from ..streaming_response import FrameType
 from ..client import KustoClient as KustoClientSync, _KustoClientBase, KustoConnectionStringBuilder, ClientRequestProperties, ExecuteRequestParams
 from ..data_format import DataFormat
-from ..exceptions import KustoAioSyntaxError
+from ..exceptions import KustoAioSyntaxError, KustoStreamingQueryError
 from ..response import KustoResponseDataSet
 
 try:
@@ -23,6 +29,8 @@ class KustoClient(_KustoClientBase):
         super().__init__(kcsb, True)
 
         self._session = ClientSession()
+        # Holds the background cancellations of losing hedged queries, since the event loop only keeps weak references to tasks
+        self._background_tasks = set()
 
     async def __aenter__(self) -> "KustoClient":
         return self
@@ -38,8 +46,10 @@ class KustoClient(_KustoClientBase):
         return await self.execute_query(database, query, properties)
 
     @aio_documented_by(KustoClientSync.execute_query)
-    async def execute_query(self, database: str, query: str, properties: ClientRequestProperties = None) -> KustoResponseDataSet:
-        return await self._execute(self._query_endpoint, database, query, None, KustoClient._query_default_timeout, properties)
+    async def execute_query(
+        self, database: str, query: str, properties: ClientRequestProperties = None, columns: Optional[List[str]] = None
+    ) -> KustoResponseDataSet:
+        return await self._execute(self._query_endpoint, database, query, None, KustoClient._query_default_timeout, properties, hedge=True, columns=columns)
 
     @aio_documented_by(KustoClientSync.execute_mgmt)
     async def execute_mgmt(self, database: str, query: str, properties: ClientRequestProperties = None) -> KustoResponseDataSet:
@@ -64,17 +74,65 @@ class KustoClient(_KustoClientBase):
 
     @aio_documented_by(KustoClientSync._execute_streaming_query_parsed)
     async def _execute_streaming_query_parsed(
-        self, database: str, query: str, timeout: timedelta = _KustoClientBase._query_default_timeout, properties: Optional[ClientRequestProperties] = None
+        self,
+        database: str,
+        query: str,
+        timeout: timedelta = _KustoClientBase._query_default_timeout,
+        properties: Optional[ClientRequestProperties] = None,
+        lazy_dynamic: bool = False,
+        columns: Optional[List[str]] = None,
     ) -> StreamingDataSetEnumerator:
         response = await self._execute(self._query_endpoint, database, query, None, timeout, properties, stream_response=True)
-        return StreamingDataSetEnumerator(JsonTokenReader(response.content))
+        return StreamingDataSetEnumerator(
+            JsonTokenReader(response.content), functools.partial(self._close_streaming_response, response, database), lazy_dynamic, columns
+        )
+
+    async def _close_streaming_response(self, response: ClientResponse, database: str, cancel_query: bool):
+        response.close()
+        if cancel_query:
+            await self._cancel_query(database, response.request_info.headers["x-ms-client-request-id"])
 
     @aio_documented_by(KustoClientSync.execute_streaming_query)
     async def execute_streaming_query(
-        self, database: str, query: str, timeout: timedelta = _KustoClientBase._query_default_timeout, properties: Optional[ClientRequestProperties] = None
+        self,
+        database: str,
+        query: str,
+        timeout: timedelta = _KustoClientBase._query_default_timeout,
+        properties: Optional[ClientRequestProperties] = None,
+        lazy_dynamic: bool = False,
+        columns: Optional[List[str]] = None,
     ) -> KustoStreamingResponseDataSet:
-        response = await self._execute_streaming_query_parsed(database, query, timeout, properties)
-        return KustoStreamingResponseDataSet(response)
+        response = KustoStreamingResponseDataSet(await self._execute_streaming_query_parsed(database, query, timeout, properties, lazy_dynamic, columns))
+        self._apply_conversion_overrides(response)
+        return response
+
+    @aio_documented_by(KustoClientSync.execute_streaming_query_to_file)
+    async def execute_streaming_query_to_file(
+        self,
+        database: str,
+        query: str,
+        path: str,
+        file_format: Union[ExportFormat, str] = ExportFormat.CSV,
+        timeout: timedelta = _KustoClientBase._query_default_timeout,
+        properties: Optional[ClientRequestProperties] = None,
+        batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+        buffer_size: int = DEFAULT_EXPORT_BUFFER_SIZE,
+    ) -> int:
+        data_set = await self._execute_streaming_query_parsed(database, query, timeout, properties)
+        try:
+            async for frame in data_set:
+                if frame["FrameType"] == FrameType.DataTable and frame["TableKind"] == WellKnownDataSet.PrimaryResult.value:
+                    export = _ResultExport(path, frame["Columns"], file_format, batch_size, buffer_size)
+                    try:
+                        async for row in frame["Rows"]:
+                            export.add_row(row)
+                        return export.complete()
+                    except BaseException:
+                        export.abort()
+                        raise
+            raise KustoStreamingQueryError("Query did not return a primary result")
+        finally:
+            await data_set.close()
 
     @aio_documented_by(KustoClientSync._execute)
     async def _execute(
@@ -86,16 +144,21 @@ class KustoClient(_KustoClientBase):
         timeout: timedelta,
         properties: ClientRequestProperties = None,
         stream_response: bool = False,
+        hedge: bool = False,
+        columns: Optional[List[str]] = None,
     ) -> Union[KustoResponseDataSet, ClientResponse]:
         """Executes given query against this client"""
-        request_params = ExecuteRequestParams(database, payload, properties, query, timeout, self._request_headers)
-        json_payload = request_params.json_payload
+        request_params = ExecuteRequestParams(database, payload, properties, query, timeout, self._request_headers_template(payload))
+        body = request_params.body
         request_headers = request_params.request_headers
         timeout = request_params.timeout
         if self._aad_helper:
             request_headers["Authorization"] = await self._aad_helper.acquire_authorization_header_async()
 
-        response = await self._session.post(endpoint, headers=request_headers, data=payload, json=json_payload, timeout=timeout.seconds, proxy=self._proxy_url)
+        if hedge and self._hedging_policy:
+            response = await self._post_hedged(endpoint, database, request_headers, body, timeout)
+        else:
+            response = await self._post(endpoint, request_headers, body, payload, timeout)
 
         if stream_response:
             try:
@@ -124,4 +187,78 @@ class KustoClient(_KustoClientBase):
                     response_text = None
                 raise self._handle_http_error(e, endpoint, payload, response, response.status, response_json, response_text)
 
-            return self._kusto_parse_by_endpoint(endpoint, response_json)
+            return self._kusto_parse_by_endpoint(endpoint, response_json, columns)
+
+    async def _post(self, endpoint: str, request_headers: dict, body: Optional[bytes], payload: Optional[io.IOBase], timeout: timedelta) -> ClientResponse:
+        limiter = self._concurrency_limiter
+        if limiter:
+            await limiter.acquire_async()
+        start_time = time.monotonic()
+        try:
+            response = await self._session.post(
+                endpoint, headers=request_headers, data=body if body is not None else payload, timeout=timeout.seconds, proxy=self._proxy_url
+            )
+        except BaseException:
+            if limiter:
+                limiter.release()
+            raise
+        if limiter:
+            # For streamed responses, the slot is held until the response headers arrive
+            limiter.release(time.monotonic() - start_time, throttled=response.status == 429)
+        return response
+
+    async def _cancel_query(self, database: str, client_request_id: str):
+        try:
+            await self.execute_mgmt(database, self._cancel_query_command(client_request_id))
+        except Exception:
+            # Cancellation is best effort - the query may have completed in the meantime, and its failure shouldn't hide the caller's own outcome
+            pass
+
+    async def _post_hedged(self, endpoint: str, database: str, request_headers: dict, body: bytes, timeout: timedelta) -> ClientResponse:
+        policy = self._hedging_policy
+        policy.on_request()
+
+        async def send(headers: dict) -> ClientResponse:
+            start_time = time.monotonic()
+            response = await self._post(endpoint, headers, body, None, timeout)
+            policy.record_latency(time.monotonic() - start_time)
+            return response
+
+        attempt_headers = [request_headers]
+        attempts = [asyncio.ensure_future(send(request_headers))]
+        winner = None
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=policy.hedge_delay())
+            if not done and policy.try_acquire_hedge():
+                attempt_headers.append(self._hedge_request_headers(request_headers))
+                attempts.append(asyncio.ensure_future(send(attempt_headers[-1])))
+
+            pending = set(attempts)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in attempts if t in done and t.exception() is None and t.result().status < 400), None)
+        except asyncio.CancelledError:
+            for attempt in attempts:
+                attempt.cancel()
+            raise
+
+        # If all the attempts failed, report the failure of the original attempt
+        winner = winner or attempts[0]
+        for attempt, headers in zip(attempts, attempt_headers):
+            if attempt is winner:
+                continue
+            if attempt.done():
+                if attempt.exception() is not None:
+                    continue
+                response = attempt.result()
+                response.close()
+                if response.status >= 400:
+                    continue
+            else:
+                attempt.cancel()
+            # The losing query keeps running on the cluster until it's cancelled
+            cancellation = asyncio.ensure_future(self._cancel_query(database, headers["x-ms-client-request-id"]))
+            self._background_tasks.add(cancellation)
+            cancellation.add_done_callback(self._background_tasks.discard)
+
+        return winner.result()
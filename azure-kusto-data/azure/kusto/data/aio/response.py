@@ -1,10 +1,11 @@
-from typing import List, AsyncIterator, Union
+from typing import List, AsyncIterator, Union, Optional
 
+from azure.kusto.data._decorators import aio_documented_by
 from azure.kusto.data._models import WellKnownDataSet, KustoResultTable, BaseKustoResultTable
 from azure.kusto.data.aio._models import KustoStreamingResultTable
 from azure.kusto.data.aio.streaming_response import StreamingDataSetEnumerator
 from azure.kusto.data.exceptions import KustoStreamingQueryError
-from azure.kusto.data.response import BaseKustoResponseDataSet
+from azure.kusto.data.response import BaseKustoResponseDataSet, KustoStreamingResponseDataSet as KustoStreamingResponseDataSetSync
 from azure.kusto.data.streaming_response import FrameType
 
 
@@ -16,6 +17,7 @@ class KustoStreamingResponseDataSet(BaseKustoResponseDataSet):
     def __init__(self, streamed_data: StreamingDataSetEnumerator):
         self._current_table = None
         self._skip_incomplete_tables = False
+        self._cancel_query_on_close = False
         self.tables = []
         self.streamed_data = streamed_data
         self.finished = False
@@ -23,11 +25,26 @@ class KustoStreamingResponseDataSet(BaseKustoResponseDataSet):
     def iter_primary_results(self) -> "PrimaryResultsIterator":
         return PrimaryResultsIterator(self)
 
+    @aio_documented_by(KustoStreamingResponseDataSetSync.close)
+    async def close(self, cancel_query: Optional[bool] = None):
+        if cancel_query is None:
+            cancel_query = self._cancel_query_on_close
+        await self.streamed_data.close(cancel_query and not self.finished)
+
+    def set_cancel_query_on_close(self, value: bool):
+        self._cancel_query_on_close = value
+
+    async def __aenter__(self) -> "KustoStreamingResponseDataSet":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
     def __aiter__(self) -> AsyncIterator[BaseKustoResultTable]:
         return self
 
     async def __anext__(self) -> BaseKustoResultTable:
-        if self.finished:
+        if self.finished or self.streamed_data.closed:
             raise StopAsyncIteration()
 
         if type(self._current_table) == KustoStreamingResultTable and not self._current_table.finished and not self._skip_incomplete_tables:
@@ -48,6 +65,8 @@ class KustoStreamingResponseDataSet(BaseKustoResponseDataSet):
             self._current_table = KustoStreamingResultTable(table)
         else:
             self._current_table = KustoResultTable(table)
+        if self._conversion_overrides is not None:
+            self._current_table.set_conversion_overrides(self._conversion_overrides)
 
         self.tables.append(self._current_table)
         return self._current_table
@@ -1,10 +1,10 @@
-from typing import Any, Tuple, Dict, Iterator
+from typing import Any, Tuple, Dict, Iterator, Optional, Callable, Awaitable, List
 
 import aiohttp
 import ijson
 from ijson import IncompleteJSONError
 
-from azure.kusto.data._models import WellKnownDataSet
+from azure.kusto.data._models import WellKnownDataSet, LazyDynamicValue, ColumnProjection
 from azure.kusto.data.exceptions import KustoTokenParsingError, KustoUnsupportedApiError, KustoApiError, KustoMultiApiError
 from azure.kusto.data.streaming_response import JsonTokenType, FrameType, JsonToken
 
@@ -51,6 +51,38 @@ class JsonTokenReader:
     async def read_number(self) -> float:
         return (await self.read_token_of_type(JsonTokenType.NUMBER)).token_value
 
+    async def read_lazy_value(self, start_token: JsonToken) -> LazyDynamicValue:
+        events = [(start_token.token_type.name.lower(), None)]
+        depth = 1
+        try:
+            async for _, event, value in self.json_iter:
+                events.append((event, value))
+                if event == "start_map" or event == "start_array":
+                    depth += 1
+                elif event == "end_map" or event == "end_array":
+                    depth -= 1
+                    if depth == 0:
+                        return LazyDynamicValue(events)
+        except IncompleteJSONError:
+            pass
+        raise KustoTokenParsingError("Unexpected end of stream")
+
+    async def skip_value(self, token: JsonToken):
+        if token.token_type not in JsonTokenType.start_tokens():
+            return
+        depth = 1
+        try:
+            async for _, event, _ in self.json_iter:
+                if event == "start_map" or event == "start_array":
+                    depth += 1
+                elif event == "end_map" or event == "end_array":
+                    depth -= 1
+                    if depth == 0:
+                        return
+        except IncompleteJSONError:
+            pass
+        raise KustoTokenParsingError("Unexpected end of stream")
+
     async def skip_children(self, prev_token: JsonToken):
         if prev_token.token_type == JsonTokenType.MAP_KEY:
             prev_token = await self.read_next_token_or_throw()
@@ -97,28 +129,45 @@ class JsonTokenReader:
 
 
 class StreamingDataSetEnumerator:
-    def __init__(self, reader: JsonTokenReader):
+    def __init__(
+        self,
+        reader: JsonTokenReader,
+        close_callback: Optional[Callable[[bool], Awaitable[None]]] = None,
+        lazy_dynamic: bool = False,
+        columns: Optional[List[str]] = None,
+    ):
         self.reader = reader
+        self.lazy_dynamic = lazy_dynamic
+        self.columns = columns
         self.done = False
         self.started = False
         self.started_primary_results = False
         self.finished_primary_results = False
+        self.closed = False
+        self._close_callback = close_callback
+
+    async def close(self, cancel_query: bool = False):
+        if self.closed:
+            return
+        self.closed = True
+        if self._close_callback:
+            await self._close_callback(cancel_query and not self.done)
 
     def __aiter__(self) -> "StreamingDataSetEnumerator":
         return self
 
     async def __anext__(self) -> Dict[str, Any]:
-        if self.done:
-            raise StopIteration()
+        if self.done or self.closed:
+            raise StopAsyncIteration()
 
         if not self.started:
             await self.reader.read_start_array()
             self.started = True
 
         token = await self.reader.skip_until_token_with_paths((JsonTokenType.START_MAP, "item"), (JsonTokenType.END_ARRAY, ""))
-        if token == JsonTokenType.END_ARRAY:
+        if token is None or token.token_type == JsonTokenType.END_ARRAY:
             self.done = True
-            raise StopIteration()
+            raise StopAsyncIteration()
 
         frame_type = await self.read_frame_type()
         parsed_frame = await self.parse_frame(frame_type)
@@ -146,8 +195,12 @@ class StreamingDataSetEnumerator:
                 ("TableName", JsonTokenType.STRING),
                 ("Columns", JsonTokenType.START_ARRAY),
             )
+            projection = None
+            if self.columns is not None and props["TableKind"] == WellKnownDataSet.PrimaryResult.value:
+                projection = ColumnProjection(props["Columns"], self.columns)
+                props["Columns"] = projection.columns
             await self.reader.skip_until_property_name("Rows")
-            props["Rows"] = self.row_iterator()
+            props["Rows"] = self.row_iterator(projection)
             if props["TableKind"] != WellKnownDataSet.PrimaryResult.value:
                 props["Rows"] = [r async for r in props["Rows"]]
             return props
@@ -158,7 +211,7 @@ class StreamingDataSetEnumerator:
                 res["OneApiErrors"] = self.parse_array(skip_start=False)
             return res
 
-    async def row_iterator(self) -> Iterator[list]:
+    async def row_iterator(self, projection: Optional[ColumnProjection] = None) -> Iterator[list]:
         await self.reader.read_token_of_type(JsonTokenType.START_ARRAY)
         while True:
             token = await self.reader.read_token_of_type(JsonTokenType.START_ARRAY, JsonTokenType.END_ARRAY, JsonTokenType.START_MAP)
@@ -166,12 +219,16 @@ class StreamingDataSetEnumerator:
                 raise KustoMultiApiError([await self.parse_object(skip_start=True)])
             if token.token_type == JsonTokenType.END_ARRAY:
                 return
-            yield await self.parse_array(skip_start=True)
+            if projection is None:
+                yield await self.parse_array(skip_start=True, lazy_nested=self.lazy_dynamic)
+            else:
+                yield projection.reorder(await self.parse_array(skip_start=True, lazy_nested=self.lazy_dynamic, keep=projection.keep))
 
-    async def parse_array(self, skip_start: bool) -> list:
+    async def parse_array(self, skip_start: bool, lazy_nested: bool = False, keep: Optional[List[bool]] = None) -> list:
         if not skip_start:
             await self.reader.read_start_array()
         arr = []
+        index = -1
 
         while True:
             token = await self.reader.read_token_of_type(
@@ -187,7 +244,12 @@ class StreamingDataSetEnumerator:
             if token.token_type == JsonTokenType.END_ARRAY:
                 return arr
 
-            if token.token_type == JsonTokenType.START_MAP:
+            index += 1
+            if keep is not None and not keep[index]:
+                await self.reader.skip_value(token)
+            elif lazy_nested and token.token_type in JsonTokenType.start_tokens():
+                arr.append(await self.reader.read_lazy_value(token))
+            elif token.token_type == JsonTokenType.START_MAP:
                 arr.append(await self.parse_object(skip_start=True))
             elif token.token_type == JsonTokenType.START_ARRAY:
                 arr.append(await self.parse_array(skip_start=True))
@@ -1,26 +1,35 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
 import abc
+import functools
 import io
 import json
 import socket
 import sys
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 from copy import copy
 from datetime import timedelta
 from enum import Enum, unique
-from typing import TYPE_CHECKING, Union, Callable, Optional, Any, Coroutine, List, Tuple, AnyStr, IO, NoReturn
+from threading import Event, Lock
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Union, Callable, Optional, Any, Coroutine, List, Tuple, AnyStr, IO, NoReturn, Mapping
 
 import requests
 from requests import Response
 from urllib3.connection import HTTPConnection
 
+from ._concurrency import AdaptiveConcurrencyLimiter
+from ._export import ExportFormat, export_rows, DEFAULT_EXPORT_BATCH_SIZE, DEFAULT_EXPORT_BUFFER_SIZE
+from ._hedging import HedgingPolicy
 from ._version import VERSION
 from .data_format import DataFormat
-from .exceptions import KustoServiceError, KustoApiError, KustoThrottlingError
-from .response import KustoResponseDataSetV1, KustoResponseDataSetV2, KustoStreamingResponseDataSet, KustoResponseDataSet
+from .exceptions import KustoServiceError, KustoApiError, KustoThrottlingError, KustoStreamingQueryError
+from ._models import WellKnownDataSet, ConversionOverrides
+from .response import KustoResponseDataSetV1, KustoResponseDataSetV2, KustoStreamingResponseDataSet, KustoResponseDataSet, BaseKustoResponseDataSet
 from .security import _AadHelper
-from .streaming_response import StreamingDataSetEnumerator, JsonTokenReader
+from .streaming_response import StreamingDataSetEnumerator, JsonTokenReader, FrameType
 from urllib.parse import urljoin
 
 if TYPE_CHECKING:
@@ -601,11 +610,15 @@ class ClientRequestProperties:
         self.client_request_id = None
         self.application = None
         self.user = None
+        # Serializations of the options and parameters, computed once and cleared whenever they are changed
+        self._json: Optional[str] = None
+        self._json_options: Optional[dict] = None
 
     def set_parameter(self, name: str, value: str):
         """Sets a parameter's value"""
         _assert_value_is_valid(name)
         self._parameters[name] = value
+        self._json = None
 
     def has_parameter(self, name: str) -> bool:
         """Checks if a parameter is specified."""
@@ -619,6 +632,8 @@ class ClientRequestProperties:
         """Sets an option's value"""
         _assert_value_is_valid(name)
         self._options[name] = value
+        self._json = None
+        self._json_options = None
 
     def has_option(self, name: str) -> bool:
         """Checks if an option is specified."""
@@ -630,27 +645,44 @@ class ClientRequestProperties:
 
     def to_json(self) -> str:
         """Safe serialization to a JSON string."""
-        return json.dumps({"Options": self._options, "Parameters": self._parameters}, default=str)
+        if self._json is None:
+            self._json = json.dumps({"Options": self._options, "Parameters": self._parameters}, default=str)
+        return self._json
+
+    def options_as_json(self) -> dict:
+        """The options, with their values converted to JSON types as they are in `to_json`."""
+        if self._json_options is None:
+            self._json_options = {
+                name: value if value is None or isinstance(value, (str, int, float, bool)) else json.loads(json.dumps(value, default=str))
+                for name, value in self._options.items()
+            }
+        return self._json_options
 
 
 class ExecuteRequestParams:
-    def __init__(self, database: str, payload: Optional[io.IOBase], properties: ClientRequestProperties, query: str, timeout: timedelta, request_headers: dict):
-        request_headers = copy(request_headers)
+    def __init__(
+        self, database: str, payload: Optional[io.IOBase], properties: ClientRequestProperties, query: str, timeout: timedelta, request_headers: Mapping
+    ):
+        """
+        :param request_headers: The client's headers template for this kind of request - queries and commands, or streaming ingestion.
+        """
+        request_headers = dict(request_headers)
         json_payload = None
+        body = None
         if not payload:
             json_payload = {"db": database, "csl": query}
             if properties:
                 json_payload["properties"] = properties.to_json()
+            # The body is encoded once, and sent as is by every attempt of the request
+            body = json.dumps(json_payload).encode("utf-8")
 
             client_request_id_prefix = "KPC.execute;"
-            request_headers["Content-Type"] = "application/json; charset=utf-8"
         else:
             if properties:
-                request_headers.update(json.loads(properties.to_json())["Options"])
+                request_headers.update(properties.options_as_json())
 
             # Before 3.0 it was KPC.execute_streaming_ingest, but was changed to align with the other SDKs
             client_request_id_prefix = "KPC.executeStreamingIngest;"
-            request_headers["Content-Encoding"] = "gzip"
         request_headers["x-ms-client-request-id"] = client_request_id_prefix + str(uuid.uuid4())
         if properties is not None:
             if properties.client_request_id is not None:
@@ -667,6 +699,7 @@ class ExecuteRequestParams:
         timeout = (timeout or KustoClient._mgmt_default_timeout) + KustoClient._client_server_delta
 
         self.json_payload = json_payload
+        self.body = body
         self.request_headers = request_headers
         self.timeout = timeout
 
@@ -696,6 +729,9 @@ class _KustoClientBase(abc.ABC):
     def __init__(self, kcsb: Union[KustoConnectionStringBuilder, str], is_async):
         self._kcsb = kcsb
         self._proxy_url: Optional[str] = None
+        self._concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+        self._hedging_policy: Optional[HedgingPolicy] = None
+        self._conversion_overrides: Optional[ConversionOverrides] = None
         if not isinstance(kcsb, KustoConnectionStringBuilder):
             self._kcsb = KustoConnectionStringBuilder(kcsb)
         self._kusto_cluster = self._kcsb.data_source
@@ -713,17 +749,71 @@ class _KustoClientBase(abc.ABC):
             "x-ms-client-version": "Kusto.Python.Client:" + VERSION,
             "x-ms-version": self.API_VERSION,
         }
+        # Read-only templates of the headers of every kind of request, copied once per request
+        self._query_request_headers = MappingProxyType({**self._request_headers, "Content-Type": "application/json; charset=utf-8"})
+        self._streaming_ingest_request_headers = MappingProxyType({**self._request_headers, "Content-Encoding": "gzip"})
+
+    def _request_headers_template(self, payload: Optional[IO[AnyStr]]) -> Mapping:
+        return self._streaming_ingest_request_headers if payload else self._query_request_headers
 
     def set_proxy(self, proxy_url: str):
         self._proxy_url = proxy_url
         if self._aad_helper:
             self._aad_helper.token_provider.set_proxy(proxy_url)
 
+    def set_concurrency_limiter(self, limiter: Optional[AdaptiveConcurrencyLimiter]):
+        """
+        Limit the number of concurrent requests (queries, control commands and streaming ingestions) this client sends.
+        The limit adapts to throttling and latency feedback from the service.
+        To share a limit between all the clients of a cluster, use `AdaptiveConcurrencyLimiter.for_cluster`.
+        :param limiter: The limiter to use, or None to disable limiting.
+        """
+        self._concurrency_limiter = limiter
+
+    @property
+    def concurrency_limiter(self) -> Optional[AdaptiveConcurrencyLimiter]:
+        return self._concurrency_limiter
+
+    def set_query_hedging_policy(self, policy: Optional[HedgingPolicy]):
+        """
+        Enable hedging for `execute_query`: when the first attempt of a query is slow to respond, a duplicate is sent with a different
+        client request id, the first response to arrive is used and the other one is abandoned.
+        Since hedged queries may run twice, only enable hedging for clients that run read-only queries.
+        Control commands and streaming queries are never hedged.
+        :param policy: The policy deciding when to hedge, or None to disable hedging.
+        """
+        self._hedging_policy = policy
+
+    def set_conversion_overrides(self, overrides: Optional[ConversionOverrides]):
+        """
+        Change how the values of the result tables returned by this client are converted, per Kusto type or per column.
+        For example, `ConversionOverrides(types={"decimal": float, "guid": uuid.UUID})` returns decimals as floats and guids as `uuid.UUID` objects.
+        :param overrides: The conversions to override, or None to restore the default conversions.
+        """
+        self._conversion_overrides = overrides
+
     @staticmethod
-    def _kusto_parse_by_endpoint(endpoint: str, response_json: Any) -> KustoResponseDataSet:
+    def _cancel_query_command(client_request_id: str) -> str:
+        escaped_id = client_request_id.replace("\\", "\\\\").replace('"', '\\"')
+        return f'.cancel query "{escaped_id}"'
+
+    @staticmethod
+    def _hedge_request_headers(request_headers: dict) -> dict:
+        hedge_headers = copy(request_headers)
+        hedge_headers["x-ms-client-request-id"] = request_headers["x-ms-client-request-id"] + ";hedge"
+        return hedge_headers
+
+    def _kusto_parse_by_endpoint(self, endpoint: str, response_json: Any, columns: Optional[List[str]] = None) -> KustoResponseDataSet:
         if endpoint.endswith("v2/rest/query"):
-            return KustoResponseDataSetV2(response_json)
-        return KustoResponseDataSetV1(response_json)
+            response = KustoResponseDataSetV2(response_json, columns)
+        else:
+            response = KustoResponseDataSetV1(response_json)
+        self._apply_conversion_overrides(response)
+        return response
+
+    def _apply_conversion_overrides(self, response: BaseKustoResponseDataSet):
+        if self._conversion_overrides is not None:
+            response.set_conversion_overrides(self._conversion_overrides)
 
     @staticmethod
     def _handle_http_error(
@@ -790,6 +880,8 @@ class KustoClient(_KustoClientBase):
 
         # Create a session object for connection pooling
         self._session = requests.Session()
+        self._hedging_executor: Optional[ThreadPoolExecutor] = None
+        self._hedging_executor_lock = Lock()
 
         adapter = HTTPAdapterWithSocketOptions(
             socket_options=(HTTPConnection.default_socket_options or []) + self.compose_socket_options(), pool_maxsize=self._max_pool_size
@@ -797,6 +889,20 @@ class KustoClient(_KustoClientBase):
         self._session.mount("http://", adapter)
         self._session.mount("https://", adapter)
 
+    def __enter__(self) -> "KustoClient":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Closes the client's connections, and stops the threads that send hedged queries."""
+        with self._hedging_executor_lock:
+            executor, self._hedging_executor = self._hedging_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        self._session.close()
+
     def set_proxy(self, proxy_url: str):
         super().set_proxy(proxy_url)
         self._session.proxies = {"http": proxy_url, "https": proxy_url}
@@ -866,17 +972,21 @@ class KustoClient(_KustoClientBase):
             return self.execute_mgmt(database, query, properties)
         return self.execute_query(database, query, properties)
 
-    def execute_query(self, database: str, query: str, properties: Optional[ClientRequestProperties] = None) -> KustoResponseDataSet:
+    def execute_query(
+        self, database: str, query: str, properties: Optional[ClientRequestProperties] = None, columns: Optional[List[str]] = None
+    ) -> KustoResponseDataSet:
         """
         Execute a KQL query.
         To learn more about KQL go to https://docs.microsoft.com/en-us/azure/kusto/query/
         :param str database: Database against query will be executed.
         :param str query: Query to be executed.
         :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties.
+        :param columns: If given, only these columns of the primary results are kept, in this order.
+                        Useful when the query can't be changed to project them on the server.
         :return: Kusto response data set.
         :rtype: azure.kusto.data.response.KustoResponseDataSet
         """
-        return self._execute(self._query_endpoint, database, query, None, self._query_default_timeout, properties)
+        return self._execute(self._query_endpoint, database, query, None, self._query_default_timeout, properties, hedge=True, columns=columns)
 
     def execute_mgmt(self, database: str, query: str, properties: Optional[ClientRequestProperties] = None) -> KustoResponseDataSet:
         """
@@ -919,26 +1029,91 @@ class KustoClient(_KustoClientBase):
         self._execute(endpoint, database, None, stream, self._streaming_ingest_default_timeout, properties)
 
     def _execute_streaming_query_parsed(
-        self, database: str, query: str, timeout: timedelta = _KustoClientBase._query_default_timeout, properties: Optional[ClientRequestProperties] = None
+        self,
+        database: str,
+        query: str,
+        timeout: timedelta = _KustoClientBase._query_default_timeout,
+        properties: Optional[ClientRequestProperties] = None,
+        lazy_dynamic: bool = False,
+        columns: Optional[List[str]] = None,
     ) -> StreamingDataSetEnumerator:
         response = self._execute(self._query_endpoint, database, query, None, timeout, properties, stream_response=True)
         response.raw.decode_content = True
-        return StreamingDataSetEnumerator(JsonTokenReader(response.raw))
+        return StreamingDataSetEnumerator(
+            JsonTokenReader(response.raw), functools.partial(self._close_streaming_response, response, database), lazy_dynamic, columns
+        )
+
+    def _close_streaming_response(self, response: Response, database: str, cancel_query: bool):
+        # Closing a response that was not read to the end closes its connection instead of returning it to the pool.
+        response.close()
+        if cancel_query:
+            self._cancel_query(database, response.request.headers["x-ms-client-request-id"])
 
     def execute_streaming_query(
-        self, database: str, query: str, timeout: timedelta = _KustoClientBase._query_default_timeout, properties: Optional[ClientRequestProperties] = None
+        self,
+        database: str,
+        query: str,
+        timeout: timedelta = _KustoClientBase._query_default_timeout,
+        properties: Optional[ClientRequestProperties] = None,
+        lazy_dynamic: bool = False,
+        columns: Optional[List[str]] = None,
     ) -> KustoStreamingResponseDataSet:
         """
         Execute a KQL query without reading it all to memory.
         The resulting KustoStreamingResponseDataSet will stream one table at a time, and the rows can be retrieved sequentially.
+        If the data set may be abandoned before it is read to the end, use it as a context manager (or call `close`) to release the connection,
+        and optionally cancel the query on the server.
 
         :param str database: Database against query will be executed.
         :param str query: Query to be executed.
         :param timedelta timeout: timeout for the query to be executed
         :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties.
+        :param bool lazy_dynamic: Keep nested values of dynamic columns undecoded until they are accessed through a row.
+                                  Saves building the dicts and lists of dynamic values that are not read.
+        :param columns: If given, only these columns of the primary results are parsed, in this order. The cells of other columns are skipped
+                        in the response stream without being decoded.
         :return KustoStreamingResponseDataSet:
         """
-        return KustoStreamingResponseDataSet(self._execute_streaming_query_parsed(database, query, timeout, properties))
+        response = KustoStreamingResponseDataSet(self._execute_streaming_query_parsed(database, query, timeout, properties, lazy_dynamic, columns))
+        self._apply_conversion_overrides(response)
+        return response
+
+    def execute_streaming_query_to_file(
+        self,
+        database: str,
+        query: str,
+        path: str,
+        file_format: Union[ExportFormat, str] = ExportFormat.CSV,
+        timeout: timedelta = _KustoClientBase._query_default_timeout,
+        properties: Optional[ClientRequestProperties] = None,
+        batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+        buffer_size: int = DEFAULT_EXPORT_BUFFER_SIZE,
+    ) -> int:
+        """
+        Execute a KQL query and write its primary result straight to a local file, without reading it all to memory.
+        Rows are written as they arrive, in batches of `batch_size` rows, so memory use does not depend on the size of the result.
+        Only the first primary result table is exported. If the export fails, the partially written file is removed.
+        Parquet and Arrow formats require the `pyarrow` package. They store datetimes and timespans with nanosecond precision, keeping Kusto's 100ns ticks,
+        so datetimes must fall within the years 1677 to 2262.
+
+        :param str database: Database against query will be executed.
+        :param str query: Query to be executed.
+        :param str path: The file to write the result to. Overwritten if it exists.
+        :param ExportFormat file_format: The format of the file - csv, jsonl, parquet or arrow.
+        :param timedelta timeout: timeout for the query to be executed
+        :param azure.kusto.data.ClientRequestProperties properties: Optional additional properties.
+        :param int batch_size: Number of rows to buffer before writing. For Parquet, this is the size of a row group.
+        :param int buffer_size: Size in bytes of the write buffer of text formats.
+        :return: The number of rows written.
+        """
+        data_set = self._execute_streaming_query_parsed(database, query, timeout, properties)
+        try:
+            for frame in data_set:
+                if frame["FrameType"] == FrameType.DataTable and frame["TableKind"] == WellKnownDataSet.PrimaryResult.value:
+                    return export_rows(path, frame["Columns"], frame["Rows"], file_format, batch_size, buffer_size)
+            raise KustoStreamingQueryError("Query did not return a primary result")
+        finally:
+            data_set.close()
 
     def _execute(
         self,
@@ -949,15 +1124,21 @@ class KustoClient(_KustoClientBase):
         timeout: timedelta,
         properties: Optional[ClientRequestProperties] = None,
         stream_response: bool = False,
+        hedge: bool = False,
+        columns: Optional[List[str]] = None,
     ) -> Union[KustoResponseDataSet, Response]:
         """Executes given query against this client"""
-        request_params = ExecuteRequestParams(database, payload, properties, query, timeout, self._request_headers)
-        json_payload = request_params.json_payload
+        request_params = ExecuteRequestParams(database, payload, properties, query, timeout, self._request_headers_template(payload))
+        body = request_params.body
         request_headers = request_params.request_headers
         timeout = request_params.timeout
         if self._aad_helper:
             request_headers["Authorization"] = self._aad_helper.acquire_authorization_header()
-        response = self._session.post(endpoint, headers=request_headers, json=json_payload, data=payload, timeout=timeout.seconds, stream=stream_response)
+
+        if hedge and self._hedging_policy:
+            response = self._post_hedged(endpoint, database, request_headers, body, timeout)
+        else:
+            response = self._post(endpoint, request_headers, body, payload, timeout, stream_response)
 
         if stream_response:
             try:
@@ -973,4 +1154,88 @@ class KustoClient(_KustoClientBase):
         except Exception as e:
             raise self._handle_http_error(e, endpoint, payload, response, response.status_code, response_json, response.text)
 
-        return self._kusto_parse_by_endpoint(endpoint, response_json)
+        return self._kusto_parse_by_endpoint(endpoint, response_json, columns)
+
+    def _post(
+        self, endpoint: str, request_headers: dict, body: Optional[bytes], payload: Optional[IO[AnyStr]], timeout: timedelta, stream_response: bool
+    ) -> Response:
+        limiter = self._concurrency_limiter
+        if limiter:
+            limiter.acquire()
+        try:
+            response = self._session.post(
+                endpoint, headers=request_headers, data=body if body is not None else payload, timeout=timeout.seconds, stream=stream_response
+            )
+        except BaseException:
+            if limiter:
+                limiter.release()
+            raise
+        if limiter:
+            # The latency is sampled up to the arrival of the response headers, so that downloading a large result doesn't look like congestion.
+            # For streamed responses, the slot is held until then as well.
+            limiter.release(response.elapsed.total_seconds(), throttled=response.status_code == 429)
+        return response
+
+    def _get_hedging_executor(self) -> ThreadPoolExecutor:
+        with self._hedging_executor_lock:
+            if self._hedging_executor is None:
+                self._hedging_executor = ThreadPoolExecutor(max_workers=self._max_pool_size, thread_name_prefix="KustoHedging")
+            return self._hedging_executor
+
+    def _cancel_query(self, database: str, client_request_id: str):
+        try:
+            self.execute_mgmt(database, self._cancel_query_command(client_request_id))
+        except Exception:
+            # Cancellation is best effort - the query may have completed in the meantime, and its failure shouldn't hide the caller's own outcome
+            pass
+
+    def _post_hedged(self, endpoint: str, database: str, request_headers: dict, body: bytes, timeout: timedelta) -> Response:
+        policy = self._hedging_policy
+        policy.on_request()
+        executor = self._get_hedging_executor()
+
+        def send(headers: dict, started: Optional[Event] = None) -> Response:
+            start_time = time.monotonic()
+            if started is not None:
+                started.set()
+            # The response is streamed, so the attempt completes as soon as the first byte arrives
+            response = self._post(endpoint, headers, body, None, timeout, stream_response=True)
+            policy.record_latency(time.monotonic() - start_time)
+            return response
+
+        attempt_headers = [request_headers]
+        first_attempt_started = Event()
+        attempts = [executor.submit(send, request_headers, first_attempt_started)]
+        # The hedge delay is counted from when the first attempt was sent, so that waiting for a busy executor doesn't trigger hedges
+        first_attempt_started.wait()
+        done, _ = wait(attempts, timeout=policy.hedge_delay())
+        if not done and policy.try_acquire_hedge():
+            attempt_headers.append(self._hedge_request_headers(request_headers))
+            attempts.append(executor.submit(send, attempt_headers[-1]))
+
+        winner = None
+        pending = set(attempts)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in attempts if f in done and _succeeded(f)), None)
+
+        # If all the attempts failed, report the failure of the original attempt
+        winner = winner or attempts[0]
+        for attempt, headers in zip(attempts, attempt_headers):
+            if attempt is winner:
+                continue
+            attempt.add_done_callback(_close_response)
+            # The losing query keeps running on the cluster until it's cancelled
+            if not attempt.done() or _succeeded(attempt):
+                executor.submit(self._cancel_query, database, headers["x-ms-client-request-id"])
+
+        return winner.result()
+
+
+def _succeeded(attempt: "Future[Response]") -> bool:
+    return attempt.exception() is None and attempt.result().status_code < 400
+
+
+def _close_response(attempt: "Future[Response]"):
+    if attempt.exception() is None:
+        attempt.result().close()
@@ -1,10 +1,25 @@
-from typing import TYPE_CHECKING, Union
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Union, Optional, List, Iterator, Sequence
 
 import numpy as np
 
 if TYPE_CHECKING:
     import pandas
-    from azure.kusto.data._models import KustoResultTable, KustoStreamingResultTable
+    import polars
+    from azure.kusto.data._models import KustoResultTable, KustoStreamingResultTable, KustoResultColumn
+
+# The range of nanosecond precision timestamps. Kusto datetimes outside of it are converted to nulls, as pandas does.
+_NANOSECONDS_DATETIME_MIN = datetime(1677, 9, 21, 0, 12, 44, tzinfo=timezone.utc)
+_NANOSECONDS_DATETIME_MAX = datetime(2262, 4, 11, 23, 47, 16, tzinfo=timezone.utc)
+_KUSTO_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S%.fZ"
+_KUSTO_TIMESPAN_PATTERN = r"^(?P<sign>-?)(?:(?P<d>\d+)\.)?(?P<h>\d{2}):(?P<m>\d{2}):(?P<s>\d{2})(?:\.(?P<f>\d+))?$"
+# The range of nanosecond precision durations. Kusto timespans outside of it, which are up to 100 times longer, are converted to nulls.
+_MAX_DURATION_NANOSECONDS = 2**63 - 1
+_MAX_DURATION_TICKS = _MAX_DURATION_NANOSECONDS // 100
+# Polars decimals hold up to 38 digits. Decimal columns that need more are kept as strings.
+_MAX_DECIMAL_PRECISION = 38
 
 
 # Copyright (c) Microsoft Corporation.
@@ -30,9 +45,19 @@ def to_pandas_timedelta(raw_value: Union[int, float, str]) -> "pandas.Timedelta"
             return pd.to_timedelta(formatted_value)
 
 
-def dataframe_from_result_table(table: "Union[KustoResultTable, KustoStreamingResultTable]") -> "pandas.DataFrame":
+def dataframe_from_result_table(
+    table: "Union[KustoResultTable, KustoStreamingResultTable]",
+    columns: Optional[List[str]] = None,
+    categorical_columns: Optional[List[str]] = None,
+    max_categories: Optional[int] = None,
+    max_workers: Optional[int] = None,
+) -> "pandas.DataFrame":
     """Converts Kusto tables into pandas DataFrame.
     :param azure.kusto.data._models.KustoResultTable table: Table received from the response.
+    :param columns: If given, only these columns are converted, in this order.
+    :param categorical_columns: Columns to convert to `pandas.Categorical`, which stores every distinct value once.
+    :param int max_categories: If given, string columns with at most this many distinct values are also converted to `pandas.Categorical`.
+    :param int max_workers: If given, columns are converted in parallel by a thread pool of this size. Useful for wide tables.
     :return: pandas DataFrame.
     """
     import pandas as pd
@@ -40,28 +65,253 @@ def dataframe_from_result_table(table: "Union[KustoResultTable, KustoStreamingRe
     if not table:
         raise ValueError()
 
-    from azure.kusto.data._models import KustoResultTable, KustoStreamingResultTable
+    from azure.kusto.data._models import KustoResultTable, KustoStreamingResultTable, KustoResultColumn, ColumnProjection, ConversionPlan
 
     if not isinstance(table, KustoResultTable) and not isinstance(table, KustoStreamingResultTable):
         raise TypeError("Expected KustoResultTable or KustoStreamingResultTable got {}".format(type(table).__name__))
 
-    columns = [col.column_name for col in table.columns]
-    frame = pd.DataFrame(table.raw_rows, columns=columns)
-
-    # fix types
-    for col in table.columns:
-        if col.column_type == "bool":
-            frame[col.column_name] = frame[col.column_name].astype(bool)
-        elif col.column_type == "int":
-            frame[col.column_name] = frame[col.column_name].astype("Int32")
-        elif col.column_type == "long":
-            frame[col.column_name] = frame[col.column_name].astype("Int64")
-        elif col.column_type == "real" or col.column_type == "decimal":
-            frame[col.column_name] = frame[col.column_name].replace("NaN", np.NaN).replace("Infinity", np.PINF).replace("-Infinity", np.NINF)
-            frame[col.column_name] = pd.to_numeric(frame[col.column_name], errors="coerce").astype("Float64")
-        elif col.column_type == "datetime":
-            frame[col.column_name] = pd.to_datetime(frame[col.column_name], errors="coerce")
-        elif col.column_type == "timespan":
-            frame[col.column_name] = frame[col.column_name].apply(to_pandas_timedelta)
+    table_columns = table.columns
+    raw_rows = table.raw_rows if isinstance(table, KustoResultTable) else table.iter_raw_rows(decode_lazy=True)
+    plan = table.conversion_plan
+    if columns is not None:
+        projection = ColumnProjection(table.raw_columns, columns)
+        table_columns = [KustoResultColumn(column, index) for index, column in enumerate(projection.columns)]
+        raw_rows = [projection.project(row) for row in raw_rows]
+        plan = ConversionPlan(table_columns)
+
+    frame = pd.DataFrame(raw_rows, columns=[col.column_name for col in table_columns])
+
+    # fix types - every column is converted in a single pass, by a converter chosen once from its Kusto type
+    conversions = [(name, _PANDAS_CONVERTERS.get(column_type)) for name, column_type in zip(plan.column_names, plan.column_types)]
+    conversions = [(name, converter) for name, converter in conversions if converter is not None]
+    if max_workers is not None and max_workers > 1 and len(conversions) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            converted = list(executor.map(lambda conversion: conversion[1](frame[conversion[0]]), conversions))
+    else:
+        converted = [converter(frame[name]) for name, converter in conversions]
+    if converted:
+        converted_columns = dict(zip((name for name, _ in conversions), converted))
+        frame = pd.DataFrame({name: converted_columns.get(name, frame[name]) for name in frame.columns}, index=frame.index)
+
+    if categorical_columns:
+        missing = [name for name in categorical_columns if name not in frame.columns]
+        if missing:
+            raise ValueError("Columns {} do not exist in the result table".format(", ".join(missing)))
+        for name in categorical_columns:
+            frame[name] = frame[name].astype("category")
+
+    if max_categories is not None:
+        for name, column_type in zip(plan.column_names, plan.column_types):
+            if column_type == "string" and frame[name].dtype != "category" and _has_few_values(frame[name], max_categories):
+                frame[name] = frame[name].astype("category")
 
     return frame
+
+
+def _to_pandas_bool(series: "pandas.Series") -> "pandas.Series":
+    return series.astype(bool)
+
+
+def _to_pandas_int(series: "pandas.Series") -> "pandas.Series":
+    return series.astype("Int32")
+
+
+def _to_pandas_long(series: "pandas.Series") -> "pandas.Series":
+    return series.astype("Int64")
+
+
+def _to_pandas_real(series: "pandas.Series") -> "pandas.Series":
+    import pandas as pd
+
+    try:
+        # numpy parses the "NaN", "Infinity" and "-Infinity" strings Kusto sends, and turns nulls into NaN
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    except (ValueError, TypeError):
+        values = pd.to_numeric(series.replace({"NaN": np.NaN, "Infinity": np.PINF, "-Infinity": np.NINF}), errors="coerce").to_numpy(dtype=np.float64)
+    return pd.Series(pd.array(values, dtype="Float64"), index=series.index, name=series.name)
+
+
+def _to_pandas_datetime(series: "pandas.Series") -> "pandas.Series":
+    import pandas as pd
+
+    return pd.to_datetime(series, errors="coerce")
+
+
+def _to_pandas_timespan(series: "pandas.Series") -> "pandas.Series":
+    import pandas as pd
+
+    if series.dtype.kind in "iuf":
+        return pd.to_timedelta(series * 100, unit="ns")
+
+    # Kusto sends timespans either as ticks or as 'd.hh:mm:ss.fffffff' strings, sometimes mixed in the same column
+    if pd.api.types.infer_dtype(series, skipna=True) == "string":
+        ticks, is_ticks = None, np.zeros(len(series), dtype=bool)
+    else:
+        ticks = pd.to_numeric(series, errors="coerce")
+        is_ticks = ticks.notna().to_numpy()
+    is_text = series.notna().to_numpy() & ~is_ticks
+
+    result = pd.Series(pd.NaT, index=series.index, name=series.name, dtype="timedelta64[ns]")
+    if is_ticks.any():
+        result[is_ticks] = pd.to_timedelta(ticks[is_ticks] * 100, unit="ns")
+    if is_text.any():
+        result[is_text] = pd.to_timedelta([_to_pandas_timespan_text(value) for value in series[is_text]])
+    return result
+
+
+def _to_pandas_timespan_text(value: str) -> str:
+    # The timespan format Kusto returns is 'd.hh:mm:ss.fffffff', pandas expects 'd days hh:mm:ss.fffffff'
+    dot = value.find(".")
+    return value if dot < 0 or dot > value.find(":") else value.replace(".", " days ", 1)
+
+
+_PANDAS_CONVERTERS = {
+    "bool": _to_pandas_bool,
+    "int": _to_pandas_int,
+    "long": _to_pandas_long,
+    "real": _to_pandas_real,
+    "decimal": _to_pandas_real,
+    "datetime": _to_pandas_datetime,
+    "timespan": _to_pandas_timespan,
+}
+
+
+# Cardinality is first checked on a sample, to avoid hashing entire columns that are obviously not categorical
+_CARDINALITY_SAMPLE_SIZE = 10000
+
+
+def _has_few_values(series: "pandas.Series", max_values: int) -> bool:
+    if len(series) > _CARDINALITY_SAMPLE_SIZE and series.iloc[:_CARDINALITY_SAMPLE_SIZE].nunique(dropna=False) > max_values:
+        return False
+    return series.nunique(dropna=False) <= max_values
+
+
+def _polars_datetime_series(name: str, values: Sequence) -> "polars.Series":
+    import polars as pl
+
+    strings = pl.Series(name, values, dtype=pl.String)
+    # Parsing at nanosecond precision overflows (or, on some polars versions, panics), so the range is checked on a microsecond precision parse
+    # and only the values within it are parsed again at nanosecond precision
+    microseconds = strings.str.strptime(pl.Datetime("us", "UTC"), _KUSTO_DATETIME_FORMAT, strict=False)
+    in_range = microseconds.is_between(_NANOSECONDS_DATETIME_MIN, _NANOSECONDS_DATETIME_MAX)
+    strings_in_range = pl.select(pl.when(in_range).then(strings).alias(name)).to_series()
+    return strings_in_range.str.strptime(pl.Datetime("ns", "UTC"), _KUSTO_DATETIME_FORMAT, strict=False)
+
+
+def _polars_timespan_series(name: str, values: Sequence) -> "polars.Series":
+    import polars as pl
+    from azure.kusto.data._converters import to_timedelta
+
+    raw = pl.Series(name, values, strict=False)
+    if raw.dtype != pl.String:
+        if not (raw.dtype.is_integer() or raw.dtype.is_float()):
+            raw = pl.Series(name, [None if v is None else to_timedelta(v) // timedelta(microseconds=1) * 10 for v in values], dtype=pl.Int64)
+        # Kusto saves up to ticks, 1 tick == 100 nanoseconds
+        ticks = raw.cast(pl.Int64) if raw.dtype.is_integer() else raw.cast(pl.Float64)
+        nanoseconds = pl.when(ticks.is_between(-_MAX_DURATION_TICKS, _MAX_DURATION_TICKS)).then((ticks * 100).cast(pl.Int64, strict=False))
+        return pl.select(nanoseconds.alias(name)).to_series().cast(pl.Duration("ns"))
+
+    # Values are either 'd.hh:mm:ss.fffffff' strings or numbers of ticks (which polars converted to strings)
+    parts = raw.str.extract_groups(_KUSTO_TIMESPAN_PATTERN).struct
+    seconds = parts.field("d").cast(pl.Int64).fill_null(0) * 86400 + parts.field("h").cast(pl.Int64) * 3600
+    seconds = seconds + parts.field("m").cast(pl.Int64) * 60 + parts.field("s").cast(pl.Int64)
+    fraction = parts.field("f").fill_null("").str.pad_end(9, "0").str.slice(0, 9).cast(pl.Int64)
+    # Checked before multiplying, since int64 arithmetic overflows silently
+    max_seconds, max_fraction = divmod(_MAX_DURATION_NANOSECONDS, 1_000_000_000)
+    in_range = (seconds < max_seconds) | ((seconds == max_seconds) & (fraction <= max_fraction))
+    nanoseconds = seconds * 1_000_000_000 + fraction
+    ticks = raw.cast(pl.Float64, strict=False)
+    result = pl.select(
+        pl.when(parts.field("sign").is_null())
+        .then(pl.when(ticks.is_between(-_MAX_DURATION_TICKS, _MAX_DURATION_TICKS)).then((ticks * 100).cast(pl.Int64, strict=False)))
+        .when(~in_range)
+        .then(None)
+        .when(parts.field("sign") == "-")
+        .then(-nanoseconds)
+        .otherwise(nanoseconds)
+    ).to_series()
+    return result.cast(pl.Duration("ns")).alias(name)
+
+
+def _polars_decimal_series(name: str, values: Sequence) -> "polars.Series":
+    import polars as pl
+
+    strings = pl.Series(name, values, strict=False).cast(pl.String)
+    scale = strings.str.extract(r"\.(\d+)$").str.len_chars().max() or 0
+    integer_digits = strings.str.extract(r"^-?(\d*)").str.len_chars().max() or 0
+    if integer_digits + scale > _MAX_DECIMAL_PRECISION:
+        return strings
+    return strings.cast(pl.Decimal(_MAX_DECIMAL_PRECISION, scale))
+
+
+def _polars_series(column: "KustoResultColumn", values: Sequence) -> "polars.Series":
+    import polars as pl
+
+    name = column.column_name
+    column_type = column.column_type.lower()
+    if column_type == "bool":
+        return pl.Series(name, values, dtype=pl.Boolean)
+    if column_type == "int":
+        return pl.Series(name, values, dtype=pl.Int32)
+    if column_type == "long":
+        return pl.Series(name, values, dtype=pl.Int64)
+    if column_type == "real":
+        try:
+            return pl.Series(name, values, dtype=pl.Float64)
+        except TypeError:
+            # NaN and infinity are sent as strings
+            return pl.Series(name, [float(v) if isinstance(v, str) else v for v in values], dtype=pl.Float64)
+    if column_type == "decimal":
+        return _polars_decimal_series(name, values)
+    if column_type == "datetime":
+        return _polars_datetime_series(name, values)
+    if column_type == "timespan":
+        return _polars_timespan_series(name, values)
+    if column_type == "dynamic":
+        return pl.Series(name, values, dtype=pl.Object)
+    return pl.Series(name, values, dtype=pl.String)
+
+
+def _polars_frame(columns: "List[KustoResultColumn]", rows: List[list]) -> "polars.DataFrame":
+    import polars as pl
+
+    column_values = list(zip(*rows)) if rows else [()] * len(columns)
+    return pl.DataFrame([_polars_series(column, values) for column, values in zip(columns, column_values)])
+
+
+def polars_from_result_table(table: "Union[KustoResultTable, KustoStreamingResultTable]") -> "polars.DataFrame":
+    """Converts a Kusto table into a polars DataFrame, building its columns directly rather than through pandas.
+    Datetimes and timespans keep their full (100 nanoseconds) precision. Datetimes that nanosecond timestamps can't represent become nulls.
+    Decimals are converted to polars decimals, and dynamic values are kept as python objects.
+    :param azure.kusto.data._models.KustoResultTable table: Table received from the response.
+    :return: polars DataFrame.
+    """
+    from azure.kusto.data._models import KustoResultTable, KustoStreamingResultTable
+
+    if not isinstance(table, KustoResultTable) and not isinstance(table, KustoStreamingResultTable):
+        raise TypeError("Expected KustoResultTable or KustoStreamingResultTable got {}".format(type(table).__name__))
+
+    rows = table.raw_rows if isinstance(table, KustoResultTable) else list(table.iter_raw_rows(decode_lazy=True))
+    return _polars_frame(table.columns, rows)
+
+
+def polars_chunks_from_result_table(table: "KustoStreamingResultTable", chunk_size: int = 100000) -> "Iterator[polars.DataFrame]":
+    """Converts a streamed Kusto table into polars DataFrames of up to `chunk_size` rows each, as the rows arrive.
+    Only one chunk of rows is held in memory at a time. The chunks can be processed one by one or combined with `polars.concat`.
+    :param azure.kusto.data._models.KustoStreamingResultTable table: Table received from a streaming query.
+    :param int chunk_size: The maximal number of rows in each DataFrame.
+    :return: An iterator of polars DataFrames.
+    """
+    from azure.kusto.data._models import KustoStreamingResultTable
+
+    if not isinstance(table, KustoStreamingResultTable):
+        raise TypeError("Expected KustoStreamingResultTable got {}".format(type(table).__name__))
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+
+    rows = table.iter_raw_rows(decode_lazy=True)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield _polars_frame(table.columns, chunk)
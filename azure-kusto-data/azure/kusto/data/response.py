@@ -1,9 +1,9 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
 from abc import ABCMeta, abstractmethod
-from typing import List, Iterator, Union, Dict, Any
+from typing import List, Iterator, Union, Dict, Any, Optional
 
-from ._models import KustoResultTable, WellKnownDataSet, KustoStreamingResultTable, BaseKustoResultTable
+from ._models import KustoResultTable, WellKnownDataSet, KustoStreamingResultTable, BaseKustoResultTable, ConversionOverrides
 from .exceptions import KustoStreamingQueryError
 from .streaming_response import StreamingDataSetEnumerator, FrameType
 
@@ -12,6 +12,7 @@ class BaseKustoResponseDataSet(metaclass=ABCMeta):
     tables: list
     tables_count: int
     tables_names: list
+    _conversion_overrides: Optional[ConversionOverrides] = None
 
     @property
     @abstractmethod
@@ -62,6 +63,15 @@ class BaseKustoResponseDataSet(metaclass=ABCMeta):
     def __iter__(self) -> Iterator[BaseKustoResultTable]:
         return iter(self.tables)
 
+    def set_conversion_overrides(self, overrides: Optional[ConversionOverrides]):
+        """
+        Changes how the values of the rows of all the tables in the data set are converted, including tables that are yet to be streamed.
+        :param overrides: The conversions to override, or None to restore the default conversions.
+        """
+        self._conversion_overrides = overrides
+        for table in self.tables:
+            table.set_conversion_overrides(overrides)
+
     def __getitem__(self, key: Union[int, str]) -> KustoResultTable:
         if isinstance(key, int):
             return self.tables[key]
@@ -83,8 +93,12 @@ class KustoResponseDataSet(BaseKustoResponseDataSet, metaclass=ABCMeta):
         It can contain more than one table when [`fork`](https://docs.microsoft.com/en-us/azure/kusto/query/forkoperator) is used.
     """
 
-    def __init__(self, json_response: List[Dict[str, Any]]):
-        self.tables = [KustoResultTable(t) for t in json_response]
+    def __init__(self, json_response: List[Dict[str, Any]], columns: Optional[List[str]] = None):
+        """
+        :param json_response: The tables of the response.
+        :param columns: If given, only these columns of the primary results are kept.
+        """
+        self.tables = [KustoResultTable(t, columns if t.get("TableKind") == WellKnownDataSet.PrimaryResult.value else None) for t in json_response]
         self.tables_count = len(self.tables)
         self.tables_names = [t.table_name for t in self.tables]
 
@@ -147,8 +161,8 @@ class KustoResponseDataSetV2(KustoResponseDataSet):
     _error_column = "Level"
     _crid_column = "ClientRequestId"
 
-    def __init__(self, json_response: List[dict]):
-        super(KustoResponseDataSetV2, self).__init__([t for t in json_response if t["FrameType"] == "DataTable"])
+    def __init__(self, json_response: List[dict], columns: Optional[List[str]] = None):
+        super(KustoResponseDataSetV2, self).__init__([t for t in json_response if t["FrameType"] == "DataTable"], columns)
 
 
 class KustoStreamingResponseDataSet(BaseKustoResponseDataSet):
@@ -159,6 +173,7 @@ class KustoStreamingResponseDataSet(BaseKustoResponseDataSet):
     def __init__(self, streamed_data: StreamingDataSetEnumerator):
         self._current_table = None
         self._skip_incomplete_tables = False
+        self._cancel_query_on_close = False
         self.tables = []
         self.streamed_data = streamed_data
         self.finished = False
@@ -166,11 +181,30 @@ class KustoStreamingResponseDataSet(BaseKustoResponseDataSet):
     def iter_primary_results(self) -> "PrimaryResultsIterator":
         return PrimaryResultsIterator(self)
 
+    def close(self, cancel_query: Optional[bool] = None):
+        """
+        Stops reading the response and releases its connection, so it can be called when the data set is abandoned before it was fully read.
+        :param bool cancel_query: Whether to cancel the query on the server if the response was not read to the end.
+                                  Defaults to the value set by `set_cancel_query_on_close`.
+        """
+        if cancel_query is None:
+            cancel_query = self._cancel_query_on_close
+        self.streamed_data.close(cancel_query and not self.finished)
+
+    def set_cancel_query_on_close(self, value: bool):
+        self._cancel_query_on_close = value
+
+    def __enter__(self) -> "KustoStreamingResponseDataSet":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def __iter__(self) -> Iterator[Union[KustoResultTable, KustoStreamingResultTable]]:
         return self
 
     def __next__(self) -> Union[KustoResultTable, KustoStreamingResultTable]:
-        if self.finished:
+        if self.finished or self.streamed_data.closed:
             raise StopIteration
 
         if type(self._current_table) is KustoStreamingResultTable and not self._current_table.finished and not self._skip_incomplete_tables:
@@ -191,6 +225,8 @@ class KustoStreamingResponseDataSet(BaseKustoResponseDataSet):
             self._current_table = KustoStreamingResultTable(table)
         else:
             self._current_table = KustoResultTable(table)
+        if self._conversion_overrides is not None:
+            self._current_table.set_conversion_overrides(self._conversion_overrides)
 
         self.tables.append(self._current_table)
         return self._current_table
@@ -1,10 +1,10 @@
 from enum import Enum
-from typing import Optional, Any, Tuple, Dict, AnyStr, IO, List, Iterator
+from typing import Optional, Any, Tuple, Dict, AnyStr, IO, List, Iterator, Callable
 
 import ijson
 from ijson import IncompleteJSONError
 
-from azure.kusto.data._models import WellKnownDataSet
+from azure.kusto.data._models import WellKnownDataSet, LazyDynamicValue, ColumnProjection
 from azure.kusto.data.exceptions import KustoServiceError, KustoTokenParsingError, KustoUnsupportedApiError, KustoApiError, KustoMultiApiError
 
 
@@ -87,6 +87,40 @@ class JsonTokenReader:
     def read_number(self) -> float:
         return self.read_token_of_type(JsonTokenType.NUMBER).token_value
 
+    def read_lazy_value(self, start_token: JsonToken) -> LazyDynamicValue:
+        """Reads the rest of the nested value opened by `start_token`, keeping its raw events instead of building it."""
+        events = [(start_token.token_type.name.lower(), None)]
+        depth = 1
+        try:
+            for _, event, value in self.json_iter:
+                events.append((event, value))
+                if event == "start_map" or event == "start_array":
+                    depth += 1
+                elif event == "end_map" or event == "end_array":
+                    depth -= 1
+                    if depth == 0:
+                        return LazyDynamicValue(events)
+        except IncompleteJSONError:
+            pass
+        raise KustoTokenParsingError("Unexpected end of stream")
+
+    def skip_value(self, token: JsonToken):
+        """Skips the value that starts with `token`, without building it."""
+        if token.token_type not in JsonTokenType.start_tokens():
+            return
+        depth = 1
+        try:
+            for _, event, _ in self.json_iter:
+                if event == "start_map" or event == "start_array":
+                    depth += 1
+                elif event == "end_map" or event == "end_array":
+                    depth -= 1
+                    if depth == 0:
+                        return
+        except IncompleteJSONError:
+            pass
+        raise KustoTokenParsingError("Unexpected end of stream")
+
     def skip_children(self, prev_token: JsonToken):
         if prev_token.token_type == JsonTokenType.MAP_KEY:
             prev_token = self.read_next_token_or_throw()
@@ -134,18 +168,45 @@ class JsonTokenReader:
 
 
 class StreamingDataSetEnumerator:
-    def __init__(self, reader: JsonTokenReader):
+    def __init__(
+        self,
+        reader: JsonTokenReader,
+        close_callback: Optional[Callable[[bool], None]] = None,
+        lazy_dynamic: bool = False,
+        columns: Optional[List[str]] = None,
+    ):
+        """
+        :param JsonTokenReader reader: The reader of the response stream.
+        :param close_callback: Called by `close` to release the response. Receives whether the query should be cancelled on the server.
+        :param bool lazy_dynamic: Whether to keep nested values of dynamic columns raw, as LazyDynamicValue, and decode them only on access.
+        :param columns: If given, only these columns of the primary results are parsed, in this order. The cells of other columns are skipped.
+        """
         self.reader = reader
+        self.lazy_dynamic = lazy_dynamic
+        self.columns = columns
         self.done = False
         self.started = False
         self.started_primary_results = False
         self.finished_primary_results = False
+        self.closed = False
+        self._close_callback = close_callback
+
+    def close(self, cancel_query: bool = False):
+        """
+        Stops reading the response and releases its connection.
+        :param bool cancel_query: Whether to also cancel the query on the server, if it has not been read to the end.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self._close_callback:
+            self._close_callback(cancel_query and not self.done)
 
     def __iter__(self) -> "StreamingDataSetEnumerator":
         return self
 
     def __next__(self) -> Dict[str, Any]:
-        if self.done:
+        if self.done or self.closed:
             raise StopIteration()
 
         if not self.started:
@@ -153,7 +214,7 @@ class StreamingDataSetEnumerator:
             self.started = True
 
         token = self.reader.skip_until_token_with_paths((JsonTokenType.START_MAP, "item"), (JsonTokenType.END_ARRAY, ""))
-        if token == JsonTokenType.END_ARRAY:
+        if token is None or token.token_type == JsonTokenType.END_ARRAY:
             self.done = True
             raise StopIteration()
 
@@ -183,8 +244,12 @@ class StreamingDataSetEnumerator:
                 ("TableName", JsonTokenType.STRING),
                 ("Columns", JsonTokenType.START_ARRAY),
             )
+            projection = None
+            if self.columns is not None and props["TableKind"] == WellKnownDataSet.PrimaryResult.value:
+                projection = ColumnProjection(props["Columns"], self.columns)
+                props["Columns"] = projection.columns
             self.reader.skip_until_property_name("Rows")
-            props["Rows"] = self.row_iterator()
+            props["Rows"] = self.row_iterator(projection)
             if props["TableKind"] != WellKnownDataSet.PrimaryResult.value:
                 props["Rows"] = list(props["Rows"])
             return props
@@ -195,7 +260,7 @@ class StreamingDataSetEnumerator:
                 res["OneApiErrors"] = self.parse_array(skip_start=False)
             return res
 
-    def row_iterator(self) -> Iterator[list]:
+    def row_iterator(self, projection: Optional[ColumnProjection] = None) -> Iterator[list]:
         self.reader.read_token_of_type(JsonTokenType.START_ARRAY)
         while True:
             token = self.reader.read_token_of_type(JsonTokenType.START_ARRAY, JsonTokenType.END_ARRAY, JsonTokenType.START_MAP)
@@ -205,12 +270,16 @@ class StreamingDataSetEnumerator:
                 raise KustoMultiApiError([self.parse_object(skip_start=True)])
             if token.token_type == JsonTokenType.END_ARRAY:
                 return
-            yield self.parse_array(skip_start=True)
+            if projection is None:
+                yield self.parse_array(skip_start=True, lazy_nested=self.lazy_dynamic)
+            else:
+                yield projection.reorder(self.parse_array(skip_start=True, lazy_nested=self.lazy_dynamic, keep=projection.keep))
 
-    def parse_array(self, skip_start: bool) -> list:
+    def parse_array(self, skip_start: bool, lazy_nested: bool = False, keep: Optional[List[bool]] = None) -> list:
         if not skip_start:
             self.reader.read_start_array()
         arr = []
+        index = -1
 
         while True:
             token = self.reader.read_token_of_type(
@@ -226,7 +295,12 @@ class StreamingDataSetEnumerator:
             if token.token_type == JsonTokenType.END_ARRAY:
                 return arr
 
-            if token.token_type == JsonTokenType.START_MAP:
+            index += 1
+            if keep is not None and not keep[index]:
+                self.reader.skip_value(token)
+            elif lazy_nested and token.token_type in JsonTokenType.start_tokens():
+                arr.append(self.reader.read_lazy_value(token))
+            elif token.token_type == JsonTokenType.START_MAP:
                 arr.append(self.parse_object(skip_start=True))
             elif token.token_type == JsonTokenType.START_ARRAY:
                 arr.append(self.parse_array(skip_start=True))
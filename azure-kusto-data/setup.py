@@ -44,5 +44,5 @@ setup(
     keywords="kusto wrapper client library",
     packages=find_packages(exclude=["azure", "tests"]),
     install_requires=["python-dateutil>=2.8.0", "requests>=2.13.0", "azure-identity>=1.5.0,<2", "msal>=1.9.0,<2", "ijson~=3.1"],
-    extras_require={"pandas": ["pandas"], "aio": ["aiohttp>=3.4.4,<4", "asgiref>=3.2.3,<4"]},
+    extras_require={"pandas": ["pandas"], "polars": ["polars>=1.0.0"], "arrow": ["pyarrow"], "orjson": ["orjson"], "aio": ["aiohttp>=3.4.4,<4", "asgiref>=3.2.3,<4"]},
 )
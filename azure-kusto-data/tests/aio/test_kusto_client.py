@@ -1,16 +1,21 @@
 """Tests for KustoClient."""
+
+import asyncio
 import json
 import sys
+from datetime import timedelta
 from unittest.mock import patch
 
 import pytest
 
+from azure.kusto.data import HedgingPolicy
 from azure.kusto.data._cloud_settings import CloudSettings
 from azure.kusto.data._decorators import aio_documented_by
 from azure.kusto.data.client import ClientRequestProperties
 from azure.kusto.data.exceptions import KustoMultiApiError
 from azure.kusto.data.helpers import dataframe_from_result_table
 from ..kusto_client_common import KustoClientTestsMixin, mocked_requests_post, proxy_kcsb
+from ..test_hedging import TestKustoClientHedging as KustoClientHedgingTestsSync
 from ..test_kusto_client import TestKustoClient as KustoClientTestsSync
 
 PANDAS = False
@@ -65,6 +70,33 @@ class TestKustoClient(KustoClientTestsMixin):
             self._assert_client_request_id(first_request[0].kwargs)
         self._assert_sanity_query_response(response)
 
+    @pytest.mark.asyncio
+    async def test_streaming_query_to_file(self, tmp_path):
+        """Tests exporting a streaming query to a CSV file."""
+        path = str(tmp_path / "deft.csv")
+        with aioresponses() as aioresponses_mock:
+            self._mock_query(aioresponses_mock)
+            async with KustoClient(self.HOST) as client:
+                assert await client.execute_streaming_query_to_file("PythonTest", "Deft", path, batch_size=4) == 11
+
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        assert len(lines) == 12
+        assert lines[0].startswith("rownumber,rowguid,xdouble")
+
+    @pytest.mark.asyncio
+    async def test_streaming_query_columns_projection(self):
+        """Tests keeping only some of the columns of the primary result of a streaming query."""
+        with aioresponses() as aioresponses_mock:
+            self._mock_query(aioresponses_mock)
+            async with KustoClient(self.HOST) as client:
+                async with await client.execute_streaming_query("PythonTest", "Deft", columns=["xtext", "rownumber", "xdynamicWithNulls"]) as response:
+                    table = await response.iter_primary_results().__anext__()
+                    assert [c.column_name for c in table.columns] == ["xtext", "rownumber", "xdynamicWithNulls"]
+                    rows = [row async for row in table]
+        assert rows[1].to_list() == ["Zero", 0, ""]
+        assert rows[2].to_list() == ["One", 1, {"rowId": 1, "arr": [0, 1]}]
+
     @aio_documented_by(KustoClientTestsSync.test_sanity_control_command)
     @pytest.mark.asyncio
     async def test_sanity_control_command(self):
@@ -162,6 +194,37 @@ range x from 1 to 10 step 1"""
             self._assert_client_request_id(first_request[0].kwargs, value=request_id)
         self._assert_sanity_query_response(response)
 
+    @aio_documented_by(KustoClientHedgingTestsSync.test_slow_query_is_hedged)
+    @pytest.mark.asyncio
+    async def test_slow_query_is_hedged(self):
+        release_first_attempt = asyncio.Event()
+
+        async def callback(url, **kwargs):
+            if not kwargs["headers"]["x-ms-client-request-id"].endswith(";hedge"):
+                await asyncio.wait_for(release_first_attempt.wait(), 5)
+            return self._mock_callback(url, **kwargs)
+
+        with aioresponses() as aioresponses_mock:
+            url = "{host}/v2/rest/query".format(host=self.HOST)
+            aioresponses_mock.post(url, callback=callback, repeat=True)
+            self._mock_mgmt(aioresponses_mock)
+            async with KustoClient(self.HOST) as client:
+                client.set_query_hedging_policy(HedgingPolicy(delay=timedelta(milliseconds=10), max_hedge_ratio=1))
+                response = await client.execute_query("PythonTest", "Deft")
+                # The losing attempt is cancelled on the cluster in the background
+                await asyncio.gather(*client._background_tasks)
+            release_first_attempt.set()
+            requests = [request for (method, request_url), requests in aioresponses_mock.requests.items() for request in requests if str(request_url) == url]
+            assert len(requests) == 2
+            first_request_id = requests[0].kwargs["headers"]["x-ms-client-request-id"]
+            assert requests[1].kwargs["headers"]["x-ms-client-request-id"] == first_request_id + ";hedge"
+            mgmt_requests = [
+                request for (method, request_url), requests in aioresponses_mock.requests.items() for request in requests if str(request_url) != url
+            ]
+            assert len(mgmt_requests) == 1
+            assert json.loads(mgmt_requests[0].kwargs["data"])["csl"] == '.cancel query "{}"'.format(first_request_id)
+        self._assert_sanity_query_response(response)
+
     @aio_documented_by(KustoClientTestsSync.test_proxy_token_providers)
     @pytest.mark.asyncio
     async def test_proxy_token_providers(self, proxy_kcsb):
@@ -0,0 +1,92 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+"""
+Compares `dataframe_from_result_table` with the previous per-step column conversion on wide tables.
+Run from the azure-kusto-data directory: python -m tests.benchmarks.dataframe_conversion
+"""
+import argparse
+import random
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from azure.kusto.data._models import KustoResultTable
+from azure.kusto.data.helpers import dataframe_from_result_table, to_pandas_timedelta
+
+COLUMN_TYPES = ["real", "decimal", "timespan", "datetime", "long", "int", "bool", "string"]
+
+
+def legacy_dataframe_from_result_table(table: KustoResultTable) -> pd.DataFrame:
+    frame = pd.DataFrame(table.raw_rows, columns=[col.column_name for col in table.columns])
+    for col in table.columns:
+        if col.column_type == "bool":
+            frame[col.column_name] = frame[col.column_name].astype(bool)
+        elif col.column_type == "int":
+            frame[col.column_name] = frame[col.column_name].astype("Int32")
+        elif col.column_type == "long":
+            frame[col.column_name] = frame[col.column_name].astype("Int64")
+        elif col.column_type == "real" or col.column_type == "decimal":
+            frame[col.column_name] = frame[col.column_name].replace("NaN", np.NaN).replace("Infinity", np.PINF).replace("-Infinity", np.NINF)
+            frame[col.column_name] = pd.to_numeric(frame[col.column_name], errors="coerce").astype("Float64")
+        elif col.column_type == "datetime":
+            frame[col.column_name] = pd.to_datetime(frame[col.column_name], errors="coerce")
+        elif col.column_type == "timespan":
+            frame[col.column_name] = frame[col.column_name].apply(to_pandas_timedelta)
+    return frame
+
+
+def random_value(column_type: str, rnd: random.Random):
+    if rnd.random() < 0.05:
+        return None
+    if column_type == "real":
+        return rnd.choice([rnd.random() * 1000, rnd.random(), "NaN", "Infinity", "-Infinity"]) if rnd.random() < 0.01 else rnd.random() * 1000
+    if column_type == "decimal":
+        return "{:.4f}".format(rnd.random() * 1000)
+    if column_type == "timespan":
+        return "{}.{:02}:{:02}:{:02}.{:07}".format(rnd.randrange(10), rnd.randrange(24), rnd.randrange(60), rnd.randrange(60), rnd.randrange(10**7))
+    if column_type == "datetime":
+        return "2022-{:02}-{:02}T{:02}:{:02}:{:02}.{:07}Z".format(rnd.randrange(1, 13), rnd.randrange(1, 29), rnd.randrange(24), rnd.randrange(60), 0, 0)
+    if column_type in ("long", "int"):
+        return rnd.randrange(-(2**31), 2**31)
+    if column_type == "bool":
+        return rnd.random() < 0.5
+    return "value{}".format(rnd.randrange(1000))
+
+
+def wide_table(columns: int, rows: int, seed: int = 0) -> KustoResultTable:
+    rnd = random.Random(seed)
+    types = [COLUMN_TYPES[i % len(COLUMN_TYPES)] for i in range(columns)]
+    return KustoResultTable(
+        {
+            "TableName": "Table_0",
+            "Columns": [{"ColumnName": "c{}".format(i), "ColumnType": column_type} for i, column_type in enumerate(types)],
+            "Rows": [[random_value(column_type, rnd) for column_type in types] for _ in range(rows)],
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--columns", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    table = wide_table(args.columns, args.rows)
+    pd.testing.assert_frame_equal(legacy_dataframe_from_result_table(table), dataframe_from_result_table(table), check_dtype=False)
+
+    candidates = {
+        "legacy": lambda: legacy_dataframe_from_result_table(table),
+        "single pass": lambda: dataframe_from_result_table(table),
+        "single pass, {} workers".format(args.workers): lambda: dataframe_from_result_table(table, max_workers=args.workers),
+    }
+    print("{} columns x {} rows".format(args.columns, args.rows))
+    for name, candidate in candidates.items():
+        best = min(timeit.repeat(candidate, number=1, repeat=args.repeat))
+        print("{:<30} {:8.3f}s".format(name, best))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+"""
+Measures the overhead of building the headers and body of query and streaming ingestion requests, compared to the previous construction
+that copied the default headers, serialized the properties on every request, and left the body encoding to the HTTP library.
+Run from the azure-kusto-data directory: python -m tests.benchmarks.request_construction
+"""
+import argparse
+import io
+import json
+import timeit
+import uuid
+from copy import copy
+from datetime import timedelta
+
+from azure.kusto.data import KustoClient, ClientRequestProperties
+from azure.kusto.data.client import ExecuteRequestParams
+
+QUERY = "StormEvents | where StartTime > ago(1d) | summarize count() by State | top 10 by count_"
+TIMEOUT = timedelta(minutes=4)
+
+
+def legacy_to_json(properties: ClientRequestProperties) -> str:
+    # The properties were serialized on every request
+    return json.dumps({"Options": properties._options, "Parameters": properties._parameters}, default=str)
+
+
+def legacy_request(database, payload, properties, query, timeout, request_headers):
+    request_headers = copy(request_headers)
+    body = None
+    if not payload:
+        json_payload = {"db": database, "csl": query}
+        if properties:
+            json_payload["properties"] = legacy_to_json(properties)
+        request_headers["Content-Type"] = "application/json; charset=utf-8"
+        client_request_id_prefix = "KPC.execute;"
+        # requests encoded the json payload on every post
+        body = json.dumps(json_payload).encode("utf-8")
+    else:
+        if properties:
+            request_headers.update(json.loads(legacy_to_json(properties))["Options"])
+        client_request_id_prefix = "KPC.executeStreamingIngest;"
+        request_headers["Content-Encoding"] = "gzip"
+    request_headers["x-ms-client-request-id"] = client_request_id_prefix + str(uuid.uuid4())
+    if properties is not None:
+        if properties.application is not None:
+            request_headers["x-ms-app"] = properties.application
+        timeout = properties.get_option(ClientRequestProperties.request_timeout_option_name, timeout)
+    return request_headers, body, timeout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+
+    client = KustoClient("https://somecluster.kusto.windows.net")
+    properties = ClientRequestProperties()
+    properties.application = "benchmark"
+    properties.set_option(ClientRequestProperties.results_defer_partial_query_failures_option_name, False)
+    properties.set_option(ClientRequestProperties.request_timeout_option_name, timedelta(minutes=2))
+    properties.set_parameter("state", "TEXAS")
+    payload = io.BytesIO(b"data")
+
+    candidates = {
+        "query (legacy)": lambda: legacy_request("db", None, properties, QUERY, TIMEOUT, client._request_headers),
+        "query": lambda: ExecuteRequestParams("db", None, properties, QUERY, TIMEOUT, client._request_headers_template(None)),
+        "ingest (legacy)": lambda: legacy_request("db", payload, properties, None, TIMEOUT, client._request_headers),
+        "ingest": lambda: ExecuteRequestParams("db", payload, properties, None, TIMEOUT, client._request_headers_template(payload)),
+    }
+    for name, candidate in candidates.items():
+        best = min(timeit.repeat(candidate, number=args.number, repeat=3))
+        print("{:<20} {:8.2f}us per request".format(name, best / args.number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
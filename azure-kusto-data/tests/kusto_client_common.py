@@ -5,6 +5,7 @@ import os
 import uuid
 from datetime import datetime, timedelta
 from io import StringIO
+from types import SimpleNamespace
 from typing import Optional, Any, Dict, Union, Iterator, Tuple
 
 import pytest
@@ -43,11 +44,16 @@ def mocked_requests_post(*args, **kwargs):
             self.reason = ""
             self.url = url
             self.raw = Raw(json.dumps(json_data))
+            self.request = SimpleNamespace(headers=kwargs.get("headers"))
+            self.elapsed = timedelta(milliseconds=1)
 
         def json(self) -> Optional[Dict[str, Any]]:
             """Get json data from response."""
             return self.json_data
 
+        def close(self):
+            self.raw.close()
+
         def raise_for_status(self):
             """Raises stored :class:`HTTPError`, if one occurred."""
             http_error_msg = ""
@@ -73,19 +79,21 @@ def mocked_requests_post(*args, **kwargs):
                 raise HTTPError(http_error_msg, response=self)
 
     url = args[0]
+    body = kwargs.get("data")
+    request_json = json.loads(body) if isinstance(body, bytes) else kwargs.get("json")
     if url == "https://somecluster.kusto.windows.net/v2/rest/query":
-        if "truncationmaxrecords" in kwargs["json"]["csl"]:
-            if json.loads(kwargs["json"]["properties"])["Options"]["deferpartialqueryfailures"]:
+        if "truncationmaxrecords" in request_json["csl"]:
+            if json.loads(request_json["properties"])["Options"]["deferpartialqueryfailures"]:
                 file_name = "query_partial_results_defer_is_true.json"
             else:
                 file_name = "query_partial_results_defer_is_false.json"
-        elif "Deft" in kwargs["json"]["csl"]:
+        elif "Deft" in request_json["csl"]:
             file_name = "deft.json"
-        elif "print dynamic" in kwargs["json"]["csl"]:
+        elif "print dynamic" in request_json["csl"]:
             file_name = "dynamic.json"
-        elif "take 0" in kwargs["json"]["csl"]:
+        elif "take 0" in request_json["csl"]:
             file_name = "zero_results.json"
-        elif "PrimaryResultName" in kwargs["json"]["csl"]:
+        elif "PrimaryResultName" in request_json["csl"]:
             file_name = "null_values.json"
         else:
             raise Exception("Invalid file name")
@@ -95,7 +103,7 @@ def mocked_requests_post(*args, **kwargs):
         return MockResponse(json.loads(data), 200, url)
 
     elif url == "https://somecluster.kusto.windows.net/v1/rest/mgmt":
-        if kwargs["json"]["csl"] == ".show version":
+        if request_json["csl"] == ".show version":
             file_name = "versionshowcommandresult.json"
         else:
             file_name = "adminthenquery.json"
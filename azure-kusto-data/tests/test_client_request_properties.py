@@ -1,10 +1,14 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
 
+import io
+import json
 import unittest
 from datetime import timedelta
+from types import MappingProxyType
 
 from azure.kusto.data import ClientRequestProperties
+from azure.kusto.data.client import ExecuteRequestParams
 
 
 class ClientRequestPropertiesTests(unittest.TestCase):
@@ -36,3 +40,34 @@ class ClientRequestPropertiesTests(unittest.TestCase):
 
         crp.user = "myUser"
         assert crp.user == "myUser"
+
+    def test_serialization_is_cached(self):
+        crp = ClientRequestProperties()
+        crp.set_option(ClientRequestProperties.request_timeout_option_name, timedelta(seconds=10))
+        result = crp.to_json()
+        assert crp.to_json() is result
+        assert crp.options_as_json() == {ClientRequestProperties.request_timeout_option_name: "0:00:10"}
+
+        crp.set_option(ClientRequestProperties.results_defer_partial_query_failures_option_name, False)
+        assert '"{0}": false'.format(ClientRequestProperties.results_defer_partial_query_failures_option_name) in crp.to_json()
+        assert crp.options_as_json()[ClientRequestProperties.results_defer_partial_query_failures_option_name] is False
+
+        crp.set_parameter("x", "1")
+        assert json.loads(crp.to_json())["Parameters"] == {"x": "1"}
+
+    def test_execute_request_params(self):
+        crp = ClientRequestProperties()
+        crp.set_option(ClientRequestProperties.request_timeout_option_name, timedelta(seconds=10))
+        crp.application = "myApp"
+        template = MappingProxyType({"Accept": "application/json"})
+
+        params = ExecuteRequestParams("db", None, crp, "T | take 1", timedelta(minutes=1), template)
+        assert json.loads(params.body) == {"db": "db", "csl": "T | take 1", "properties": crp.to_json()}
+        assert params.request_headers["x-ms-app"] == "myApp"
+        assert params.request_headers["x-ms-client-request-id"].startswith("KPC.execute;")
+        assert dict(template) == {"Accept": "application/json"}
+
+        params = ExecuteRequestParams("db", io.BytesIO(b"data"), crp, None, timedelta(minutes=1), template)
+        assert params.body is None
+        assert params.request_headers[ClientRequestProperties.request_timeout_option_name] == "0:00:10"
+        assert params.request_headers["x-ms-client-request-id"].startswith("KPC.executeStreamingIngest;")
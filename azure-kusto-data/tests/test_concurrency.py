@@ -0,0 +1,207 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import asyncio
+import threading
+import time
+
+import pytest
+from mock import patch
+
+from azure.kusto.data import KustoClient, AdaptiveConcurrencyLimiter
+from azure.kusto.data.exceptions import KustoThrottlingError
+from tests.kusto_client_common import KustoClientTestsMixin, mocked_requests_post
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Tests the AIMD behaviour of AdaptiveConcurrencyLimiter"""
+
+    def test_additive_increase(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4, latency_tolerance=None)
+        for _ in range(3):
+            limiter.acquire()
+            limiter.release(latency=0.1)
+        assert limiter.limit == 3
+
+        for _ in range(100):
+            limiter.acquire()
+            limiter.release(latency=0.1)
+        assert limiter.limit == 4
+
+    def test_throttling_backs_off_once_per_interval(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=16, min_limit=2, min_backoff_interval_seconds=60)
+        for _ in range(3):
+            limiter.acquire()
+        for _ in range(3):
+            limiter.release(latency=0.1, throttled=True)
+        assert limiter.limit == 8
+        assert limiter.in_flight == 0
+
+        limiter._last_backoff = None
+        limiter.acquire()
+        limiter.release(throttled=True)
+        limiter._last_backoff = None
+        limiter.acquire()
+        limiter.release(throttled=True)
+        limiter._last_backoff = None
+        limiter.acquire()
+        limiter.release(throttled=True)
+        assert limiter.limit == 2
+
+    def test_latency_spike_backs_off(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=10, latency_tolerance=2.0)
+        for _ in range(5):
+            limiter.acquire()
+            limiter.release(latency=1.0)
+        before = limiter.limit
+        limiter.acquire()
+        limiter.release(latency=5.0)
+        assert limiter.limit == before // 2
+
+    def test_failed_request_does_not_change_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+        limiter.acquire()
+        limiter.release()
+        assert limiter.limit == 4
+        assert limiter.in_flight == 0
+
+    def test_acquire_blocks_at_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+        assert limiter.acquire()
+        assert not limiter.acquire(timeout=0.01)
+
+        acquired = threading.Event()
+
+        def worker():
+            limiter.acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert not acquired.wait(0.05)
+        limiter.release(latency=0.1)
+        assert acquired.wait(5)
+        thread.join()
+        assert limiter.in_flight == 1
+
+    def test_acquire_async_waits_for_release(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+
+        async def scenario():
+            await limiter.acquire_async()
+            waiter = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.01)
+            assert not waiter.done()
+            limiter.release(latency=0.1)
+            await asyncio.wait_for(waiter, 5)
+
+        asyncio.run(scenario())
+        assert limiter.in_flight == 1
+
+    def test_cancelled_async_waiter_does_not_lose_wakeup(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+
+        async def scenario():
+            await limiter.acquire_async()
+            cancelled = asyncio.ensure_future(limiter.acquire_async())
+            waiter = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.01)
+            cancelled.cancel()
+            await asyncio.sleep(0.01)
+            limiter.release(latency=0.1)
+            await asyncio.wait_for(waiter, 5)
+            assert cancelled.cancelled()
+
+        asyncio.run(scenario())
+        assert limiter.in_flight == 1
+
+    def test_woken_async_waiter_cancelled_passes_wakeup_on(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+
+        async def scenario():
+            await limiter.acquire_async()
+            first = asyncio.ensure_future(limiter.acquire_async())
+            second = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.01)
+            # The first waiter is woken, but cancelled before it takes the slot
+            limiter.release(latency=0.1)
+            first.cancel()
+            await asyncio.wait_for(second, 5)
+
+        asyncio.run(scenario())
+        assert limiter.in_flight == 1
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(initial_limit=0)
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(initial_limit=5, max_limit=4)
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(backoff_ratio=1)
+
+    def test_for_cluster_is_shared(self):
+        limiter = AdaptiveConcurrencyLimiter.for_cluster("https://shared.kusto.windows.net")
+        assert AdaptiveConcurrencyLimiter.for_cluster("https://shared.kusto.windows.net") is limiter
+        assert AdaptiveConcurrencyLimiter.for_cluster("https://other.kusto.windows.net") is not limiter
+
+
+def mocked_throttled_post(*args, **kwargs):
+    response = mocked_requests_post("https://somecluster.kusto.windows.net/not-found")
+    response.status_code = 429
+    return response
+
+
+class TestKustoClientConcurrencyLimiter(KustoClientTestsMixin):
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_successful_requests_release_slots(self, mock_post):
+        client = KustoClient(self.HOST)
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+        client.set_concurrency_limiter(limiter)
+
+        for _ in range(3):
+            self._assert_sanity_query_response(client.execute_query("PythonTest", "Deft"))
+        client.execute_mgmt("NetDefaultDB", ".show version")
+
+        assert limiter.in_flight == 0
+        assert limiter.limit > 1
+
+    @patch("requests.Session.post", side_effect=mocked_throttled_post)
+    def test_throttled_requests_shrink_limit(self, mock_post):
+        client = KustoClient(self.HOST)
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+        client.set_concurrency_limiter(limiter)
+
+        with pytest.raises(KustoThrottlingError):
+            client.execute_query("PythonTest", "Deft")
+
+        assert limiter.in_flight == 0
+        assert limiter.limit == 4
+
+    @patch("requests.Session.post", side_effect=ConnectionError())
+    def test_connection_error_releases_slot(self, mock_post):
+        client = KustoClient(self.HOST)
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+        client.set_concurrency_limiter(limiter)
+
+        with pytest.raises(ConnectionError):
+            client.execute_query("PythonTest", "Deft")
+
+        assert limiter.in_flight == 0
+        assert limiter.limit == 1
+
+    @patch("requests.Session.post")
+    def test_body_download_is_not_sampled_as_latency(self, mock_post):
+        def slow_download_post(*args, **kwargs):
+            # The headers arrived quickly, but the body took long to download
+            time.sleep(0.05)
+            return mocked_requests_post(*args, **kwargs)
+
+        client = KustoClient(self.HOST)
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_backoff_interval_seconds=0)
+        client.set_concurrency_limiter(limiter)
+
+        mock_post.side_effect = mocked_requests_post
+        client.execute_query("PythonTest", "Deft")
+        mock_post.side_effect = slow_download_post
+        client.execute_query("PythonTest", "Deft")
+
+        assert limiter.limit >= 4
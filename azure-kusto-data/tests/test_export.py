@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import csv
+import json
+import os
+
+import pytest
+from mock import patch
+
+from azure.kusto.data import KustoClient, ClientRequestProperties, ExportFormat
+from azure.kusto.data._export import _datetime_to_nanoseconds, _timespan_to_nanoseconds
+from azure.kusto.data.exceptions import KustoMultiApiError
+from tests.kusto_client_common import KustoClientTestsMixin, mocked_requests_post
+
+PYARROW = False
+try:
+    import pyarrow
+    import pyarrow.parquet
+
+    PYARROW = True
+except ImportError:
+    pass
+
+
+class TestExecuteStreamingQueryToFile(KustoClientTestsMixin):
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_csv(self, mock_post, tmp_path):
+        path = str(tmp_path / "deft.csv")
+        client = KustoClient(self.HOST)
+        assert client.execute_streaming_query_to_file("PythonTest", "Deft", path, batch_size=4) == 11
+
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        assert len(rows) == 12
+        assert rows[0][:3] == ["rownumber", "rowguid", "xdouble"]
+        assert rows[2][0] == "0"
+        assert rows[2][12] == "2014-01-01T01:01:01.0000000Z"
+        assert rows[2][16] == "00:00:00"
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_json_lines(self, mock_post, tmp_path):
+        path = str(tmp_path / "dynamic.jsonl")
+        client = KustoClient(self.HOST)
+        query = """print dynamic(123), dynamic("123"), dynamic("test bad json"), dynamic(null), dynamic('{"rowId":2,"arr":[0,2]}'), dynamic({"rowId":2,"arr":[0,2]})"""
+        assert client.execute_streaming_query_to_file("PythonTest", query, path, ExportFormat.JSON_LINES) == 1
+
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+        assert len(lines) == 1
+        row = json.loads(lines[0])
+        assert row["print_0"] == 123
+        assert row["print_3"] is None
+        assert row["print_5"] == {"rowId": 2, "arr": [0, 2]}
+
+    @pytest.mark.skipif(not PYARROW, reason="requires pyarrow")
+    @pytest.mark.parametrize("file_format", [ExportFormat.PARQUET, ExportFormat.ARROW])
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_arrow_formats(self, mock_post, file_format, tmp_path):
+        path = str(tmp_path / "deft")
+        client = KustoClient(self.HOST)
+        assert client.execute_streaming_query_to_file("PythonTest", "Deft", path, file_format, batch_size=4) == 11
+
+        if file_format == ExportFormat.PARQUET:
+            parquet_file = pyarrow.parquet.ParquetFile(path)
+            assert parquet_file.num_row_groups == 3
+            table = parquet_file.read()
+        else:
+            table = pyarrow.ipc.open_file(path).read_all()
+
+        assert table.num_rows == 11
+        assert table.schema.field("xint64").type == pyarrow.int64()
+        assert table.schema.field("xdate").type == pyarrow.timestamp("ns", tz="UTC")
+        assert table.column("rownumber").to_pylist() == [None] + list(range(10))
+        assert table.column("xtime").to_pylist()[1].total_seconds() == 0
+
+    def test_arrow_datetimes_keep_ticks(self):
+        # Kusto's datetimes and timespans have 100ns ticks, one digit more than python's datetime and timedelta
+        assert _datetime_to_nanoseconds("2016-06-06T15:35:00.1234567Z") == 1465227300123456700
+        assert _datetime_to_nanoseconds("1969-12-31T23:59:59.9999999Z") == -100
+        assert _datetime_to_nanoseconds("2016-06-06T15:35:00Z") == 1465227300000000000
+        assert _timespan_to_nanoseconds("1.02:03:04.1234567") == 93784123456700
+        assert _timespan_to_nanoseconds("-00:00:00.0000001") == -100
+        assert _timespan_to_nanoseconds(-1) == -100
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_failed_export_removes_file(self, mock_post, tmp_path):
+        path = str(tmp_path / "partial.csv")
+        client = KustoClient(self.HOST)
+        query = """set truncationmaxrecords = 5;
+range x from 1 to 10 step 1"""
+        properties = ClientRequestProperties()
+        properties.set_option(ClientRequestProperties.results_defer_partial_query_failures_option_name, False)
+
+        with pytest.raises(KustoMultiApiError):
+            client.execute_streaming_query_to_file("PythonTest", query, path, properties=properties, batch_size=2)
+        assert not os.path.exists(path)
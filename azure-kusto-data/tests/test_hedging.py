@@ -0,0 +1,156 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from mock import patch
+
+from azure.kusto.data import KustoClient, HedgingPolicy
+from tests.kusto_client_common import KustoClientTestsMixin, mocked_requests_post
+
+
+class TestHedgingPolicy:
+    """Tests the decisions of HedgingPolicy"""
+
+    def test_fixed_delay(self):
+        policy = HedgingPolicy(delay=timedelta(milliseconds=250))
+        for _ in range(100):
+            policy.record_latency(10)
+        assert policy.hedge_delay() == 0.25
+
+    def test_percentile_delay(self):
+        policy = HedgingPolicy(percentile=0.9, initial_delay=timedelta(seconds=3), min_samples=10)
+        for i in range(9):
+            policy.record_latency(i + 1)
+        assert policy.hedge_delay() == 3
+
+        policy.record_latency(10)
+        assert policy.hedge_delay() == 9
+
+    def test_sample_window(self):
+        policy = HedgingPolicy(percentile=0.5, min_samples=1, sample_window=3)
+        for latency in (100, 100, 100, 1, 1, 1):
+            policy.record_latency(latency)
+        assert policy.hedge_delay() == 1
+
+    def test_hedge_ratio(self):
+        policy = HedgingPolicy(max_hedge_ratio=0.25, max_hedge_burst=2)
+        hedges = 0
+        for _ in range(100):
+            policy.on_request()
+            hedges += policy.try_acquire_hedge()
+        assert hedges == 25
+
+        for _ in range(100):
+            policy.on_request()
+        assert policy.try_acquire_hedge()
+        assert policy.try_acquire_hedge()
+        assert not policy.try_acquire_hedge()
+
+    def test_no_hedges_allowed(self):
+        policy = HedgingPolicy(max_hedge_ratio=0)
+        for _ in range(100):
+            policy.on_request()
+        assert not policy.try_acquire_hedge()
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            HedgingPolicy(percentile=1)
+        with pytest.raises(ValueError):
+            HedgingPolicy(max_hedge_ratio=2)
+
+
+class TestKustoClientHedging(KustoClientTestsMixin):
+    @staticmethod
+    def _slow_first_attempt_post(release_first_attempt: threading.Event):
+        def post(*args, **kwargs):
+            if not kwargs["headers"]["x-ms-client-request-id"].endswith(";hedge"):
+                release_first_attempt.wait(5)
+            return mocked_requests_post(*args, **kwargs)
+
+        return post
+
+    def test_slow_query_is_hedged(self):
+        release_first_attempt = threading.Event()
+        client = KustoClient(self.HOST)
+        client.set_query_hedging_policy(HedgingPolicy(delay=timedelta(milliseconds=10), max_hedge_ratio=1))
+
+        with patch("requests.Session.post", side_effect=self._slow_first_attempt_post(release_first_attempt)) as mock_post:
+            response = client.execute_query("PythonTest", "Deft")
+            self._assert_sanity_query_response(response)
+
+            queries = [c for c in mock_post.call_args_list if c.args[0].endswith("/v2/rest/query")]
+            assert len(queries) == 2
+            first_request_id = queries[0].kwargs["headers"]["x-ms-client-request-id"]
+            hedge_request_id = queries[1].kwargs["headers"]["x-ms-client-request-id"]
+            assert hedge_request_id == first_request_id + ";hedge"
+            assert queries[0].kwargs["stream"] is True
+
+            # The losing attempt is cancelled on the cluster
+            cancellation = self._wait_for_mgmt_call(mock_post)
+            assert json.loads(cancellation.kwargs["data"])["csl"] == '.cancel query "{}"'.format(first_request_id)
+            release_first_attempt.set()
+        client.close()
+
+    @staticmethod
+    def _wait_for_mgmt_call(mock_post):
+        for _ in range(500):
+            calls = [c for c in mock_post.call_args_list if c.args[0].endswith("/v1/rest/mgmt")]
+            if calls:
+                return calls[0]
+            time.sleep(0.01)
+        raise AssertionError("No control command was sent")
+
+    def test_hedge_delay_starts_when_the_query_is_sent(self):
+        client = KustoClient(self.HOST)
+        client.set_query_hedging_policy(HedgingPolicy(delay=timedelta(milliseconds=50), max_hedge_ratio=1))
+        # A busy executor delays the first attempt longer than the hedge delay
+        client._hedging_executor = ThreadPoolExecutor(max_workers=1)
+        client._hedging_executor.submit(time.sleep, 0.2)
+
+        with patch("requests.Session.post", side_effect=mocked_requests_post) as mock_post:
+            self._assert_sanity_query_response(client.execute_query("PythonTest", "Deft"))
+            assert mock_post.call_count == 1
+        client.close()
+
+    def test_close_shuts_down_hedging_executor(self):
+        with KustoClient(self.HOST) as client:
+            client.set_query_hedging_policy(HedgingPolicy(delay=timedelta(seconds=5), max_hedge_ratio=1))
+            with patch("requests.Session.post", side_effect=mocked_requests_post):
+                client.execute_query("PythonTest", "Deft")
+            executor = client._hedging_executor
+            assert executor is not None
+        assert client._hedging_executor is None
+        with pytest.raises(RuntimeError):
+            executor.submit(print)
+
+    def test_hedge_ratio_is_respected(self):
+        release_first_attempt = threading.Event()
+        client = KustoClient(self.HOST)
+        client.set_query_hedging_policy(HedgingPolicy(delay=timedelta(milliseconds=10), max_hedge_ratio=0))
+
+        with patch("requests.Session.post", side_effect=self._slow_first_attempt_post(release_first_attempt)) as mock_post:
+            threading.Timer(0.1, release_first_attempt.set).start()
+            response = client.execute_query("PythonTest", "Deft")
+            self._assert_sanity_query_response(response)
+            assert mock_post.call_count == 1
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_fast_query_is_not_hedged(self, mock_post):
+        client = KustoClient(self.HOST)
+        client.set_query_hedging_policy(HedgingPolicy(delay=timedelta(seconds=5), max_hedge_ratio=1))
+
+        self._assert_sanity_query_response(client.execute_query("PythonTest", "Deft"))
+        assert mock_post.call_count == 1
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_control_commands_are_not_hedged(self, mock_post):
+        client = KustoClient(self.HOST)
+        client.set_query_hedging_policy(HedgingPolicy(delay=timedelta(seconds=0), max_hedge_ratio=1))
+
+        self._assert_sanity_control_command_response(client.execute_mgmt("NetDefaultDB", ".show version"))
+        assert mock_post.call_count == 1
@@ -2,11 +2,17 @@
 # Licensed under the MIT License
 
 import json
+import math
 import os
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
 import pytest
 
-from azure.kusto.data.helpers import dataframe_from_result_table
-from azure.kusto.data.response import KustoResponseDataSetV2
+from azure.kusto.data._models import KustoResultTable
+from azure.kusto.data.helpers import dataframe_from_result_table, polars_from_result_table, polars_chunks_from_result_table
+from azure.kusto.data.response import KustoResponseDataSetV2, KustoStreamingResponseDataSet
+from azure.kusto.data.streaming_response import StreamingDataSetEnumerator, JsonTokenReader
 
 
 PANDAS = False
@@ -74,3 +80,149 @@ class TestDataFrameFromResultsTable:
         assert type(df.iloc[6].RecordTime) is pandas._libs.tslibs.timestamps.Timestamp
         assert type(df.iloc[6].RecordOffset) is pandas._libs.tslibs.timestamps.Timedelta
         assert df.iloc[6].RecordOffset == pandas.to_timedelta("1 days 01:01:01")
+
+    @pytest.mark.skipif(not PANDAS, reason="requires pandas")
+    def test_dataframe_from_result_table_columns(self):
+        """Test converting only some of the columns of a KustoResultTable to a pandas.DataFrame"""
+        with open(os.path.join(os.path.dirname(__file__), "input", "dataframe.json"), "r") as response_file:
+            data = response_file.read()
+
+        response = KustoResponseDataSetV2(json.loads(data))
+        df = dataframe_from_result_table(response.primary_results[0], columns=["RecordInt", "RecordName"])
+
+        assert list(df.columns) == ["RecordInt", "RecordName"]
+        assert df.iloc[0].RecordName == "now"
+        assert type(df.iloc[0].RecordInt) is numpy.int32
+
+    @pytest.mark.skipif(not PANDAS, reason="requires pandas")
+    def test_dataframe_from_result_table_categorical(self):
+        """Test converting string columns of a KustoResultTable to categoricals"""
+        table = KustoResultTable(
+            {
+                "TableName": "T",
+                "Columns": [{"ColumnName": "region", "ColumnType": "string"}, {"ColumnName": "id", "ColumnType": "string"}],
+                "Rows": [["west", str(i)] if i % 2 else ["east", str(i)] for i in range(100)],
+            }
+        )
+
+        df = dataframe_from_result_table(table, max_categories=10)
+        assert df["region"].dtype == "category"
+        assert list(df["region"].cat.categories) == ["east", "west"]
+        assert df["region"][1] == "west"
+        assert df["id"].dtype == object
+
+        df = dataframe_from_result_table(table, categorical_columns=["id"])
+        assert df["id"].dtype == "category"
+        assert df["region"].dtype == object
+
+        with pytest.raises(ValueError):
+            dataframe_from_result_table(table, categorical_columns=["nope"])
+
+        # V1 responses name the types in Pascal case
+        table = KustoResultTable({"TableName": "T", "Columns": [{"ColumnName": "region", "DataType": "String"}], "Rows": [["west"], ["east"]] * 10})
+        assert dataframe_from_result_table(table, max_categories=10)["region"].dtype == "category"
+
+    @pytest.mark.skipif(not PANDAS, reason="requires pandas")
+    def test_dataframe_from_result_table_parallel_conversion(self):
+        """Test converting the columns of a KustoResultTable with a thread pool"""
+        table = KustoResultTable(
+            {
+                "TableName": "T",
+                "Columns": [
+                    {"ColumnName": "real", "ColumnType": "real"},
+                    {"ColumnName": "decimal", "ColumnType": "decimal"},
+                    {"ColumnName": "timespan", "ColumnType": "timespan"},
+                    {"ColumnName": "negative", "ColumnType": "timespan"},
+                ],
+                "Rows": [["NaN", "1.5", "00:00:01.5", "-1.00:00:00"], ["-Infinity", None, 600000000, None], [2, "not a number", None, "-00:01:00"]],
+            }
+        )
+
+        df = dataframe_from_result_table(table)
+        assert df["real"].dtype == "Float64"
+        assert pandas.isnull(df["real"][0]) and df["real"][1] == -math.inf and df["real"][2] == 2
+        assert df["decimal"][0] == 1.5 and pandas.isnull(df["decimal"][1]) and pandas.isnull(df["decimal"][2])
+        assert list(df["timespan"]) == [pandas.to_timedelta("00:00:01.5"), pandas.to_timedelta("00:01:00"), pandas.NaT]
+        assert df["negative"][0] == pandas.to_timedelta("-1 days") and df["negative"][2] == pandas.to_timedelta("-00:01:00")
+
+        pandas.testing.assert_frame_equal(dataframe_from_result_table(table, max_workers=4), df)
+
+
+POLARS = False
+try:
+    import polars
+
+    POLARS = True
+except:
+    pass
+
+
+@pytest.mark.skipif(not POLARS, reason="requires polars")
+class TestPolarsFromResultTable:
+    """Tests the polars conversion helper functions"""
+
+    @staticmethod
+    def _load_primary_result(file_name: str):
+        with open(os.path.join(os.path.dirname(__file__), "input", file_name), "r") as response_file:
+            return KustoResponseDataSetV2(json.loads(response_file.read())).primary_results[0]
+
+    def test_polars_from_result_table(self):
+        df = polars_from_result_table(self._load_primary_result("dataframe.json"))
+
+        assert df.schema["RecordTime"] == polars.Datetime("ns", "UTC")
+        assert df.schema["RecordOffset"] == polars.Duration("ns")
+        assert df.schema["RecordBool"] == polars.Boolean
+        assert df.schema["RecordInt"] == polars.Int32
+        assert df.schema["RecordReal"] == polars.Float64
+
+        assert df["RecordName"][0] == "now"
+        assert df["RecordTime"][0] == datetime(2021, 12, 22, 11, 43, tzinfo=timezone.utc)
+        # Kusto datetimes that nanosecond timestamps can't represent
+        assert df["RecordTime"][1] is None
+        assert df["RecordTime"][2] is None
+        assert math.isnan(df["RecordReal"][1])
+        assert df["RecordReal"][2] == math.inf
+        assert df["RecordReal"][3] == -math.inf
+        assert df["RecordOffset"][5] == timedelta(minutes=1)
+        assert df["RecordOffset"][6] == timedelta(days=1, hours=1, minutes=1, seconds=1)
+
+    def test_nanosecond_precision(self):
+        df = polars_from_result_table(self._load_primary_result("deft.json"))
+        assert df["xtime"].cast(polars.Int64).to_list()[1:4] == [0, 86401001000100, -172802002000200]
+        assert df["xint64"].dtype == polars.Int64
+        assert df["rownumber"].null_count() == 1
+        assert df["xdynamicWithNulls"][2] == {"rowId": 1, "arr": [0, 1]}
+
+    def test_decimal(self):
+        table = KustoResultTable(
+            {"TableName": "T", "Columns": [{"ColumnName": "d", "ColumnType": "decimal"}], "Rows": [["1.5"], [None], ["123456789012345678901.123"]]}
+        )
+        df = polars_from_result_table(table)
+        assert df.schema["d"] == polars.Decimal(38, 3)
+        assert df["d"].to_list() == [Decimal("1.5"), None, Decimal("123456789012345678901.123")]
+
+    def test_decimal_wider_than_38_digits(self):
+        wide = "1234567890123456789012345678901234567.123"
+        table = KustoResultTable({"TableName": "T", "Columns": [{"ColumnName": "d", "ColumnType": "decimal"}], "Rows": [["1.5"], [wide]]})
+        df = polars_from_result_table(table)
+        assert df.schema["d"] == polars.String
+        assert df["d"].to_list() == ["1.5", wide]
+
+    def test_timespans_out_of_nanoseconds_range(self):
+        rows = [["10675199.02:48:05.4775807"], ["-10675199.02:48:05.4775807"], ["106751.23:47:16.8547758"], ["9223372036854775807"]]
+        table = KustoResultTable({"TableName": "T", "Columns": [{"ColumnName": "t", "ColumnType": "timespan"}], "Rows": rows})
+        df = polars_from_result_table(table)
+        assert df["t"].cast(polars.Int64).to_list() == [None, None, 9223372036854775800, None]
+
+        ticks = KustoResultTable({"TableName": "T", "Columns": [{"ColumnName": "t", "ColumnType": "timespan"}], "Rows": [[9223372036854775807], [-1]]})
+        assert polars_from_result_table(ticks)["t"].cast(polars.Int64).to_list() == [None, -100]
+
+    def test_streaming_chunks(self):
+        with open(os.path.join(os.path.dirname(__file__), "input", "deft.json"), "rb") as f:
+            response = KustoStreamingResponseDataSet(StreamingDataSetEnumerator(JsonTokenReader(f)))
+            table = next(response.iter_primary_results())
+            chunks = list(polars_chunks_from_result_table(table, chunk_size=4))
+
+            assert [len(chunk) for chunk in chunks] == [4, 4, 3]
+            assert table.finished
+            assert polars.concat(chunks)["rownumber"].to_list() == [None] + list(range(10))
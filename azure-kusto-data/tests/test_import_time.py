@@ -0,0 +1,53 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+# Importing the package itself should not load any of these - they are only needed once a client is created or a token is acquired.
+HEAVY_MODULES = ["requests", "msal", "azure.identity", "azure.core", "asgiref", "asyncio", "dateutil", "ijson", "numpy", "pandas"]
+# The authentication libraries are only needed once a token is acquired.
+AUTHENTICATION_MODULES = ["msal", "azure.identity", "azure.core", "asgiref"]
+# A generous budget, so that the test is not flaky on slow machines, but still catches an eager import of the authentication libraries.
+IMPORT_TIME_BUDGET_MICROSECONDS = 150_000
+
+
+def _run(code: str, *args: str) -> subprocess.CompletedProcess:
+    package_roots = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    package_roots.append(os.path.join(os.path.dirname(package_roots[0]), "azure-kusto-ingest"))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(package_roots + [os.environ.get("PYTHONPATH", "")]))
+    return subprocess.run([sys.executable, *args, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+
+def _loaded_modules(statement: str, modules: list) -> list:
+    code = "import json, sys\n{}\nprint(json.dumps([m for m in {!r} if m in sys.modules]))".format(statement, modules)
+    return json.loads(_run(code).stdout)
+
+
+def test_package_import_is_lightweight():
+    assert _loaded_modules("import azure.kusto.data", HEAVY_MODULES) == []
+
+
+def test_client_import_does_not_load_authentication_libraries():
+    assert _loaded_modules("from azure.kusto.data import KustoClient, KustoConnectionStringBuilder", AUTHENTICATION_MODULES) == []
+
+
+def test_lazy_exports():
+    import azure.kusto.data
+    from azure.kusto.data.client import KustoClient
+
+    assert azure.kusto.data.KustoClient is KustoClient
+    assert set(azure.kusto.data.__all__) <= set(dir(azure.kusto.data))
+    with pytest.raises(AttributeError):
+        azure.kusto.data.NoSuchName
+
+
+def test_import_time_budget():
+    stderr = _run("import azure.kusto.data", "-X", "importtime").stderr
+    # Each line is "import time: <self us> | <cumulative us> | <module>"
+    cumulative = {match.group(2): int(match.group(1)) for match in re.finditer(r"\|\s*(\d+)\s*\|\s*(\S+)\s*$", stderr, re.MULTILINE)}
+    assert cumulative["azure.kusto.data"] < IMPORT_TIME_BUDGET_MICROSECONDS
@@ -1,11 +1,13 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
+import json
 import sys
 
 import pytest
+import requests
 from mock import patch
 
-from azure.kusto.data import KustoClient, ClientRequestProperties
+from azure.kusto.data import KustoClient, ClientRequestProperties, ConversionOverrides
 from azure.kusto.data._cloud_settings import CloudSettings
 from azure.kusto.data.exceptions import KustoMultiApiError
 from azure.kusto.data.helpers import dataframe_from_result_table
@@ -90,6 +92,47 @@ range x from 1 to 10 step 1"""
         row = get_table_first_row(get_response_first_primary_result(method.__call__(client, "PythonTest", query)))
         self._assert_dynamic_response(row)
 
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_columns_projection(self, mock_post, method):
+        """Tests keeping only some of the columns of the primary result."""
+        client = KustoClient(self.HOST)
+        response = method.__call__(client, "PythonTest", "Deft", columns=["xtext", "rownumber", "xdynamicWithNulls"])
+        table = get_response_first_primary_result(response)
+        assert [c.column_name for c in table.columns] == ["xtext", "rownumber", "xdynamicWithNulls"]
+        rows = list(table)
+        assert rows[1].to_list() == ["Zero", 0, ""]
+        assert rows[2].to_list() == ["One", 1, {"rowId": 1, "arr": [0, 1]}]
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_conversion_overrides(self, mock_post, method):
+        """Tests overriding the conversion of values by column and by type."""
+        client = KustoClient(self.HOST)
+        client.set_conversion_overrides(ConversionOverrides(types={"timespan": None}, columns={"xtext": str.upper}))
+        response = method.__call__(client, "PythonTest", "Deft", columns=["xtext", "xtime"])
+        table = get_response_first_primary_result(response)
+        rows = list(table)
+        assert rows[2].to_list() == ["ONE", "1.00:00:01.0010001"]
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_streaming_query_lazy_dynamic(self, mock_post):
+        """Tests decoding dynamic values on access in streaming queries."""
+        client = KustoClient(self.HOST)
+        query = """print dynamic(123), dynamic("123"), dynamic("test bad json"),"""
+        """ dynamic(null), dynamic('{"rowId":2,"arr":[0,2]}'), dynamic({"rowId":2,"arr":[0,2]})"""
+        with client.execute_streaming_query("PythonTest", query, lazy_dynamic=True) as response:
+            row = get_table_first_row(get_response_first_primary_result(response))
+            self._assert_dynamic_response(row)
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_streaming_query_lazy_dynamic_to_dataframe(self, mock_post):
+        """Tests that lazily decoded dynamic values are decoded when a streamed table is converted to a dataframe."""
+        client = KustoClient(self.HOST)
+        query = """print dynamic(123), dynamic("123"), dynamic("test bad json"),"""
+        """ dynamic(null), dynamic('{"rowId":2,"arr":[0,2]}'), dynamic({"rowId":2,"arr":[0,2]})"""
+        with client.execute_streaming_query("PythonTest", query, lazy_dynamic=True) as response:
+            data_frame = dataframe_from_result_table(get_response_first_primary_result(response))
+            assert data_frame["print_5"][0] == {"rowId": 2, "arr": [0, 2]}
+
     @patch("requests.Session.post", side_effect=mocked_requests_post)
     def test_empty_result(self, mock_post, method):
         """Tests dynamic responses."""
@@ -136,6 +179,55 @@ range x from 1 to 10 step 1"""
         self._assert_sanity_query_response(response)
         self._assert_client_request_id(mock_post.call_args.kwargs, value=request_id)
 
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_streaming_query_close(self, mock_post):
+        """Tests closing a streaming query before reading it to the end."""
+        client = KustoClient(self.HOST)
+        with client.execute_streaming_query("PythonTest", "Deft") as response:
+            get_table_first_row(get_response_first_primary_result(response))
+
+        assert mock_post.call_count == 1
+        assert response.streamed_data.closed
+
+    @patch("requests.Session.post", side_effect=mocked_requests_post)
+    def test_streaming_query_close_with_cancel(self, mock_post):
+        """Tests cancelling a streaming query on the server when closing it before reading it to the end."""
+        client = KustoClient(self.HOST)
+        properties = ClientRequestProperties()
+        properties.client_request_id = 'request "id"'
+        response = client.execute_streaming_query("PythonTest", "Deft", properties=properties)
+        get_table_first_row(get_response_first_primary_result(response))
+        response.close(cancel_query=True)
+
+        assert mock_post.call_count == 2
+        cancel_call = mock_post.call_args_list[1]
+        assert cancel_call.args[0] == "https://somecluster.kusto.windows.net/v1/rest/mgmt"
+        assert json.loads(cancel_call.kwargs["data"])["csl"] == '.cancel query "request \\"id\\""'
+
+        # The query is not cancelled again
+        response.close(cancel_query=True)
+        assert mock_post.call_count == 2
+
+    @patch("requests.Session.post")
+    def test_streaming_query_cancel_error_does_not_hide_original_error(self, mock_post):
+        """Tests that a failure to cancel a streaming query doesn't replace the error that closed it."""
+
+        def post(*args, **kwargs):
+            if args[0].endswith("/v1/rest/mgmt"):
+                raise requests.ConnectionError("Connection reset")
+            return mocked_requests_post(*args, **kwargs)
+
+        mock_post.side_effect = post
+        client = KustoClient(self.HOST)
+        with pytest.raises(ValueError):
+            with client.execute_streaming_query("PythonTest", "Deft") as response:
+                response.set_cancel_query_on_close(True)
+                get_table_first_row(get_response_first_primary_result(response))
+                raise ValueError("Stopped reading")
+
+        assert mock_post.call_count == 2
+        assert response.streamed_data.closed
+
     @patch("requests.get", side_effect=mocked_requests_post)
     def test_proxy_token_providers(self, mock_get, proxy_kcsb):
         """Test query V2."""
@@ -1,9 +1,17 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
+import io
 import json
 import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 
-from azure.kusto.data._models import KustoResultTable
+import pytest
+from mock import patch
+
+from azure.kusto.data._models import KustoResultTable, KustoResultRow, ColumnProjection, ConversionOverrides, tuple_row, namedtuple_row, dict_row
 
 
 def test_str_and_dates_smoke():
@@ -13,3 +21,177 @@ def test_str_and_dates_smoke():
 
     result_table = KustoResultTable(json_table)
     assert len(str(result_table)) == 4537
+
+
+def test_column_projection():
+    with open(os.path.join(os.path.dirname(__file__), "input", "deft.json"), "r") as f:
+        json_table = json.loads(f.read())[2]
+
+    result_table = KustoResultTable(json_table, columns=["xint64", "rownumber"])
+    assert [c.column_name for c in result_table.columns] == ["xint64", "rownumber"]
+    assert [c.ordinal for c in result_table.columns] == [0, 1]
+    assert result_table[1].to_list() == [0, 0]
+    assert result_table[3]["rownumber"] == 2
+    assert len(result_table[3]) == 2
+
+
+def test_column_projection_unknown_column():
+    with open(os.path.join(os.path.dirname(__file__), "input", "deft.json"), "r") as f:
+        json_table = json.loads(f.read())[2]
+
+    with pytest.raises(ValueError):
+        KustoResultTable(json_table, columns=["rownumber", "nope"])
+
+
+def test_column_projection_reorder():
+    projection = ColumnProjection([{"ColumnName": name} for name in "abcd"], ["d", "b", "d"])
+    assert projection.keep == [False, True, False, True]
+    assert projection.project(["a", "b", "c", "d"]) == ["d", "b", "d"]
+    assert projection.reorder(["b", "d"]) == ["d", "b", "d"]
+
+
+def test_column_as_numpy():
+    numpy = pytest.importorskip("numpy")
+    with open(os.path.join(os.path.dirname(__file__), "input", "deft.json"), "r") as f:
+        json_table = json.loads(f.read())[2]
+    result_table = KustoResultTable(json_table)
+
+    row_numbers = result_table.column_as_numpy("rownumber")
+    assert row_numbers.dtype == numpy.int32
+    assert row_numbers.mask.tolist() == [True] + [False] * 10
+    assert row_numbers.compressed().tolist() == list(range(10))
+
+    bools = result_table.column_as_numpy("xbool")
+    assert bools.dtype == numpy.bool_
+    assert bools[2] == True
+
+    columns = result_table.to_numpy_columns()
+    assert set(columns) == {"rownumber", "xdouble", "xfloat", "xbool", "xint16", "xint32", "xint64", "xuint8", "xuint16", "xuint32", "xuint64"}
+    assert columns["xint64"].dtype == numpy.int64
+    assert columns["xdouble"].dtype == numpy.float64
+
+    with pytest.raises(TypeError):
+        result_table.column_as_numpy("xtext")
+    with pytest.raises(LookupError):
+        result_table.column_as_numpy("nope")
+
+
+def test_column_as_numpy_without_nulls():
+    numpy = pytest.importorskip("numpy")
+    json_table = {
+        "TableName": "T",
+        "Columns": [{"ColumnName": "r", "ColumnType": "real"}],
+        "Rows": [[1.5], ["NaN"], ["Infinity"], ["-Infinity"]],
+    }
+    reals = KustoResultTable(json_table).column_as_numpy("r")
+    assert reals.mask is numpy.ma.nomask
+    assert reals[0] == 1.5
+    assert numpy.isnan(reals[1])
+    assert reals.data[2:].tolist() == [numpy.inf, -numpy.inf]
+
+
+def test_iter_rows_factories():
+    with open(os.path.join(os.path.dirname(__file__), "input", "deft.json"), "r") as f:
+        json_table = json.loads(f.read())[2]
+    columns = ["rownumber", "xdate", "xtime", "xdynamicWithNulls"]
+    result_table = KustoResultTable(json_table, columns=columns)
+
+    rows = list(result_table.iter_rows(tuple_row))
+    assert len(rows) == 11
+    assert rows[0] == (None, None, None, "")
+    assert rows[2] == (1, datetime(2015, 1, 1, 1, 1, 1, tzinfo=timezone.utc), timedelta(days=1, seconds=1, microseconds=1000), {"rowId": 1, "arr": [0, 1]})
+    assert rows == [tuple(row) for row in result_table]
+
+    rows = list(result_table.iter_rows(namedtuple_row))
+    assert rows[2].rownumber == 1
+    assert rows[2].xtime == timedelta(days=1, seconds=1, microseconds=1000)
+    # The namedtuple type is generated once per schema
+    assert type(rows[2]) is type(next(KustoResultTable(json_table, columns=columns).iter_rows(namedtuple_row)))
+
+    rows = list(result_table.iter_rows(dict_row))
+    assert rows[2] == result_table[2].to_dict()
+
+    assert [row for row in result_table.iter_rows(lambda plan, row: row[0])] == [None] + list(range(10))
+
+
+def test_namedtuple_row_invalid_names():
+    result_table = KustoResultTable(
+        {"TableName": "T", "Columns": [{"ColumnName": "my column", "ColumnType": "long"}, {"ColumnName": "id", "ColumnType": "long"}], "Rows": [[1, 2]]}
+    )
+    row = next(result_table.iter_rows(namedtuple_row))
+    assert row == (1, 2)
+    assert row.id == 2
+
+
+def test_conversion_plan():
+    with open(os.path.join(os.path.dirname(__file__), "input", "deft.json"), "r") as f:
+        json_table = json.loads(f.read())[2]
+    result_table = KustoResultTable(json_table, columns=["rownumber", "xdate", "xtime", "xdynamicWithNulls"])
+
+    plan = result_table.conversion_plan
+    assert plan.column_types == ["int", "datetime", "timespan", "dynamic"]
+    assert plan.identity_columns == [0, 3]
+    assert [index for index, _ in plan.converters] == [1, 2]
+
+    # Rows created without a plan compile their own
+    row = KustoResultRow(result_table.columns, result_table.raw_rows[2])
+    assert row == result_table[2]
+    assert row.to_dict() == result_table[2].to_dict()
+
+
+def test_conversion_overrides():
+    result_table = KustoResultTable(
+        {
+            "TableName": "T",
+            "Columns": [
+                {"ColumnName": "price", "ColumnType": "decimal"},
+                {"ColumnName": "exact", "ColumnType": "decimal"},
+                {"ColumnName": "id", "ColumnType": "guid"},
+            ],
+            "Rows": [["1.25", "0.1", "00000001-0000-0000-0001-020304050607"], [None, None, None]],
+        }
+    )
+    assert result_table[0].to_list() == [Decimal("1.25"), Decimal("0.1"), "00000001-0000-0000-0001-020304050607"]
+
+    result_table.set_conversion_overrides(ConversionOverrides(types={"Decimal": float, "guid": uuid.UUID}, columns={"exact": None}))
+    assert result_table[0].to_list() == [1.25, "0.1", uuid.UUID("00000001-0000-0000-0001-020304050607")]
+    assert result_table[1].to_list() == [None, None, None]
+    assert next(result_table.iter_rows(tuple_row)) == (1.25, "0.1", uuid.UUID("00000001-0000-0000-0001-020304050607"))
+
+    result_table.set_conversion_overrides(None)
+    assert result_table[0][0] == Decimal("1.25")
+
+
+def test_to_columnar_dict():
+    with open(os.path.join(os.path.dirname(__file__), "input", "deft.json"), "r") as f:
+        json_table = json.loads(f.read())[2]
+    result_table = KustoResultTable(json_table, columns=["rownumber", "xtime"])
+
+    columns = result_table.to_columnar_dict()
+    assert list(columns) == ["rownumber", "xtime"]
+    assert columns["rownumber"] == [None] + list(range(10))
+    assert columns["xtime"][2] == timedelta(days=1, seconds=1, microseconds=1000)
+
+    empty_table = KustoResultTable({"TableName": "T", "Columns": [{"ColumnName": "a", "ColumnType": "long"}], "Rows": []})
+    assert empty_table.to_columnar_dict() == {"a": []}
+
+
+@pytest.mark.parametrize("orjson_installed", [True, False])
+def test_write_json(orjson_installed):
+    with open(os.path.join(os.path.dirname(__file__), "input", "deft.json"), "r") as f:
+        json_table = json.loads(f.read())[2]
+    result_table = KustoResultTable(json_table, columns=["rownumber", "xdate", "xdynamicWithNulls"])
+
+    with patch.dict(sys.modules, {} if orjson_installed else {"orjson": None}):
+        columnar = io.BytesIO()
+        assert result_table.write_json(columnar) == 11
+        lines = io.BytesIO()
+        assert result_table.write_json(lines, lines=True) == 11
+
+    columns = json.loads(columnar.getvalue())
+    assert columns["rownumber"] == [None] + list(range(10))
+    assert columns["xdate"][2] == "2015-01-01T01:01:01.0000001Z"
+
+    rows = [json.loads(line) for line in lines.getvalue().splitlines()]
+    assert len(rows) == 11
+    assert rows[2] == {"rownumber": 1, "xdate": "2015-01-01T01:01:01.0000001Z", "xdynamicWithNulls": {"rowId": 1, "arr": [0, 1]}}
@@ -1,9 +1,10 @@
+import json
 import os
-from io import StringIO
+from io import StringIO, BytesIO
 
 import pytest
 
-from azure.kusto.data._models import WellKnownDataSet, KustoResultRow, KustoResultColumn
+from azure.kusto.data._models import WellKnownDataSet, KustoResultRow, KustoResultColumn, LazyDynamicValue, tuple_row, dict_row
 from azure.kusto.data.aio.response import KustoStreamingResponseDataSet as AsyncKustoStreamingResponseDataSet
 from azure.kusto.data.aio.streaming_response import JsonTokenReader as AsyncJsonTokenReader, StreamingDataSetEnumerator as AsyncProgressiveDataSetEnumerator
 from azure.kusto.data.exceptions import KustoServiceError, KustoStreamingQueryError, KustoTokenParsingError, KustoUnsupportedApiError, KustoMultiApiError
@@ -88,6 +89,32 @@ class TestStreamingQuery(KustoClientTestsMixin):
                     row = next(i["Rows"])
                     self._assert_dynamic_response(row)
 
+    def test_lazy_dynamic(self):
+        with self.open_json_file("dynamic.json") as f:
+            reader = StreamingDataSetEnumerator(JsonTokenReader(f), lazy_dynamic=True)
+
+            for i in reader:
+                if i["FrameType"] == FrameType.DataTable and i["TableKind"] == WellKnownDataSet.PrimaryResult.value:
+                    columns = [KustoResultColumn(column, index) for index, column in enumerate(i["Columns"])]
+                    raw_row = next(i["Rows"])
+                    assert isinstance(raw_row[5], LazyDynamicValue)
+                    assert raw_row[0] == 123
+
+                    row = KustoResultRow(columns, raw_row)
+                    self._assert_dynamic_response(row)
+                    assert row.to_dict()["print_5"] == {"rowId": 2, "arr": [0, 2]}
+
+    def test_columns_projection(self):
+        with self.open_json_file("dynamic.json") as f:
+            reader = StreamingDataSetEnumerator(JsonTokenReader(f), columns=["print_4", "print_0"])
+
+            for i in reader:
+                if i["FrameType"] == FrameType.DataTable and i["TableKind"] == WellKnownDataSet.PrimaryResult.value:
+                    assert [c["ColumnName"] for c in i["Columns"]] == ["print_4", "print_0"]
+                    assert list(i["Rows"]) == [['{"rowId":2,"arr":[0,2]}', 123]]
+
+            assert reader.done
+
     def test_sanity_kusto_streaming_response_dataset(self):
         with self.open_json_file("deft.json") as f:
             reader = StreamingDataSetEnumerator(JsonTokenReader(f))
@@ -115,6 +142,30 @@ class TestStreamingQuery(KustoClientTestsMixin):
 
             assert response.finished
 
+    def test_iter_rows_factory(self):
+        with self.open_json_file("dynamic.json") as f:
+            reader = StreamingDataSetEnumerator(JsonTokenReader(f), lazy_dynamic=True)
+            table = next(KustoStreamingResponseDataSet(reader).iter_primary_results())
+
+            rows = list(table.iter_rows(dict_row))
+            assert len(rows) == 1
+            assert rows[0]["print_0"] == 123
+            assert rows[0]["print_5"] == {"rowId": 2, "arr": [0, 2]}
+            assert table.finished
+            assert table.rows_count == 1
+
+    def test_write_json_lines(self):
+        with self.open_json_file("dynamic.json") as f:
+            reader = StreamingDataSetEnumerator(JsonTokenReader(f), lazy_dynamic=True)
+            table = next(KustoStreamingResponseDataSet(reader).iter_primary_results())
+
+            output = BytesIO()
+            assert table.write_json(output) == 1
+            assert table.finished
+            row = json.loads(output.getvalue())
+            assert row["print_0"] == 123
+            assert row["print_5"] == {"rowId": 2, "arr": [0, 2]}
+
     def test_exception_in_row(self):
         with self.open_json_file("query_partial_results_defer_is_false.json") as f:
             reader = StreamingDataSetEnumerator(JsonTokenReader(f))
@@ -124,6 +175,36 @@ class TestStreamingQuery(KustoClientTestsMixin):
             with pytest.raises(KustoServiceError):
                 rows = [r for r in table]
 
+    def test_close_kusto_streaming_response_dataset(self):
+        close_calls = []
+        with self.open_json_file("deft.json") as f:
+            reader = StreamingDataSetEnumerator(JsonTokenReader(f), close_calls.append)
+
+            with KustoStreamingResponseDataSet(reader) as response:
+                response.set_cancel_query_on_close(True)
+                next(iter(next(response.iter_primary_results())))
+
+            assert close_calls == [True]
+            assert next(response, None) is None
+
+            # Closing again does nothing
+            response.close()
+            assert close_calls == [True]
+
+    def test_close_finished_kusto_streaming_response_dataset(self):
+        close_calls = []
+        with self.open_json_file("deft.json") as f:
+            reader = StreamingDataSetEnumerator(JsonTokenReader(f), close_calls.append)
+
+            with KustoStreamingResponseDataSet(reader) as response:
+                response.set_cancel_query_on_close(True)
+                for table in response:
+                    list(table)
+
+            assert response.finished
+            assert reader.done
+            assert close_calls == [False]
+
     @pytest.mark.asyncio
     async def test_sanity_async(self):
         with self.open_async_json_file("deft.json") as f:
@@ -171,6 +252,17 @@ class TestStreamingQuery(KustoClientTestsMixin):
                     row = await i["Rows"].__anext__()
                     self._assert_dynamic_response(row)
 
+    @pytest.mark.asyncio
+    async def test_lazy_dynamic_async(self):
+        with self.open_async_json_file("dynamic.json") as f:
+            reader = AsyncProgressiveDataSetEnumerator(AsyncJsonTokenReader(f), lazy_dynamic=True)
+            async for i in reader:
+                if i["FrameType"] == FrameType.DataTable and i["TableKind"] == WellKnownDataSet.PrimaryResult.value:
+                    columns = [KustoResultColumn(column, index) for index, column in enumerate(i["Columns"])]
+                    raw_row = await i["Rows"].__anext__()
+                    assert isinstance(raw_row[5], LazyDynamicValue)
+                    self._assert_dynamic_response(KustoResultRow(columns, raw_row))
+
     @pytest.mark.asyncio
     async def test_sanity_kusto_streaming_response_dataset_async(self):
         with self.open_async_json_file("deft.json") as f:
@@ -200,6 +292,18 @@ class TestStreamingQuery(KustoClientTestsMixin):
 
             assert response.finished
 
+    @pytest.mark.asyncio
+    async def test_iter_rows_factory_async(self):
+        with self.open_async_json_file("dynamic.json") as f:
+            reader = AsyncProgressiveDataSetEnumerator(AsyncJsonTokenReader(f), lazy_dynamic=True)
+            table = await AsyncKustoStreamingResponseDataSet(reader).iter_primary_results().__anext__()
+
+            rows = [row async for row in table.iter_rows(tuple_row)]
+            assert len(rows) == 1
+            assert rows[0][0] == 123
+            assert rows[0][5] == {"rowId": 2, "arr": [0, 2]}
+            assert table.rows_count == 1
+
     @pytest.mark.asyncio
     async def test_exception_in_row_async(self):
         with self.open_async_json_file("query_partial_results_defer_is_false.json") as f:
@@ -210,6 +314,24 @@ class TestStreamingQuery(KustoClientTestsMixin):
             with pytest.raises(KustoMultiApiError):
                 rows = [r async for r in table]
 
+    @pytest.mark.asyncio
+    async def test_close_kusto_streaming_response_dataset_async(self):
+        close_calls = []
+
+        async def close_callback(cancel_query: bool):
+            close_calls.append(cancel_query)
+
+        with self.open_async_json_file("deft.json") as f:
+            reader = AsyncProgressiveDataSetEnumerator(AsyncJsonTokenReader(f), close_callback)
+
+            async with AsyncKustoStreamingResponseDataSet(reader) as response:
+                response.set_cancel_query_on_close(True)
+                await (await response.iter_primary_results().__anext__()).__anext__()
+
+            assert close_calls == [True]
+            with pytest.raises(StopAsyncIteration):
+                await reader.__anext__()
+
 
 class TestJsonTokenReader:
     def get_reader(self, data) -> JsonTokenReader:
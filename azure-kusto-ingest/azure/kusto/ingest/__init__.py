@@ -1,10 +1,12 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
+import importlib
+from typing import TYPE_CHECKING
+
 from ._version import VERSION as __version__
-from .base_ingest_client import IngestionResult, IngestionStatus
+from .base_ingest_client import IngestionResult, IngestionStatus, BlobUploadMetrics
 from .descriptors import BlobDescriptor, FileDescriptor, StreamDescriptor
 from .exceptions import KustoMissingMappingError
-from .ingest_client import QueuedIngestClient
 from .ingestion_properties import (
     ValidationPolicy,
     ValidationImplications,
@@ -16,6 +18,51 @@ from .ingestion_properties import (
     ColumnMapping,
     TransformationMethod,
 )
-from .managed_streaming_ingest_client import ManagedStreamingIngestClient
-from .streaming_ingest_client import KustoStreamingIngestClient
 from .base_ingest_client import BaseIngestClient
+
+if TYPE_CHECKING:
+    from .ingest_client import QueuedIngestClient
+    from .managed_streaming_ingest_client import ManagedStreamingIngestClient
+    from .streaming_ingest_client import KustoStreamingIngestClient
+
+# The clients are imported from their modules on first access, so that importing the package doesn't pull in the HTTP client.
+# The azure storage SDKs and tenacity are only imported by the clients once they are needed.
+_LAZY_EXPORTS = {
+    "QueuedIngestClient": ".ingest_client",
+    "ManagedStreamingIngestClient": ".managed_streaming_ingest_client",
+    "KustoStreamingIngestClient": ".streaming_ingest_client",
+}
+
+__all__ = [
+    "__version__",
+    "IngestionResult",
+    "IngestionStatus",
+    "BlobUploadMetrics",
+    "BlobDescriptor",
+    "FileDescriptor",
+    "StreamDescriptor",
+    "KustoMissingMappingError",
+    "ValidationPolicy",
+    "ValidationImplications",
+    "ValidationOptions",
+    "ReportLevel",
+    "ReportMethod",
+    "IngestionProperties",
+    "IngestionMappingKind",
+    "ColumnMapping",
+    "TransformationMethod",
+    "BaseIngestClient",
+] + list(_LAZY_EXPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
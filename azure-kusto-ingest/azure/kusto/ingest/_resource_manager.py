@@ -1,9 +1,11 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
+import logging
 import re
+from concurrent.futures import Future
 from datetime import datetime, timedelta
-from typing import List
-from tenacity import retry_if_exception_type, stop_after_attempt, Retrying, wait_random_exponential
+from threading import Lock, Thread
+from typing import Any, Callable, List, Optional
 
 from azure.kusto.data import KustoClient
 from azure.kusto.data._models import KustoResultTable
@@ -13,6 +15,8 @@ _URI_FORMAT = re.compile("https://(\\w+).(queue|blob|table).(core.\\w+.\\w+)/([\
 _SHOW_VERSION = ".show version"
 _SERVICE_TYPE_COLUMN_NAME = "ServiceType"
 
+_logger = logging.getLogger(__name__)
+
 
 class _ResourceUri:
     def __init__(self, storage_account_name: str, object_type: str, endpoint_suffix: str, object_name: str, sas: str):
@@ -66,20 +70,65 @@ class _IngestClientResources:
         return all(resources)
 
 
+class _CachedValue:
+    """A value fetched from the service, along with the refresh that replaces it once it is stale."""
+
+    def __init__(self, name: str, fetch: Callable, is_usable: Callable[[Any], bool]):
+        self.name = name
+        self.fetch = fetch
+        self.value = None
+        self.last_update: Optional[datetime] = None
+        # Incremented whenever the value is replaced, so that anything derived from it (e.g. storage clients) can be rebuilt
+        self.version = 0
+        # The latest refresh
+        self.refresh = None
+        self._is_usable = is_usable
+
+    def is_usable(self) -> bool:
+        return self.value is not None and self._is_usable(self.value)
+
+    def is_fresh(self, refresh_period: timedelta) -> bool:
+        return self.is_usable() and self.last_update + refresh_period > datetime.utcnow()
+
+    def is_refreshing(self) -> bool:
+        return self.refresh is not None and not self.refresh.done()
+
+    def store(self, value):
+        self.value = value
+        self.last_update = datetime.utcnow()
+        self.version += 1
+
+    def log_failed_refresh(self, error: BaseException):
+        _logger.warning("Failed to fetch the %s from the service: %s", self.name, error, exc_info=error)
+
+
 class _ResourceManager:
+    """
+    Caches the ingestion resources and the authorization context of an ingest client. Thread safe.
+    Once a value is stale, it keeps being served while a single refresh replaces it on a background thread, so that ingestions don't wait for it.
+    Failed refreshes are logged and retried by the next call. Only the first fetch blocks, and it fetches both values at once - or a value that
+    could not be refreshed for longer than the maximal staleness, since its SAS tokens may have expired by then.
+    """
+
     def __init__(self, kusto_client: KustoClient):
         self._kusto_client = kusto_client
         self._refresh_period = timedelta(hours=1)
+        self._max_staleness = timedelta(hours=4)
+        self._lock = Lock()
 
-        self._ingest_client_resources = None
-        self._ingest_client_resources_last_update = None
-
-        self._authorization_context = None
-        self._authorization_context_last_update = None
+        self._ingest_client_resources = _CachedValue(
+            "ingestion resources", self._get_ingest_client_resources_from_service, _IngestClientResources.is_applicable
+        )
+        self._authorization_context = _CachedValue(
+            "authorization context", self._get_authorization_context_from_service, lambda context: context and not context.isspace()
+        )
 
-        self.__set_throttling_settings()
+        # Created under the lock when the first fetch starts, so that tenacity is only imported once the service is called
+        self._retryer = None
 
     def __set_throttling_settings(self, num_of_attempts: int = 4, max_seconds_per_retry: float = 30):
+        from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
         self._retryer = Retrying(
             wait=wait_random_exponential(max=max_seconds_per_retry),
             retry=retry_if_exception_type(KustoThrottlingError),
@@ -87,19 +136,64 @@ class _ResourceManager:
             reraise=True,
         )
 
-    def _refresh_ingest_client_resources(self):
-        if (
-            not self._ingest_client_resources
-            or (self._ingest_client_resources_last_update + self._refresh_period) <= datetime.utcnow()
-            or not self._ingest_client_resources.is_applicable()
-        ):
-            self._ingest_client_resources = self._get_ingest_client_resources_from_service()
-            self._ingest_client_resources_last_update = datetime.utcnow()
+    @property
+    def resources_version(self) -> int:
+        """Incremented whenever the ingestion resources are fetched."""
+        return self._ingest_client_resources.version
+
+    def _cached_values(self) -> List[_CachedValue]:
+        return [self._ingest_client_resources, self._authorization_context]
+
+    def _start_refresh(self, cached: _CachedValue) -> Future:
+        """Starts fetching the value on a background thread. Must be called under the lock."""
+        if self._retryer is None:
+            self.__set_throttling_settings()
+        future = Future()
+
+        def refresh():
+            try:
+                value = cached.fetch()
+                with self._lock:
+                    cached.store(value)
+            except BaseException as e:
+                # A failed background refresh leaves the stale value in place, and the next call starts another one
+                cached.log_failed_refresh(e)
+                future.set_exception(e)
+            else:
+                future.set_result(value)
+
+        Thread(target=refresh, name="KustoIngestResourcesRefresh", daemon=True).start()
+        return future
+
+    def _refresh_if_needed(self, cached: _CachedValue) -> bool:
+        """
+        Starts the refreshes the cached value needs, and returns whether its current value can be served.
+        Must be called under the lock.
+        """
+        if cached.is_fresh(self._refresh_period):
+            return True
+        if cached.is_fresh(self._max_staleness):
+            if not cached.is_refreshing():
+                cached.refresh = self._start_refresh(cached)
+            return True
+
+        # There is nothing to serve, so every value that is missing is fetched at once, rather than one after the other
+        for value in self._cached_values():
+            if not value.is_fresh(self._max_staleness) and not value.is_refreshing():
+                value.refresh = self._start_refresh(value)
+        return False
+
+    def _get(self, cached: _CachedValue):
+        with self._lock:
+            if self._refresh_if_needed(cached):
+                return cached.value
+            refresh = cached.refresh
+        return refresh.result()
 
     def _get_resource_by_name(self, table: KustoResultTable, resource_name: str):
         return [_ResourceUri.parse(row["StorageRoot"]) for row in table if row["ResourceTypeName"] == resource_name]
 
-    def _get_ingest_client_resources_from_service(self):
+    def _get_ingest_client_resources_from_service(self) -> _IngestClientResources:
         result = self._retryer(self._kusto_client.execute, "NetDefaultDB", ".get ingestion resources")
         table = result.primary_results[0]
 
@@ -111,42 +205,27 @@ class _ResourceManager:
 
         return _IngestClientResources(secured_ready_for_aggregation_queues, failed_ingestions_queues, successful_ingestions_queues, containers, status_tables)
 
-    def _refresh_authorization_context(self):
-        if (
-            not self._authorization_context
-            or self._authorization_context.isspace()
-            or (self._authorization_context_last_update + self._refresh_period) <= datetime.utcnow()
-        ):
-            self._authorization_context = self._get_authorization_context_from_service()
-            self._authorization_context_last_update = datetime.utcnow()
-
-    def _get_authorization_context_from_service(self):
+    def _get_authorization_context_from_service(self) -> str:
         result = self._retryer(self._kusto_client.execute, "NetDefaultDB", ".get kusto identity token")
         return result.primary_results[0][0]["AuthorizationContext"]
 
     def get_ingestion_queues(self) -> List[_ResourceUri]:
-        self._refresh_ingest_client_resources()
-        return self._ingest_client_resources.secured_ready_for_aggregation_queues
+        return self._get(self._ingest_client_resources).secured_ready_for_aggregation_queues
 
     def get_failed_ingestions_queues(self) -> List[_ResourceUri]:
-        self._refresh_ingest_client_resources()
-        return self._ingest_client_resources.failed_ingestions_queues
+        return self._get(self._ingest_client_resources).failed_ingestions_queues
 
     def get_successful_ingestions_queues(self) -> List[_ResourceUri]:
-        self._refresh_ingest_client_resources()
-        return self._ingest_client_resources.successful_ingestions_queues
+        return self._get(self._ingest_client_resources).successful_ingestions_queues
 
     def get_containers(self) -> List[_ResourceUri]:
-        self._refresh_ingest_client_resources()
-        return self._ingest_client_resources.containers
+        return self._get(self._ingest_client_resources).containers
 
     def get_ingestions_status_tables(self) -> List[_ResourceUri]:
-        self._refresh_ingest_client_resources()
-        return self._ingest_client_resources.status_tables
+        return self._get(self._ingest_client_resources).status_tables
 
-    def get_authorization_context(self):
-        self._refresh_authorization_context()
-        return self._authorization_context
+    def get_authorization_context(self) -> str:
+        return self._get(self._authorization_context)
 
     def retrieve_service_type(self):
         try:
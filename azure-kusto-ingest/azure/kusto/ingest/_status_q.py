@@ -2,10 +2,12 @@
 # Licensed under the MIT License
 import random
 
-from typing import List, Callable
+from typing import List, Callable, TYPE_CHECKING
 
 from azure.kusto.ingest._resource_manager import _ResourceUri
-from azure.storage.queue import QueueServiceClient, QueueClient, QueueMessage, TextBase64EncodePolicy, TextBase64DecodePolicy
+
+if TYPE_CHECKING:
+    from azure.storage.queue import QueueClient, QueueMessage
 
 
 class QueueDetails:
@@ -24,7 +26,9 @@ class StatusQueue:
         self.get_queues_func = get_queues_func
         self.message_cls = message_cls
 
-    def _get_queues(self) -> List[QueueClient]:
+    def _get_queues(self) -> "List[QueueClient]":
+        from azure.storage.queue import QueueServiceClient, TextBase64DecodePolicy
+
         return [
             QueueServiceClient(q.account_uri).get_queue_client(queue=q.object_name, message_decode_policy=TextBase64DecodePolicy())
             for q in self.get_queues_func()
@@ -34,7 +38,7 @@ class StatusQueue:
         """Checks if Status queue has any messages"""
         return len(self.peek(1, raw=True)) == 0
 
-    def _deserialize_message(self, m: QueueMessage):
+    def _deserialize_message(self, m: "QueueMessage"):
         """Deserialize a message and return at as `message_cls`
         :param m: original message m.
         """
@@ -42,13 +46,13 @@ class StatusQueue:
 
     # TODO: current implementation takes a union top n /  len(queues), which is not ideal,
     #  because the user is not supposed to know that there can be multiple underlying queues
-    def peek(self, n=1, raw=False) -> List[QueueMessage]:
+    def peek(self, n=1, raw=False) -> "List[QueueMessage]":
         """Peek status queue
         :param int n: number of messages to return as part of peek.
         :param bool raw: should message content be returned as is (no parsing).
         """
 
-        def _peek_specific_q(_q: QueueClient, _n: int) -> bool:
+        def _peek_specific_q(_q: "QueueClient", _n: int) -> bool:
             has_messages = False
             for m in _q.peek_messages(max_messages=_n):
                 if m:
@@ -87,14 +91,14 @@ class StatusQueue:
 
     # TODO: current implementation takes a union top n /  len(queues), which is not ideal,
     #  because the user is not supposed to know that there can be multiple underlying queues
-    def pop(self, n: int = 1, raw: bool = False, delete: bool = True) -> List[QueueMessage]:
+    def pop(self, n: int = 1, raw: bool = False, delete: bool = True) -> "List[QueueMessage]":
         """Pop status queue
         :param int n: number of messages to return as part of peek.
         :param bool raw: should message content be returned as is (no parsing).
         :param bool delete: should message be deleted after pop. default is True as this is expected of a q.
         """
 
-        def _pop_specific_q(_q: QueueClient, _n: int) -> bool:
+        def _pop_specific_q(_q: "QueueClient", _n: int) -> bool:
             has_messages = False
             for m in _q.receive_messages(messages_per_page=_n):
                 if m:
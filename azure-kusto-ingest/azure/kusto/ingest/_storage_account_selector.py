@@ -0,0 +1,120 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import itertools
+import random
+import time
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+from ._resource_manager import _ResourceUri
+
+
+class _AccountHealth:
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.last_success: float = 0.0
+        self.consecutive_failures = 0
+        self.demoted_until = 0.0
+
+
+class _StorageAccountSelector:
+    """
+    Chooses which storage account to use for an operation, out of the accounts the ingestion resources spread over.
+    Accounts are used in turn (round-robin), skipping accounts that failed recently, and trying slow accounts only after the others.
+    An account that fails is demoted for a period that doubles with every consecutive failure, and is only used again when all accounts are demoted.
+    """
+
+    def __init__(
+        self,
+        demotion_seconds: float = 10.0,
+        max_demotion_seconds: float = 300.0,
+        slow_factor: float = 3.0,
+        latency_freshness_seconds: float = 300.0,
+        smoothing: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param float demotion_seconds: How long an account is demoted after a first failure.
+        :param float max_demotion_seconds: The maximal demotion period after consecutive failures.
+        :param float slow_factor: An account is considered slow when its latency is this many times the latency of the fastest account.
+        :param float latency_freshness_seconds: How long after its last success an account's latency is still compared to the others.
+        :param float smoothing: The weight of a new sample in the moving average of the latency.
+        :param clock: Returns the current time in seconds.
+        """
+        self.demotion_seconds = demotion_seconds
+        self.max_demotion_seconds = max_demotion_seconds
+        self.slow_factor = slow_factor
+        self.latency_freshness_seconds = latency_freshness_seconds
+        self.smoothing = smoothing
+        self._clock = clock
+        self._lock = Lock()
+        self._health: Dict[str, _AccountHealth] = {}
+        self._turn = itertools.count()
+
+    def _account_health(self, account: str) -> _AccountHealth:
+        health = self._health.get(account)
+        if health is None:
+            health = self._health[account] = _AccountHealth()
+        return health
+
+    def order(self, resources: List[_ResourceUri]) -> List[_ResourceUri]:
+        """
+        Returns one resource of every account, in the order they should be tried.
+        :param resources: The resources (e.g. containers or queues) to choose from. An account can have several of them.
+        """
+        by_account: Dict[str, List[_ResourceUri]] = {}
+        for resource in resources:
+            by_account.setdefault(resource.storage_account_name, []).append(resource)
+        accounts = sorted(by_account)
+        if not accounts:
+            return []
+
+        now = self._clock()
+        with self._lock:
+            turn = next(self._turn) % len(accounts)
+            accounts = accounts[turn:] + accounts[:turn]
+            health = {account: self._account_health(account) for account in accounts}
+
+            available = [account for account in accounts if health[account].demoted_until <= now]
+            demoted = sorted((account for account in accounts if health[account].demoted_until > now), key=lambda a: health[a].demoted_until)
+
+            # Latencies are only compared while they are fresh, so that an account that was slow once gets another chance
+            fresh = {account: health[account].latency for account in available if health[account].latency is not None}
+            fresh = {account: latency for account, latency in fresh.items() if now - health[account].last_success <= self.latency_freshness_seconds}
+            if fresh:
+                threshold = min(fresh.values()) * self.slow_factor
+                available.sort(key=lambda a: fresh.get(a, 0.0) > threshold)
+
+        return [random.choice(by_account[account]) for account in available + demoted]
+
+    def available(self, resources: List[_ResourceUri]) -> List[_ResourceUri]:
+        """
+        Returns all the resources of the accounts that aren't demoted, to spread many operations over.
+        If all the accounts are demoted, returns all the resources.
+        :param resources: The resources (e.g. containers or queues) to choose from.
+        """
+        now = self._clock()
+        with self._lock:
+            available = [resource for resource in resources if self._account_health(resource.storage_account_name).demoted_until <= now]
+        return available or list(resources)
+
+    def report_success(self, account: str, latency: float):
+        """
+        Records a successful operation against an account.
+        :param account: The storage account name.
+        :param latency: The time the operation took, normalized by the caller so that samples of different operations are comparable.
+        """
+        with self._lock:
+            health = self._account_health(account)
+            health.latency = latency if health.latency is None else (1 - self.smoothing) * health.latency + self.smoothing * latency
+            health.last_success = self._clock()
+            health.consecutive_failures = 0
+            health.demoted_until = 0.0
+
+    def report_failure(self, account: str):
+        """Records a failed operation against an account, and demotes it."""
+        with self._lock:
+            health = self._account_health(account)
+            health.consecutive_failures += 1
+            demotion = min(self.max_demotion_seconds, self.demotion_seconds * 2 ** (health.consecutive_failures - 1))
+            health.demoted_until = self._clock() + demotion
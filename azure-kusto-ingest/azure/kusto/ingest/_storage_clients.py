@@ -0,0 +1,77 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+from threading import Lock
+from typing import Dict, Tuple, Any, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from azure.core.pipeline.transport import RequestsTransport
+    from azure.storage.blob import BlobServiceClient
+    from azure.storage.queue import QueueServiceClient
+
+# The defaults the storage SDK uses when it creates a transport of its own
+_CONNECTION_TIMEOUT_SECONDS = 20
+_READ_TIMEOUT_SECONDS = 60
+_CONNECTION_DATA_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class _StorageClientCache:
+    """
+    Caches the azure storage service clients of an ingest client per account URI (which includes the SAS), so that their pipelines are built once
+    and their connections are reused across ingestions.
+    All the clients share a single HTTP transport, and with it a single connection pool.
+    The cache is emptied whenever the ingestion resources it was built for are refreshed, since their SAS tokens are then replaced.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._clients: Dict[Tuple[str, str], Any] = {}
+        self._resources_version: Optional[int] = None
+        self._transport: Optional["RequestsTransport"] = None
+
+    def _get_transport(self) -> "RequestsTransport":
+        if self._transport is None:
+            from azure.core.pipeline.transport import RequestsTransport
+
+            self._transport = RequestsTransport(
+                connection_timeout=_CONNECTION_TIMEOUT_SECONDS, read_timeout=_READ_TIMEOUT_SECONDS, connection_data_block_size=_CONNECTION_DATA_BLOCK_SIZE
+            )
+        return self._transport
+
+    def _get(self, client_type: type, account_uri: str, resources_version: int, **kwargs) -> Any:
+        key = (client_type.__name__, account_uri)
+        with self._lock:
+            if resources_version != self._resources_version:
+                self._clients.clear()
+                self._resources_version = resources_version
+
+            client = self._clients.get(key)
+            if client is None:
+                client = client_type(account_uri, transport=self._get_transport(), **kwargs)
+                self._clients[key] = client
+            return client
+
+    def get_blob_service(self, account_uri: str, resources_version: int, **kwargs) -> "BlobServiceClient":
+        """
+        Returns a cached BlobServiceClient for the account.
+        :param account_uri: The account URI, including the SAS.
+        :param resources_version: The version of the ingestion resources the account was taken from.
+        :param kwargs: Options for a new client. Call `clear` when they change.
+        """
+        from azure.storage.blob import BlobServiceClient
+
+        return self._get(BlobServiceClient, account_uri, resources_version, **kwargs)
+
+    def get_queue_service(self, account_uri: str, resources_version: int, **kwargs) -> "QueueServiceClient":
+        """
+        Returns a cached QueueServiceClient for the account.
+        :param account_uri: The account URI, including the SAS.
+        :param resources_version: The version of the ingestion resources the account was taken from.
+        :param kwargs: Options for a new client. Call `clear` when they change.
+        """
+        from azure.storage.queue import QueueServiceClient
+
+        return self._get(QueueServiceClient, account_uri, resources_version, **kwargs)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
@@ -1,6 +1,21 @@
 import io
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import IO, AnyStr, Optional, Deque
 
-from typing import IO, AnyStr
+# The number of uncompressed bytes read from the source stream at a time.
+DEFAULT_COMPRESSION_CHUNK_SIZE = 1024 * 1024
+# Matches the default compression level of gzip.GzipFile.
+DEFAULT_COMPRESSION_LEVEL = 9
+
+# A gzip member header with no file name and no modification time, followed by raw deflate data (RFC 1952)
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+# An empty final deflate block, which terminates a deflate stream whose blocks were all sync flushed
+_DEFLATE_FINAL_BLOCK = b"\x03\x00"
+# The deflate window - every block is compressed with the end of the previous block as its dictionary, so splitting costs very little compression
+_DEFLATE_WINDOW_SIZE = 32 * 1024
 
 
 def read_until_size_or_end(stream: IO[AnyStr], size: int) -> io.BytesIO:
@@ -76,3 +91,206 @@ def chain_streams(streams, buffer_size=io.DEFAULT_BUFFER_SIZE):
         f.read()
     """
     return io.BufferedReader(ChainStream(streams), buffer_size=buffer_size)
+
+
+def validate_compression_level(compression_level: int):
+    # Level 0 would only store the data, without compressing it
+    if not 1 <= compression_level <= 9:
+        raise ValueError("compression_level must be between 1 and 9")
+
+
+class GzipCompressingStream(io.BufferedIOBase):
+    """
+    A readable, non-seekable stream that gzip compresses a source stream while it is being read.
+    Only a chunk of the source is compressed at a time, so the compressed data is never held in memory in full, and whoever consumes the stream (e.g.
+    a blob upload) can start sending data before the source was read to the end.
+    Text sources are encoded to UTF-8 chunk by chunk.
+    """
+
+    def __init__(self, stream: IO[AnyStr], chunk_size: int = DEFAULT_COMPRESSION_CHUNK_SIZE, compression_level: int = DEFAULT_COMPRESSION_LEVEL):
+        """
+        :param stream: The source stream, read until its end.
+        :param chunk_size: The number of bytes (or characters, for text streams) read from the source at a time.
+        :param compression_level: The zlib compression level, from 1 (fastest) to 9 (best compression).
+        """
+        validate_compression_level(compression_level)
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._compression_level = compression_level
+        # The source can only be compressed again from its start if it is seekable
+        self._source_start = stream.tell() if getattr(stream, "seekable", lambda: False)() else None
+        self._reset()
+
+    def _reset(self):
+        # wbits of 16 + MAX_WBITS produces a gzip header and trailer, rather than a raw zlib stream
+        self._compressor = zlib.compressobj(self._compression_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self._buffer = bytearray()
+        self._position = 0
+        self._source_exhausted = False
+
+        self.raw_size = 0
+        """The number of uncompressed bytes read from the source so far. Once the stream was read to its end, this is the exact raw data size."""
+
+    def rewind(self) -> bool:
+        """
+        Restarts the compression from the position the source was at when this stream was created, e.g. to retry a failed upload.
+        Returns False, and leaves the stream as is, if the source is not seekable.
+        """
+        if self.closed or self._source_start is None:
+            return False
+        self._stream.seek(self._source_start)
+        self._reset()
+        return True
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether the source was read to its end and all the compressed data was returned."""
+        return self._source_exhausted and not self._buffer
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def _read_chunk(self) -> bytes:
+        chunk = self._stream.read(self._chunk_size)
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        self.raw_size += len(chunk)
+        return chunk
+
+    def _fill(self, size: Optional[int]):
+        while not self._source_exhausted and (size is None or len(self._buffer) < size):
+            chunk = self._read_chunk()
+            if not chunk:
+                self._buffer += self._compressor.flush()
+                self._source_exhausted = True
+                break
+            self._buffer += self._compressor.compress(chunk)
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if self.closed:
+            raise ValueError("I/O operation on closed stream")
+        if size is None or size < 0:
+            size = None
+        self._fill(size)
+        if size is None or size >= len(self._buffer):
+            result = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            result = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        self._position += len(result)
+        return result
+
+    def read1(self, size: Optional[int] = -1) -> bytes:
+        return self.read(size)
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._stream.close()
+            finally:
+                super().close()
+
+
+def _compress_block(block: bytes, dictionary: bytes, compression_level: int) -> bytes:
+    if dictionary:
+        compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # A sync flush ends the block on a byte boundary without finishing the deflate stream, so the compressed blocks can simply be concatenated
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+class ParallelGzipCompressingStream(GzipCompressingStream):
+    """
+    A GzipCompressingStream that compresses independent chunks of the source on multiple threads, the way pigz does.
+    zlib releases the GIL while compressing, so the throughput scales with the number of workers.
+    The chunks are joined into a single, standard gzip member, which any gzip decoder can read.
+    At most 2 chunks per worker are read ahead of the consumer, so memory stays bounded.
+    """
+
+    def __init__(
+        self,
+        stream: IO[AnyStr],
+        max_workers: int,
+        chunk_size: int = DEFAULT_COMPRESSION_CHUNK_SIZE,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    ):
+        """
+        :param stream: The source stream, read until its end.
+        :param max_workers: The number of threads compressing chunks concurrently.
+        :param chunk_size: The number of bytes (or characters, for text streams) compressed by a worker at a time.
+        :param compression_level: The zlib compression level, from 1 (fastest) to 9 (best compression).
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be positive")
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._max_pending = 2 * max_workers
+        self._pending: Deque[Future] = deque()
+        super().__init__(stream, chunk_size, compression_level)
+
+    def _reset(self):
+        super()._reset()
+        self._cancel_pending()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self._max_workers, thread_name_prefix="KustoGzip")
+        self._source_read = False
+        self._dictionary = b""
+        self._crc = 0
+        self._buffer += _GZIP_HEADER
+
+    def _shutdown_executor(self):
+        # The threads are released as soon as the source was compressed, since the stream itself might not be closed right away
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _cancel_pending(self):
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    def _submit_chunks(self):
+        while not self._source_read and len(self._pending) < self._max_pending:
+            chunk = self._read_chunk()
+            if not chunk:
+                self._source_read = True
+                break
+            # The CRC is computed on the reading thread, in order - it is much faster than compressing
+            self._crc = zlib.crc32(chunk, self._crc)
+            self._pending.append(self._executor.submit(_compress_block, chunk, self._dictionary, self._compression_level))
+            self._dictionary = chunk[-_DEFLATE_WINDOW_SIZE:]
+
+    def _fill(self, size: Optional[int]):
+        while not self._source_exhausted and (size is None or len(self._buffer) < size):
+            self._submit_chunks()
+            if self._pending:
+                self._buffer += self._pending.popleft().result()
+            else:
+                self._buffer += _DEFLATE_FINAL_BLOCK + struct.pack("<II", self._crc, self.raw_size & 0xFFFFFFFF)
+                self._source_exhausted = True
+                self._shutdown_executor()
+
+    def close(self):
+        if not self.closed:
+            self._cancel_pending()
+            self._shutdown_executor()
+        super().close()
+
+
+def compressing_stream(
+    stream: IO[AnyStr], compression_level: int = DEFAULT_COMPRESSION_LEVEL, max_workers: int = 1, chunk_size: int = DEFAULT_COMPRESSION_CHUNK_SIZE
+) -> GzipCompressingStream:
+    """Wraps a stream with a stream that gzip compresses it while it is read, on `max_workers` threads."""
+    if max_workers > 1:
+        return ParallelGzipCompressingStream(stream, max_workers, chunk_size, compression_level)
+    return GzipCompressingStream(stream, chunk_size, compression_level)
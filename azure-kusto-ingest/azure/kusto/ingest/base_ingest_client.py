@@ -5,12 +5,12 @@ import uuid
 from abc import ABCMeta, abstractmethod
 from copy import copy
 from enum import Enum
-from gzip import GzipFile
-from io import TextIOWrapper, BytesIO
+from io import TextIOWrapper
 from typing import TYPE_CHECKING, Union, IO, AnyStr, Optional
 
 from azure.kusto.data.data_format import DataFormat
 
+from ._stream_extensions import compressing_stream, validate_compression_level, DEFAULT_COMPRESSION_LEVEL
 from .descriptors import FileDescriptor, StreamDescriptor
 from .ingestion_properties import IngestionProperties
 
@@ -30,6 +30,30 @@ class IngestionStatus(Enum):
     SUCCESS = "SUCCESS"
 
 
+class BlobUploadMetrics:
+    """
+    Measurements of the upload of an ingestion source to a blob.
+    """
+
+    bytes_uploaded: int
+    "The number of bytes sent to the blob, after compression."
+
+    duration_seconds: float
+    "The time the upload took, including reading and compressing the source."
+
+    def __init__(self, bytes_uploaded: int, duration_seconds: float):
+        self.bytes_uploaded = bytes_uploaded
+        self.duration_seconds = duration_seconds
+
+    @property
+    def throughput(self) -> float:
+        """The upload throughput, in bytes per second."""
+        return self.bytes_uploaded / self.duration_seconds if self.duration_seconds > 0 else 0.0
+
+    def __repr__(self):
+        return f"BlobUploadMetrics(bytes_uploaded={self.bytes_uploaded}, duration_seconds={self.duration_seconds:.3f}, throughput={self.throughput:.0f})"
+
+
 class IngestionResult:
     """
     The result of an ingestion.
@@ -50,18 +74,33 @@ class IngestionResult:
     blob_uri: Optional[str]
     "The blob uri of the ingestion, if exists."
 
-    def __init__(self, status: IngestionStatus, database: str, table: str, source_id: uuid.UUID, blob_uri: Optional[str] = None):
+    upload_metrics: Optional[BlobUploadMetrics]
+    "Measurements of the upload of the source to a blob, if the client uploaded it."
+
+    def __init__(
+        self,
+        status: IngestionStatus,
+        database: str,
+        table: str,
+        source_id: uuid.UUID,
+        blob_uri: Optional[str] = None,
+        upload_metrics: Optional[BlobUploadMetrics] = None,
+    ):
         self.status = status
         self.database = database
         self.table = table
         self.source_id = source_id
         self.blob_uri = blob_uri
+        self.upload_metrics = upload_metrics
 
     def __repr__(self):
         return f"IngestionResult(status={self.status}, database={self.database}, table={self.table}, source_id={self.source_id}, blob_uri={self.blob_uri})"
 
 
 class BaseIngestClient(metaclass=ABCMeta):
+    _compression_level = DEFAULT_COMPRESSION_LEVEL
+    _compression_workers = 1
+
     @abstractmethod
     def ingest_from_file(self, file_descriptor: Union[FileDescriptor, str], ingestion_properties: IngestionProperties) -> IngestionResult:
         """Ingest from local files.
@@ -85,6 +124,18 @@ class BaseIngestClient(metaclass=ABCMeta):
         """
         pass
 
+    def set_compression_options(self, max_workers: int = 1, compression_level: int = DEFAULT_COMPRESSION_LEVEL):
+        """Set how data that isn't compressed already is gzip compressed before it's sent.
+        :param int max_workers: The number of threads compressing independent chunks of the data concurrently.
+        Compressing on multiple threads speeds up the ingestion of large files, at the cost of a slightly bigger output.
+        :param int compression_level: The compression level, from 1 (fastest) to 9 (best compression).
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be positive")
+        validate_compression_level(compression_level)
+        self._compression_workers = max_workers
+        self._compression_level = compression_level
+
     def ingest_from_dataframe(self, df: "pandas.DataFrame", ingestion_properties: IngestionProperties) -> IngestionResult:
         """Enqueue an ingest command from local files.
         To learn more about ingestion methods go to:
@@ -98,10 +149,11 @@ class BaseIngestClient(metaclass=ABCMeta):
         if not isinstance(df, DataFrame):
             raise ValueError("Expected DataFrame instance, found {}".format(type(df)))
 
-        file_name = "df_{id}_{timestamp}_{uid}.csv.gz".format(id=id(df), timestamp=int(time.time()), uid=uuid.uuid4())
+        # The file is written uncompressed, and compressed while it is sent, according to the compression options of the client
+        file_name = "df_{id}_{timestamp}_{uid}.csv".format(id=id(df), timestamp=int(time.time()), uid=uuid.uuid4())
         temp_file_path = os.path.join(tempfile.gettempdir(), file_name)
 
-        df.to_csv(temp_file_path, index=False, encoding="utf-8", header=False, compression="gzip")
+        df.to_csv(temp_file_path, index=False, encoding="utf-8", header=False)
 
         ingestion_properties.format = DataFormat.CSV
 
@@ -110,8 +162,12 @@ class BaseIngestClient(metaclass=ABCMeta):
         finally:
             os.unlink(temp_file_path)
 
-    @staticmethod
-    def _prepare_stream(stream_descriptor: Union[StreamDescriptor, IO[AnyStr]], ingestion_properties: IngestionProperties) -> StreamDescriptor:
+    def _prepare_stream(self, stream_descriptor: Union[StreamDescriptor, IO[AnyStr]], ingestion_properties: IngestionProperties) -> StreamDescriptor:
+        """
+        Returns a copy of the descriptor whose stream is ready to be sent.
+        If the data should be compressed, the stream is wrapped with a stream that compresses it chunk by chunk while it is read, so nothing is read
+        from the original stream until the returned one is consumed.
+        """
         if not isinstance(stream_descriptor, StreamDescriptor):
             new_descriptor = StreamDescriptor(stream_descriptor)
         else:
@@ -123,18 +179,9 @@ class BaseIngestClient(metaclass=ABCMeta):
             stream = new_descriptor.stream
 
         if not new_descriptor.is_compressed and ingestion_properties.format.compressible:
-            zipped_stream = BytesIO()
-            buffer = stream.read()
-            with GzipFile(filename="data", fileobj=zipped_stream, mode="wb") as f_out:
-                if isinstance(buffer, str):
-                    data = bytes(buffer, "utf-8")
-                    f_out.write(data)
-                else:
-                    f_out.write(buffer)
-            zipped_stream.seek(0)
             new_descriptor.is_compressed = True
             new_descriptor.stream_name += ".gz"
-            stream = zipped_stream
+            stream = compressing_stream(stream, self._compression_level, self._compression_workers)
         new_descriptor.stream = stream
 
         return new_descriptor
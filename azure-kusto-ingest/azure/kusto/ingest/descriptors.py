@@ -1,14 +1,14 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
 import os
-import shutil
 import struct
 import uuid
-from gzip import GzipFile
-from io import BytesIO, SEEK_END
+from io import SEEK_END
 from typing import Union, Optional, AnyStr, IO
 from zipfile import ZipFile
 
+from ._stream_extensions import compressing_stream, DEFAULT_COMPRESSION_LEVEL
+
 OptionalUUID = Optional[Union[str, uuid.UUID]]
 
 
@@ -86,17 +86,19 @@ class FileDescriptor:
     def is_compressed(self) -> bool:
         return self.path.endswith(".gz") or self.path.endswith(".zip")
 
-    def open(self, should_compress: bool) -> BytesIO:
+    def open(self, should_compress: bool, compression_level: int = DEFAULT_COMPRESSION_LEVEL, max_workers: int = 1) -> IO[bytes]:
+        """
+        Opens the file for reading.
+        :param bool should_compress: If True, the file is gzip compressed while it is read, rather than up front,
+        so that it never has to fit in memory. The returned stream is then not seekable.
+        :param int compression_level: The compression level, from 1 (fastest) to 9 (best compression).
+        :param int max_workers: The number of threads compressing independent chunks of the file concurrently.
+        """
         if should_compress:
             self.stream_name += ".gz"
-            file_stream = BytesIO()
-            with open(self.path, "rb") as f_in, GzipFile(filename="data", fileobj=file_stream, mode="wb") as f_out:
-                shutil.copyfileobj(f_in, f_out)
-            file_stream.seek(0)
-        else:
-            file_stream = open(self.path, "rb")
+            return compressing_stream(open(self.path, "rb"), compression_level, max_workers)
 
-        return file_stream
+        return open(self.path, "rb")
 
 
 class BlobDescriptor:
@@ -1,7 +1,12 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
+from typing import List, Optional, TYPE_CHECKING
+
 from azure.kusto.data.exceptions import KustoClientError
 
+if TYPE_CHECKING:
+    from .base_ingest_client import IngestionResult
+
 
 class KustoMappingError(KustoClientError):
     """
@@ -34,3 +39,28 @@ class KustoInvalidEndpointError(KustoClientError):
         if suggested_endpoint_url:
             message = message + ": '" + suggested_endpoint_url + "'"
         super(KustoInvalidEndpointError, self).__init__(message)
+
+
+class KustoBulkEnqueueError(KustoClientError):
+    """
+    Raised when some of the messages of a bulk enqueue couldn't be sent.
+    Holds the outcome of every blob, in the order of the blobs, so that only the failed blobs are retried.
+    A failed message may still have been enqueued, so retrying it may ingest its blob twice.
+    """
+
+    results: List[Optional["IngestionResult"]]
+    "The result of each blob that was queued, or None if its message failed."
+
+    errors: List[Optional[Exception]]
+    "The error of each blob whose message failed, or None if it was queued."
+
+    def __init__(self, results: List[Optional["IngestionResult"]], errors: List[Optional[Exception]]):
+        self.results = results
+        self.errors = errors
+        failed = self.failed_indices
+        super(KustoBulkEnqueueError, self).__init__(f"Failed to enqueue {len(failed)} of {len(errors)} blobs. First error: {errors[failed[0]]!r}")
+
+    @property
+    def failed_indices(self) -> List[int]:
+        """The indices of the blobs whose messages failed."""
+        return [index for index, error in enumerate(self.errors) if error is not None]
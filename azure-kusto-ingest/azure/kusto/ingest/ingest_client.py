@@ -1,21 +1,26 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
-import random
-from typing import Union, AnyStr, IO, List, Optional, Dict
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Union, AnyStr, IO, Iterable, List, Optional, Dict, Tuple, TYPE_CHECKING
 from urllib.parse import urlparse
 
-from azure.storage.blob import BlobServiceClient
-from azure.storage.queue import QueueServiceClient, TextBase64EncodePolicy
-
 from azure.kusto.data import KustoClient, KustoConnectionStringBuilder
-from azure.kusto.data.exceptions import KustoServiceError, KustoBlobError
-from .ingestion_blob_info import IngestionBlobInfo
+from azure.kusto.data.exceptions import KustoServiceError, KustoBlobError, KustoClientError
+from .ingestion_blob_info import IngestionBlobInfo, _IngestionBlobInfoTemplate
 from ._resource_manager import _ResourceManager, _ResourceUri
-from .base_ingest_client import BaseIngestClient, IngestionResult, IngestionStatus
+from ._storage_account_selector import _StorageAccountSelector
+from ._storage_clients import _StorageClientCache
+from .base_ingest_client import BaseIngestClient, IngestionResult, IngestionStatus, BlobUploadMetrics
+from ._stream_extensions import GzipCompressingStream
 from .descriptors import BlobDescriptor, FileDescriptor, StreamDescriptor
-from .exceptions import KustoInvalidEndpointError
+from .exceptions import KustoInvalidEndpointError, KustoBulkEnqueueError
 from .ingestion_properties import IngestionProperties
 
+if TYPE_CHECKING:
+    from azure.storage.blob import BlobClient
+
 
 class QueuedIngestClient(BaseIngestClient):
     """
@@ -27,6 +32,14 @@ class QueuedIngestClient(BaseIngestClient):
     _INGEST_PREFIX = "ingest-"
     _EXPECTED_SERVICE_TYPE = "DataManagement"
     _SERVICE_CLIENT_TIMEOUT_SECONDS = 10 * 60
+    # The defaults of the azure storage SDK
+    DEFAULT_UPLOAD_MAX_CONCURRENCY = 1
+    DEFAULT_UPLOAD_BLOCK_SIZE = 4 * 1024 * 1024
+    DEFAULT_UPLOAD_MAX_SINGLE_PUT_SIZE = 64 * 1024 * 1024
+    # Below the size of the connection pool the storage clients share with each account
+    DEFAULT_ENQUEUE_MAX_CONCURRENCY = 8
+    # The number of storage accounts an upload is attempted on before it fails
+    _MAX_UPLOAD_ATTEMPTS = 3
 
     def __init__(self, kcsb: Union[str, KustoConnectionStringBuilder]):
         """Kusto Ingest Client constructor.
@@ -39,10 +52,38 @@ class QueuedIngestClient(BaseIngestClient):
         self._resource_manager = _ResourceManager(KustoClient(kcsb))
         self._endpoint_service_type = None
         self._suggested_endpoint_uri = None
+        self._upload_max_concurrency = self.DEFAULT_UPLOAD_MAX_CONCURRENCY
+        self._upload_block_size = self.DEFAULT_UPLOAD_BLOCK_SIZE
+        self._upload_max_single_put_size = self.DEFAULT_UPLOAD_MAX_SINGLE_PUT_SIZE
+        self._storage_clients = _StorageClientCache()
+        self._container_selector = _StorageAccountSelector()
+        self._queue_selector = _StorageAccountSelector()
 
     def set_proxy(self, proxy_url: str):
         self._resource_manager.set_proxy(proxy_url)
         self._proxy_dict = {"http": proxy_url, "https": proxy_url}
+        self._storage_clients.clear()
+
+    def set_upload_options(
+        self,
+        max_concurrency: int = DEFAULT_UPLOAD_MAX_CONCURRENCY,
+        block_size: int = DEFAULT_UPLOAD_BLOCK_SIZE,
+        max_single_put_size: int = DEFAULT_UPLOAD_MAX_SINGLE_PUT_SIZE,
+    ):
+        """Set how sources are uploaded to blobs before they're queued for ingestion.
+        Sources larger than `max_single_put_size`, or of unknown size, are uploaded as blocks of `block_size` bytes, `max_concurrency` blocks at a time.
+        Blocks of a file that isn't compressed during the upload are read in parallel from the file itself.
+        Blocks of a compressed stream are read in order, and up to `max_concurrency` of them are held in memory while they're uploaded.
+        :param int max_concurrency: The number of blocks uploaded concurrently.
+        :param int block_size: The size of each block, in bytes.
+        :param int max_single_put_size: The largest size, in bytes, of a source that is uploaded in a single request.
+        """
+        if max_concurrency < 1 or block_size < 1 or max_single_put_size < 1:
+            raise ValueError("Upload options must be positive")
+        self._upload_max_concurrency = max_concurrency
+        self._upload_block_size = block_size
+        self._upload_max_single_put_size = max_single_put_size
+        self._storage_clients.clear()
 
     def ingest_from_file(self, file_descriptor: Union[FileDescriptor, str], ingestion_properties: IngestionProperties) -> IngestionResult:
         """Enqueue an ingest command from local files.
@@ -60,10 +101,11 @@ class QueuedIngestClient(BaseIngestClient):
 
         should_compress = not descriptor.is_compressed and ingestion_properties.format.compressible
 
-        with descriptor.open(should_compress) as stream:
-            blob_descriptor = self._upload_blob(containers, descriptor, ingestion_properties, stream)
+        with descriptor.open(should_compress, self._compression_level, self._compression_workers) as stream:
+            blob_descriptor, upload_metrics = self._upload_blob(containers, descriptor, ingestion_properties, stream)
             result = self.ingest_from_blob(blob_descriptor, ingestion_properties=ingestion_properties)
 
+        result.upload_metrics = upload_metrics
         return result
 
     def ingest_from_stream(self, stream_descriptor: Union[StreamDescriptor, IO[AnyStr]], ingestion_properties: IngestionProperties) -> IngestionResult:
@@ -73,9 +115,11 @@ class QueuedIngestClient(BaseIngestClient):
         """
         containers = self._get_containers()
 
-        stream_descriptor = BaseIngestClient._prepare_stream(stream_descriptor, ingestion_properties)
-        blob_descriptor = self._upload_blob(containers, stream_descriptor, ingestion_properties, stream_descriptor.stream)
-        return self.ingest_from_blob(blob_descriptor, ingestion_properties=ingestion_properties)
+        stream_descriptor = self._prepare_stream(stream_descriptor, ingestion_properties)
+        blob_descriptor, upload_metrics = self._upload_blob(containers, stream_descriptor, ingestion_properties, stream_descriptor.stream)
+        result = self.ingest_from_blob(blob_descriptor, ingestion_properties=ingestion_properties)
+        result.upload_metrics = upload_metrics
+        return result
 
     def ingest_from_blob(self, blob_descriptor: BlobDescriptor, ingestion_properties: IngestionProperties) -> IngestionResult:
         """Enqueue an ingest command from azure blobs.
@@ -84,30 +128,101 @@ class QueuedIngestClient(BaseIngestClient):
         :param azure.kusto.ingest.BlobDescriptor blob_descriptor: An object that contains a description of the blob to be ingested.
         :param azure.kusto.ingest.IngestionProperties ingestion_properties: Ingestion properties.
         """
-        try:
-            queues = self._resource_manager.get_ingestion_queues()
-        except KustoServiceError as ex:
-            self._validate_endpoint_service_type()
-            raise ex
+        queues = self._get_ingestion_queues()
+
+        from azure.storage.queue import TextBase64EncodePolicy
 
-        random_queue = random.choice(queues)
-        queue_service = QueueServiceClient(random_queue.account_uri, proxies=self._proxy_dict)
         authorization_context = self._resource_manager.get_authorization_context()
         ingestion_blob_info = IngestionBlobInfo(blob_descriptor, ingestion_properties=ingestion_properties, auth_context=authorization_context)
         ingestion_blob_info_json = ingestion_blob_info.to_json()
-        queue_client = queue_service.get_queue_client(queue=random_queue.object_name, message_encode_policy=TextBase64EncodePolicy())
-        queue_client.send_message(content=ingestion_blob_info_json, timeout=self._SERVICE_CLIENT_TIMEOUT_SECONDS)
+
+        queue = self._queue_selector.order(queues)[0]
+        queue_service = self._storage_clients.get_queue_service(queue.account_uri, self._resource_manager.resources_version, proxies=self._proxy_dict)
+        queue_client = queue_service.get_queue_client(queue=queue.object_name, message_encode_policy=TextBase64EncodePolicy())
+        start_time = time.perf_counter()
+        try:
+            queue_client.send_message(content=ingestion_blob_info_json, timeout=self._SERVICE_CLIENT_TIMEOUT_SECONDS)
+        except Exception:
+            # The message isn't sent again to another queue, since it may have been enqueued even though the request failed
+            self._queue_selector.report_failure(queue.storage_account_name)
+            raise
+        self._queue_selector.report_success(queue.storage_account_name, time.perf_counter() - start_time)
 
         return IngestionResult(
             IngestionStatus.QUEUED, ingestion_properties.database, ingestion_properties.table, blob_descriptor.source_id, blob_descriptor.path
         )
 
+    def ingest_from_blobs(
+        self, blob_descriptors: Iterable[BlobDescriptor], ingestion_properties: IngestionProperties, max_concurrency: int = DEFAULT_ENQUEUE_MAX_CONCURRENCY
+    ) -> List[IngestionResult]:
+        """Enqueue ingest commands for many azure blobs that share their ingestion properties.
+        This is faster than calling `ingest_from_blob` for each blob: the ingestion properties are serialized once,
+        and the messages are spread over all the ingestion queues and sent concurrently.
+        If some messages can't be sent, the remaining messages are still sent, and a KustoBulkEnqueueError holding the outcome of every blob is raised.
+        :param blob_descriptors: The blobs to be ingested.
+        :param azure.kusto.ingest.IngestionProperties ingestion_properties: Ingestion properties.
+        :param int max_concurrency: The number of messages sent concurrently.
+        :return: The result of each blob, in the order of the blobs.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive")
+        blob_descriptors = list(blob_descriptors)
+        if not blob_descriptors:
+            return []
+
+        queues = self._get_ingestion_queues()
+
+        from azure.storage.queue import TextBase64EncodePolicy
+
+        template = _IngestionBlobInfoTemplate(ingestion_properties, auth_context=self._resource_manager.get_authorization_context())
+        queues = self._queue_selector.available(queues)
+        queue_clients = []
+        for queue in queues:
+            queue_service = self._storage_clients.get_queue_service(queue.account_uri, self._resource_manager.resources_version, proxies=self._proxy_dict)
+            queue_clients.append(queue_service.get_queue_client(queue=queue.object_name, message_encode_policy=TextBase64EncodePolicy()))
+
+        def enqueue(index: int) -> Optional[Exception]:
+            queue, queue_client = queues[index % len(queues)], queue_clients[index % len(queues)]
+            start_time = time.perf_counter()
+            try:
+                queue_client.send_message(content=template.to_json(blob_descriptors[index]), timeout=self._SERVICE_CLIENT_TIMEOUT_SECONDS)
+            except Exception as e:
+                self._queue_selector.report_failure(queue.storage_account_name)
+                return e
+            self._queue_selector.report_success(queue.storage_account_name, time.perf_counter() - start_time)
+            return None
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(blob_descriptors))) as executor:
+            errors = list(executor.map(enqueue, range(len(blob_descriptors))))
+
+        results = [
+            IngestionResult(IngestionStatus.QUEUED, ingestion_properties.database, ingestion_properties.table, blob_descriptor.source_id, blob_descriptor.path)
+            if error is None
+            else None
+            for blob_descriptor, error in zip(blob_descriptors, errors)
+        ]
+        if any(error is not None for error in errors):
+            raise KustoBulkEnqueueError(results, errors)
+        return results
+
+    def _get_ingestion_queues(self) -> List[_ResourceUri]:
+        try:
+            queues = self._resource_manager.get_ingestion_queues()
+        except KustoServiceError as ex:
+            self._validate_endpoint_service_type()
+            raise ex
+        if not queues:
+            raise KustoClientError("The ingestion resources of the cluster don't include any ingestion queue")
+        return queues
+
     def _get_containers(self) -> List[_ResourceUri]:
         try:
             containers = self._resource_manager.get_containers()
         except KustoServiceError as ex:
             self._validate_endpoint_service_type()
             raise ex
+        if not containers:
+            raise KustoClientError("The ingestion resources of the cluster don't include any temporary storage container")
         return containers
 
     def _upload_blob(
@@ -116,18 +231,66 @@ class QueuedIngestClient(BaseIngestClient):
         descriptor: Union[FileDescriptor, StreamDescriptor],
         ingestion_properties: IngestionProperties,
         stream: IO[AnyStr],
-    ) -> BlobDescriptor:
+    ) -> Tuple[BlobDescriptor, BlobUploadMetrics]:
         blob_name = "{db}__{table}__{guid}__{file}".format(
             db=ingestion_properties.database, table=ingestion_properties.table, guid=descriptor.source_id, file=descriptor.stream_name
         )
-        random_container = random.choice(containers)
-        try:
-            blob_service = BlobServiceClient(random_container.account_uri, proxies=self._proxy_dict)
-            blob_client = blob_service.get_blob_client(container=random_container.object_name, blob=blob_name)
-            blob_client.upload_blob(data=stream, timeout=self._SERVICE_CLIENT_TIMEOUT_SECONDS)
-        except Exception as e:
-            raise KustoBlobError(e)
-        return BlobDescriptor(blob_client.url, descriptor.size, descriptor.source_id)
+        start_position = None if isinstance(stream, GzipCompressingStream) or not stream.seekable() else stream.tell()
+        blob_client = upload_metrics = last_error = None
+        for attempt, container in enumerate(self._container_selector.order(containers)[: self._MAX_UPLOAD_ATTEMPTS]):
+            # A failed upload can only be retried on another account if the stream can be read again from its start
+            if attempt > 0 and not self._rewind(stream, start_position):
+                break
+            try:
+                blob_client, upload_metrics = self._upload_blob_to_container(container, blob_name, stream)
+            except Exception as e:
+                self._container_selector.report_failure(container.storage_account_name)
+                last_error = e
+                continue
+
+            # Uploads are compared by their time per MB, so that big uploads don't make an account seem slow
+            megabytes = max(1.0, upload_metrics.bytes_uploaded / (1024 * 1024))
+            self._container_selector.report_success(container.storage_account_name, upload_metrics.duration_seconds / megabytes)
+            break
+
+        if blob_client is None:
+            raise KustoBlobError(last_error)
+
+        # A stream compressed during the upload counted the exact number of bytes it compressed
+        size = stream.raw_size if isinstance(stream, GzipCompressingStream) and stream.exhausted else descriptor.size
+        return BlobDescriptor(blob_client.url, size, descriptor.source_id), upload_metrics
+
+    def _upload_blob_to_container(self, container: _ResourceUri, blob_name: str, stream: IO[AnyStr]) -> Tuple["BlobClient", BlobUploadMetrics]:
+        # The progress hook is called from the upload threads with the total number of bytes uploaded so far
+        bytes_uploaded = [0]
+        progress_lock = Lock()
+
+        def on_progress(current: int, total: Optional[int]):
+            with progress_lock:
+                bytes_uploaded[0] = max(bytes_uploaded[0], current)
+
+        start_time = time.perf_counter()
+        blob_service = self._storage_clients.get_blob_service(
+            container.account_uri,
+            self._resource_manager.resources_version,
+            proxies=self._proxy_dict,
+            max_block_size=self._upload_block_size,
+            max_single_put_size=self._upload_max_single_put_size,
+        )
+        blob_client = blob_service.get_blob_client(container=container.object_name, blob=blob_name)
+        blob_client.upload_blob(
+            data=stream, timeout=self._SERVICE_CLIENT_TIMEOUT_SECONDS, max_concurrency=self._upload_max_concurrency, progress_hook=on_progress
+        )
+        return blob_client, BlobUploadMetrics(bytes_uploaded[0], time.perf_counter() - start_time)
+
+    @staticmethod
+    def _rewind(stream: IO[AnyStr], start_position: Optional[int]) -> bool:
+        if isinstance(stream, GzipCompressingStream):
+            return stream.rewind()
+        if start_position is None:
+            return False
+        stream.seek(start_position)
+        return True
 
     def _validate_endpoint_service_type(self):
         if not self._hostname_starts_with_ingest(self._connection_datasource):
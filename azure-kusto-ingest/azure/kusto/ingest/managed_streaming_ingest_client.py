@@ -1,14 +1,14 @@
 import uuid
 from io import SEEK_SET
-from typing import TYPE_CHECKING, Union, IO, AnyStr
-from tenacity import stop_after_delay, Retrying, wait_random_exponential, stop_after_attempt, _utils
+from typing import TYPE_CHECKING, Union, IO, AnyStr, Iterable, List, Optional
 
 from azure.kusto.data import KustoConnectionStringBuilder
 from azure.kusto.data.exceptions import KustoApiError
 
-from . import IngestionProperties, BlobDescriptor, StreamDescriptor, FileDescriptor
-from ._stream_extensions import read_until_size_or_end, chain_streams
+from ._stream_extensions import read_until_size_or_end, chain_streams, DEFAULT_COMPRESSION_LEVEL
 from .base_ingest_client import BaseIngestClient, IngestionResult
+from .descriptors import BlobDescriptor, StreamDescriptor, FileDescriptor
+from .ingestion_properties import IngestionProperties
 from .ingest_client import QueuedIngestClient
 from .streaming_ingest_client import KustoStreamingIngestClient
 
@@ -63,7 +63,11 @@ class ManagedStreamingIngestClient(BaseIngestClient):
         self.streaming_client = KustoStreamingIngestClient(engine_kcsb)
         self._set_retry_settings()
 
-    def _set_retry_settings(self, max_seconds_per_retry: float = _utils.MAX_WAIT, num_of_attempts: int = 3):
+    def _set_retry_settings(self, max_seconds_per_retry: Optional[float] = None, num_of_attempts: int = 3):
+        """
+        :param max_seconds_per_retry: The maximal wait between streaming attempts. If None, the wait is not capped.
+        :param num_of_attempts: The number of streaming attempts before falling back to queued ingestion.
+        """
         self._num_of_attempts = num_of_attempts
         self._max_seconds_per_retry = max_seconds_per_retry
 
@@ -71,6 +75,20 @@ class ManagedStreamingIngestClient(BaseIngestClient):
         self.queued_client.set_proxy(proxy_url)
         self.streaming_client.set_proxy(proxy_url)
 
+    def set_compression_options(self, max_workers: int = 1, compression_level: int = DEFAULT_COMPRESSION_LEVEL):
+        super().set_compression_options(max_workers, compression_level)
+        self.queued_client.set_compression_options(max_workers, compression_level)
+        self.streaming_client.set_compression_options(max_workers, compression_level)
+
+    def set_upload_options(
+        self,
+        max_concurrency: int = QueuedIngestClient.DEFAULT_UPLOAD_MAX_CONCURRENCY,
+        block_size: int = QueuedIngestClient.DEFAULT_UPLOAD_BLOCK_SIZE,
+        max_single_put_size: int = QueuedIngestClient.DEFAULT_UPLOAD_MAX_SINGLE_PUT_SIZE,
+    ):
+        """Set how sources that fall back to queued ingestion are uploaded to blobs. See `QueuedIngestClient.set_upload_options`."""
+        self.queued_client.set_upload_options(max_concurrency, block_size, max_single_put_size)
+
     def ingest_from_file(self, file_descriptor: Union[FileDescriptor, str], ingestion_properties: IngestionProperties) -> IngestionResult:
         stream_descriptor = StreamDescriptor.from_file_descriptor(file_descriptor)
 
@@ -78,9 +96,11 @@ class ManagedStreamingIngestClient(BaseIngestClient):
             return self.ingest_from_stream(stream_descriptor, ingestion_properties)
 
     def ingest_from_stream(self, stream_descriptor: Union[StreamDescriptor, IO[AnyStr]], ingestion_properties: IngestionProperties) -> IngestionResult:
-        stream_descriptor = BaseIngestClient._prepare_stream(stream_descriptor, ingestion_properties)
+        stream_descriptor = self._prepare_stream(stream_descriptor, ingestion_properties)
         stream = stream_descriptor.stream
 
+        # The stream is compressed while it is read, so at most the streaming size limit is compressed and held in memory before deciding
+        # whether to stream it. If it's too big, the rest is compressed while it's uploaded by the queued client.
         buffered_stream = read_until_size_or_end(stream, self.MAX_STREAMING_SIZE_IN_BYTES + 1)
 
         if len(buffered_stream.getbuffer()) > self.MAX_STREAMING_SIZE_IN_BYTES:
@@ -89,12 +109,13 @@ class ManagedStreamingIngestClient(BaseIngestClient):
 
         stream_descriptor.stream = buffered_stream
 
+        from tenacity import Retrying, wait_random_exponential, stop_after_attempt
+
+        wait = wait_random_exponential() if self._max_seconds_per_retry is None else wait_random_exponential(max=self._max_seconds_per_retry)
         try:
-            for attempt in Retrying(
-                stop=stop_after_attempt(self._num_of_attempts), wait=wait_random_exponential(max=self._max_seconds_per_retry), reraise=True
-            ):
+            for attempt in Retrying(stop=stop_after_attempt(self._num_of_attempts), wait=wait, reraise=True):
                 with attempt:
-                    stream.seek(0, SEEK_SET)
+                    buffered_stream.seek(0, SEEK_SET)
                     client_request_id = ManagedStreamingIngestClient._get_request_id(stream_descriptor.source_id, attempt.retry_state.attempt_number - 1)
                     return self.streaming_client._ingest_from_stream_with_client_request_id(stream_descriptor, ingestion_properties, client_request_id)
         except KustoApiError as ex:
@@ -117,6 +138,23 @@ class ManagedStreamingIngestClient(BaseIngestClient):
         """
         return self.queued_client.ingest_from_blob(blob_descriptor, ingestion_properties)
 
+    def ingest_from_blobs(
+        self,
+        blob_descriptors: Iterable[BlobDescriptor],
+        ingestion_properties: IngestionProperties,
+        max_concurrency: int = QueuedIngestClient.DEFAULT_ENQUEUE_MAX_CONCURRENCY,
+    ) -> List[IngestionResult]:
+        """
+        Enqueue ingest commands for many azure blobs that share their ingestion properties.
+
+        For ManagedStreamingIngestClient, this method always uses Queued Ingest, like `ingest_from_blob`.
+
+        :param blob_descriptors: The blobs to be ingested.
+        :param azure.kusto.ingest.IngestionProperties ingestion_properties: Ingestion properties.
+        :param int max_concurrency: The number of messages sent concurrently.
+        """
+        return self.queued_client.ingest_from_blobs(blob_descriptors, ingestion_properties, max_concurrency)
+
     @staticmethod
     def _get_request_id(source_id: uuid.UUID, attempt: int):
         return f"KPC.executeManagedStreamingIngest;{source_id};{attempt}"
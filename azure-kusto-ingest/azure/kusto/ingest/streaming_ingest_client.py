@@ -1,10 +1,12 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
+from io import BytesIO
 from typing import Union, AnyStr, Optional
 
 from typing import IO
 
 from azure.kusto.data import KustoClient, KustoConnectionStringBuilder, ClientRequestProperties
+from ._stream_extensions import GzipCompressingStream
 from .base_ingest_client import BaseIngestClient, IngestionResult, IngestionStatus
 from .descriptors import FileDescriptor, StreamDescriptor
 from .ingestion_properties import IngestionProperties
@@ -48,7 +50,11 @@ class KustoStreamingIngestClient(BaseIngestClient):
     def _ingest_from_stream_with_client_request_id(
         self, stream_descriptor: Union[StreamDescriptor, IO[AnyStr]], ingestion_properties: IngestionProperties, client_request_id: Optional[str]
     ) -> IngestionResult:
-        stream_descriptor = BaseIngestClient._prepare_stream(stream_descriptor, ingestion_properties)
+        stream_descriptor = self._prepare_stream(stream_descriptor, ingestion_properties)
+        if isinstance(stream_descriptor.stream, GzipCompressingStream):
+            # Streaming ingestion is limited to a few megabytes, so the compressed data is sent as a single body with a known length
+            stream_descriptor.stream = BytesIO(stream_descriptor.stream.read())
+
         additional_properties = None
         if client_request_id:
             additional_properties = ClientRequestProperties()
@@ -0,0 +1,72 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+"""
+Compares the throughput of the previous single-threaded GzipFile compression with the streaming and the parallel block compression.
+The data is synthetic CSV, which compresses roughly like real ingestion data.
+Run from the azure-kusto-ingest directory: python tests/benchmarks/compression.py
+"""
+import argparse
+import gzip
+import io
+import os
+import random
+import shutil
+import time
+
+from azure.kusto.ingest._stream_extensions import compressing_stream
+
+
+def csv_data(size: int) -> bytes:
+    rng = random.Random(0)
+    lines = []
+    length = 0
+    while length < size:
+        line = "{},{},{:.4f},2023-01-{:02d}T{:02d}:00:00Z,{}\n".format(
+            rng.randrange(10**9),
+            rng.choice(["TEXAS", "OHIO", "KANSAS", "IOWA"]),
+            rng.random() * 1000,
+            rng.randint(1, 28),
+            rng.randint(0, 23),
+            rng.random() < 0.5,
+        )
+        lines.append(line)
+        length += len(line)
+    return "".join(lines).encode("utf-8")
+
+
+def legacy_compress(data: bytes, level: int) -> bytes:
+    compressed = io.BytesIO()
+    with gzip.GzipFile(filename="data", fileobj=compressed, mode="wb", compresslevel=level) as f_out:
+        shutil.copyfileobj(io.BytesIO(data), f_out)
+    return compressed.getvalue()
+
+
+def streaming_compress(data: bytes, level: int, max_workers: int) -> bytes:
+    stream = compressing_stream(io.BytesIO(data), level, max_workers)
+    # Read in blocks, like a blob upload does
+    return b"".join(iter(lambda: stream.read(4 * 1024 * 1024), b""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--level", type=int, default=6)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    data = csv_data(args.size_mb * 1024 * 1024)
+    candidates = {"GzipFile (legacy)": lambda: legacy_compress(data, args.level), "streaming": lambda: streaming_compress(data, args.level, 1)}
+    for workers in sorted(set(args.workers)):
+        candidates["parallel, {} workers".format(workers)] = lambda workers=workers: streaming_compress(data, args.level, workers)
+
+    print("{} MB, level {}, {} cpus".format(args.size_mb, args.level, os.cpu_count()))
+    for name, candidate in candidates.items():
+        start = time.perf_counter()
+        compressed = candidate()
+        elapsed = time.perf_counter() - start
+        assert gzip.decompress(compressed) == data
+        print("{:<24} {:8.1f} MB/s  ratio {:.2f}".format(name, len(data) / elapsed / 1024 / 1024, len(data) / len(compressed)))
+
+
+if __name__ == "__main__":
+    main()
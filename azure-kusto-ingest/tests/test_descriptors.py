@@ -1,13 +1,15 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
+import gzip
 import sys
 import uuid
-from io import BytesIO
+from io import BytesIO, StringIO, UnsupportedOperation
 from os import path
 
 import pytest
 
 from azure.kusto.ingest import FileDescriptor, BlobDescriptor, StreamDescriptor
+from azure.kusto.ingest._stream_extensions import GzipCompressingStream, ParallelGzipCompressingStream
 
 
 class TestDescriptors:
@@ -104,6 +106,56 @@ class TestDescriptors:
 
         assert stream.closed is True
 
+    def test_compressed_file_is_streamed(self):
+        """Tests that a file is compressed while it is read, in chunks."""
+        file_path = path.join(path.dirname(path.abspath(__file__)), "input", "dataset.csv")
+        with open(file_path, "rb") as f:
+            content = f.read()
+
+        descriptor = FileDescriptor(file_path)
+        with descriptor.open(True) as stream:
+            assert isinstance(stream, GzipCompressingStream)
+            assert not stream.seekable()
+            with pytest.raises(UnsupportedOperation):
+                stream.seek(0)
+
+            chunks = iter(lambda: stream.read(100), b"")
+            compressed = b"".join(chunks)
+            assert stream.exhausted
+            assert stream.tell() == len(compressed)
+            assert stream.raw_size == len(content)
+
+        assert gzip.decompress(compressed) == content
+
+    def test_compressing_stream_encodes_text(self):
+        text = "שלום,world\n" * 10000
+        stream = GzipCompressingStream(StringIO(text), chunk_size=7)
+        assert gzip.decompress(stream.read()) == text.encode("utf-8")
+        assert stream.raw_size == len(text.encode("utf-8"))
+        assert stream.read() == b""
+
+    def test_compressed_file_in_parallel(self):
+        file_path = path.join(path.dirname(path.abspath(__file__)), "input", "dataset.csv")
+        with open(file_path, "rb") as f:
+            content = f.read()
+
+        with FileDescriptor(file_path).open(True, compression_level=1, max_workers=3) as stream:
+            assert isinstance(stream, ParallelGzipCompressingStream)
+            assert gzip.decompress(stream.read()) == content
+
+        # Small chunks, so that every chunk is compressed separately with the end of the previous one as its dictionary
+        with ParallelGzipCompressingStream(open(file_path, "rb"), max_workers=3, chunk_size=100) as stream:
+            compressed = b"".join(iter(lambda: stream.read(64), b""))
+            assert stream.raw_size == len(content)
+        assert gzip.decompress(compressed) == content
+
+        with pytest.raises(ValueError):
+            ParallelGzipCompressingStream(BytesIO(content), max_workers=0)
+        with pytest.raises(ValueError):
+            ParallelGzipCompressingStream(BytesIO(content), max_workers=2, compression_level=0)
+        with pytest.raises(ValueError):
+            GzipCompressingStream(BytesIO(content), compression_level=10)
+
     def test_uuid_stream_descriptor(self):
         dummy_stream = BytesIO(b"dummy")
 
@@ -0,0 +1,63 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+# Importing the package itself should not load any of these - they are only needed once a client is created or used.
+HEAVY_MODULES = ["requests", "msal", "azure.identity", "azure.core", "azure.storage.blob", "azure.storage.queue", "tenacity"]
+# Streaming ingestion never touches azure storage, and tenacity is only needed once a client retries a call to the service.
+STORAGE_MODULES = ["azure.storage.blob", "azure.storage.queue", "tenacity"]
+# A generous budget, so that the test is not flaky on slow machines, but still catches an eager import of the storage SDKs.
+IMPORT_TIME_BUDGET_MICROSECONDS = 150_000
+
+
+def _run(code: str, *args: str) -> subprocess.CompletedProcess:
+    package_roots = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    package_roots.append(os.path.join(os.path.dirname(package_roots[0]), "azure-kusto-data"))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(package_roots + [os.environ.get("PYTHONPATH", "")]))
+    return subprocess.run([sys.executable, *args, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+
+def _loaded_modules(statement: str, modules: list) -> list:
+    code = "import json, sys\n{}\nprint(json.dumps([m for m in {!r} if m in sys.modules]))".format(statement, modules)
+    return json.loads(_run(code).stdout)
+
+
+def test_package_import_is_lightweight():
+    assert _loaded_modules("import azure.kusto.ingest", HEAVY_MODULES) == []
+
+
+def test_streaming_client_does_not_load_storage():
+    statement = "from azure.kusto.ingest import KustoStreamingIngestClient\nKustoStreamingIngestClient('https://somecluster.kusto.windows.net')"
+    assert _loaded_modules(statement, STORAGE_MODULES) == []
+
+
+def test_clients_do_not_load_storage_until_used():
+    statement = (
+        "from azure.kusto.ingest import ManagedStreamingIngestClient\nManagedStreamingIngestClient.from_dm_kcsb('https://ingest-somecluster.kusto.windows.net')"
+    )
+    assert _loaded_modules(statement, STORAGE_MODULES) == []
+
+
+def test_lazy_exports():
+    import azure.kusto.ingest
+    from azure.kusto.ingest.ingest_client import QueuedIngestClient
+
+    assert azure.kusto.ingest.QueuedIngestClient is QueuedIngestClient
+    assert "ManagedStreamingIngestClient" in dir(azure.kusto.ingest)
+    assert "ManagedStreamingIngestClient" in azure.kusto.ingest.__all__
+    assert all(hasattr(azure.kusto.ingest, name) for name in azure.kusto.ingest.__all__)
+    with pytest.raises(AttributeError):
+        azure.kusto.ingest.NoSuchName
+
+
+def test_import_time_budget():
+    stderr = _run("import azure.kusto.ingest", "-X", "importtime").stderr
+    # Each line is "import time: <self us> | <cumulative us> | <module>"
+    cumulative = {match.group(2): int(match.group(1)) for match in re.finditer(r"\|\s*(\d+)\s*\|\s*(\S+)\s*$", stderr, re.MULTILINE)}
+    assert cumulative["azure.kusto.ingest"] < IMPORT_TIME_BUDGET_MICROSECONDS
@@ -16,7 +16,7 @@ from azure.kusto.ingest import (
     ValidationOptions,
     ValidationImplications,
 )
-from azure.kusto.ingest.ingestion_blob_info import IngestionBlobInfo
+from azure.kusto.ingest.ingestion_blob_info import IngestionBlobInfo, _IngestionBlobInfoTemplate
 
 TIMESTAMP_REGEX = "[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}.[0-9]{6}"
 
@@ -110,6 +110,40 @@ class IngestionBlobInfoTest(unittest.TestCase):
         blob_info = IngestionBlobInfo(blob, properties, auth_context="authorizationContextText")
         self._verify_ingestion_blob_info_result(blob_info.to_json())
 
+    def test_blob_info_template(self):
+        """Tests that the messages serialized from a template match the ones of IngestionBlobInfo."""
+        validation_policy = ValidationPolicy(ValidationOptions.ValidateCsvInputConstantColumns, ValidationImplications.BestEffort)
+        properties = IngestionProperties(
+            database="database",
+            table="table",
+            data_format=DataFormat.CSV,
+            column_mappings=[ColumnMapping("ColumnName", "cslDataType", ordinal=1)],
+            additional_tags=["tag"],
+            ingest_if_not_exists=["ingestIfNotExistTags"],
+            ingest_by_tags=["ingestByTags"],
+            drop_by_tags=["dropByTags"],
+            flush_immediately=True,
+            report_level=ReportLevel.DoNotReport,
+            report_method=ReportMethod.Queue,
+            validation_policy=validation_policy,
+            additional_properties={"creationTime": "2020-01-01"},
+        )
+        template = _IngestionBlobInfoTemplate(properties, auth_context="authorizationContextText")
+        blob = BlobDescriptor("somepath", 10)
+        self._verify_ingestion_blob_info_result(template.to_json(blob))
+
+        expected = json.loads(IngestionBlobInfo(blob, properties, auth_context="authorizationContextText").to_json())
+        result = json.loads(template.to_json(blob))
+        del expected["SourceMessageCreationTime"], result["SourceMessageCreationTime"]
+        assert result == expected
+        assert "authorizationContext" not in properties.additional_properties
+
+        other_blob = BlobDescriptor("otherpath")
+        result = json.loads(template.to_json(other_blob))
+        assert result["BlobPath"] == "otherpath"
+        assert "RawDataSize" not in result
+        assert result["Id"] == str(other_blob.source_id)
+
     def _verify_ingestion_blob_info_result(self, ingestion_blob_info):
         result = json.loads(ingestion_blob_info)
         assert result is not None
@@ -1,9 +1,11 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License
+import gzip
 import io
 import json
 import os
 import uuid
+from datetime import timedelta
 from pathlib import Path
 
 import pytest
@@ -11,9 +13,15 @@ import responses
 from mock import patch
 
 from azure.kusto.data.data_format import DataFormat
-
-from azure.kusto.ingest import QueuedIngestClient, IngestionProperties, IngestionStatus
-from azure.kusto.ingest.exceptions import KustoInvalidEndpointError
+from azure.storage.blob import BlobServiceClient
+from azure.storage.queue import QueueServiceClient
+
+from azure.kusto.data.exceptions import KustoBlobError, KustoClientError
+from azure.kusto.ingest import QueuedIngestClient, IngestionProperties, IngestionStatus, BlobDescriptor, FileDescriptor, StreamDescriptor
+from azure.kusto.ingest._resource_manager import _ResourceUri
+from azure.kusto.ingest._storage_account_selector import _StorageAccountSelector
+from azure.kusto.ingest._stream_extensions import GzipCompressingStream, ParallelGzipCompressingStream
+from azure.kusto.ingest.exceptions import KustoInvalidEndpointError, KustoBulkEnqueueError
 from azure.kusto.ingest.managed_streaming_ingest_client import ManagedStreamingIngestClient
 
 pandas_installed = False
@@ -24,6 +32,12 @@ try:
 except:
     pass
 
+
+class UnseekableStream(io.BytesIO):
+    def seekable(self):
+        return False
+
+
 UUID_REGEX = "[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}"
 BLOB_NAME_REGEX = "database__table__" + UUID_REGEX + "__dataset.csv.gz"
 BLOB_URL_REGEX = "https://storageaccount.blob.core.windows.net/tempstorage/database__table__" + UUID_REGEX + "__dataset.csv.gz[?]sas"
@@ -238,6 +252,222 @@ class TestQueuedIngestClient:
             "https://storageaccount.blob.core.windows.net/tempstorage/database__table__11111111-1111-1111-1111-111111111111__dataset.csv.gz?",
         )
 
+    def test_compression_options(self):
+        ingest_client = QueuedIngestClient("https://ingest-somecluster.kusto.windows.net")
+        ingestion_properties = IngestionProperties(database="database", table="table", data_format=DataFormat.CSV)
+        text = "a,b,c\n" * 100000
+
+        assert type(ingest_client._prepare_stream(io.StringIO(text), ingestion_properties).stream) is GzipCompressingStream
+
+        ingest_client.set_compression_options(max_workers=4, compression_level=1)
+        stream = ingest_client._prepare_stream(io.StringIO(text), ingestion_properties).stream
+        assert type(stream) is ParallelGzipCompressingStream
+        assert gzip.decompress(stream.read()) == text.encode("utf-8")
+
+        with pytest.raises(ValueError):
+            ingest_client.set_compression_options(max_workers=0)
+        with pytest.raises(ValueError):
+            ingest_client.set_compression_options(compression_level=10)
+        with pytest.raises(ValueError):
+            # Level 0 would only store the data, not compress it
+            ingest_client.set_compression_options(compression_level=0)
+
+    @responses.activate
+    @patch("azure.kusto.data.security._AadHelper.acquire_authorization_header", return_value=None)
+    @patch("azure.storage.blob.BlobClient.upload_blob")
+    @patch("azure.storage.queue.QueueClient.send_message")
+    def test_ingest_from_file_reports_streamed_size(self, mock_put_message_in_queue, mock_upload_blob_from_stream, mock_aad):
+        responses.add_callback(
+            responses.POST, "https://ingest-somecluster.kusto.windows.net/v1/rest/mgmt", callback=request_callback, content_type="application/json"
+        )
+        uploaded = []
+        mock_upload_blob_from_stream.side_effect = lambda data, **kwargs: uploaded.append(data.read())
+
+        ingest_client = QueuedIngestClient("https://ingest-somecluster.kusto.windows.net")
+        ingestion_properties = IngestionProperties(database="database", table="table", data_format=DataFormat.CSV)
+        file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "input", "dataset.csv")
+
+        ingest_client.ingest_from_file(FileDescriptor(file_path, size=10), ingestion_properties=ingestion_properties)
+
+        queued_message_json = json.loads(mock_put_message_in_queue.call_args_list[0][1]["content"])
+        assert queued_message_json["RawDataSize"] == os.path.getsize(file_path)
+        assert gzip.decompress(uploaded[0]) == Path(file_path).read_bytes()
+
+    @responses.activate
+    @patch("azure.kusto.data.security._AadHelper.acquire_authorization_header", return_value=None)
+    @patch("azure.storage.blob.BlobServiceClient.__init__", autospec=True, side_effect=BlobServiceClient.__init__)
+    @patch("azure.storage.blob.BlobClient.upload_blob")
+    @patch("azure.storage.queue.QueueClient.send_message")
+    def test_upload_options_and_metrics(self, mock_put_message_in_queue, mock_upload_blob_from_stream, mock_blob_service_init, mock_aad):
+        responses.add_callback(
+            responses.POST, "https://ingest-somecluster.kusto.windows.net/v1/rest/mgmt", callback=request_callback, content_type="application/json"
+        )
+
+        def upload(data, progress_hook, **kwargs):
+            compressed = data.read()
+            progress_hook(len(compressed) // 2, None)
+            progress_hook(len(compressed), None)
+
+        mock_upload_blob_from_stream.side_effect = upload
+
+        ingest_client = QueuedIngestClient("https://ingest-somecluster.kusto.windows.net")
+        ingest_client.set_upload_options(max_concurrency=8, block_size=1024 * 1024, max_single_put_size=2 * 1024 * 1024)
+        ingestion_properties = IngestionProperties(database="database", table="table", data_format=DataFormat.CSV)
+        result = ingest_client.ingest_from_stream(io.BytesIO(b"a,b,c\n" * 1000), ingestion_properties=ingestion_properties)
+
+        assert mock_upload_blob_from_stream.call_args.kwargs["max_concurrency"] == 8
+        assert mock_blob_service_init.call_args.kwargs["max_block_size"] == 1024 * 1024
+        assert mock_blob_service_init.call_args.kwargs["max_single_put_size"] == 2 * 1024 * 1024
+        assert 0 < result.upload_metrics.bytes_uploaded < 6000
+        assert result.upload_metrics.duration_seconds > 0
+        assert result.upload_metrics.throughput > 0
+
+        with pytest.raises(ValueError):
+            ingest_client.set_upload_options(max_concurrency=0)
+
+    @responses.activate
+    @patch("azure.kusto.data.security._AadHelper.acquire_authorization_header", return_value=None)
+    @patch("azure.storage.queue.QueueServiceClient.__init__", autospec=True, side_effect=QueueServiceClient.__init__)
+    @patch("azure.storage.blob.BlobServiceClient.__init__", autospec=True, side_effect=BlobServiceClient.__init__)
+    @patch("azure.storage.blob.BlobClient.upload_blob")
+    @patch("azure.storage.queue.QueueClient.send_message")
+    def test_storage_clients_are_reused(
+        self, mock_put_message_in_queue, mock_upload_blob_from_stream, mock_blob_service_init, mock_queue_service_init, mock_aad
+    ):
+        responses.add_callback(
+            responses.POST, "https://ingest-somecluster.kusto.windows.net/v1/rest/mgmt", callback=request_callback, content_type="application/json"
+        )
+        ingest_client = QueuedIngestClient("https://ingest-somecluster.kusto.windows.net")
+        ingestion_properties = IngestionProperties(database="database", table="table", data_format=DataFormat.CSV)
+
+        for _ in range(3):
+            ingest_client.ingest_from_stream(io.BytesIO(b"a,b,c\n"), ingestion_properties=ingestion_properties)
+        assert mock_blob_service_init.call_count == 1
+        assert mock_queue_service_init.call_count == 1
+        blob_transport = mock_blob_service_init.call_args.kwargs["transport"]
+        assert mock_queue_service_init.call_args.kwargs["transport"] is blob_transport
+
+        # Refreshing the ingestion resources replaces the SAS tokens, so the clients are rebuilt - over the same connection pool
+        resource_manager = ingest_client._resource_manager
+        resource_manager._ingest_client_resources.last_update -= timedelta(hours=2)
+        resource_manager.get_containers()
+        resource_manager._ingest_client_resources.refresh.result()
+        ingest_client.ingest_from_stream(io.BytesIO(b"a,b,c\n"), ingestion_properties=ingestion_properties)
+        assert mock_blob_service_init.call_count == 2
+        assert mock_queue_service_init.call_count == 2
+        assert mock_blob_service_init.call_args.kwargs["transport"] is blob_transport
+
+        # Changing the client options rebuilds the clients as well
+        ingest_client.set_proxy("https://my-proxy")
+        ingest_client.ingest_from_stream(io.BytesIO(b"a,b,c\n"), ingestion_properties=ingestion_properties)
+        assert mock_blob_service_init.call_count == 3
+        assert mock_blob_service_init.call_args.kwargs["proxies"] == {"http": "https://my-proxy", "https": "https://my-proxy"}
+
+    @responses.activate
+    @patch("azure.kusto.data.security._AadHelper.acquire_authorization_header", return_value=None)
+    @patch("azure.storage.blob.BlobClient.upload_blob")
+    @patch("azure.storage.queue.QueueClient.send_message")
+    def test_upload_fails_over_to_another_account(self, mock_put_message_in_queue, mock_upload_blob_from_stream, mock_aad):
+        responses.add_callback(
+            responses.POST, "https://ingest-somecluster.kusto.windows.net/v1/rest/mgmt", callback=request_callback, content_type="application/json"
+        )
+        uploaded = []
+
+        def upload(data, **kwargs):
+            # The first account fails midway through the upload
+            if not uploaded:
+                data.read(10)
+                uploaded.append(None)
+                raise ConnectionError("Connection reset")
+            uploaded.append(data.read())
+
+        mock_upload_blob_from_stream.side_effect = upload
+
+        ingest_client = QueuedIngestClient("https://ingest-somecluster.kusto.windows.net")
+        containers = [_ResourceUri.parse(TEMP_STORAGE_URL), _ResourceUri.parse(TEMP_STORAGE_URL.replace("storageaccount", "otheraccount"))]
+        ingest_client._resource_manager.get_containers = lambda: containers
+        ingestion_properties = IngestionProperties(database="database", table="table", data_format=DataFormat.CSV)
+
+        result = ingest_client.ingest_from_stream(io.BytesIO(b"a,b,c\n" * 100), ingestion_properties=ingestion_properties)
+
+        assert gzip.decompress(uploaded[1]) == b"a,b,c\n" * 100
+        assert result.status == IngestionStatus.QUEUED
+        # The account that failed is demoted, and is tried last by the next uploads
+        demoted = [account for account in ("storageaccount", "otheraccount") if ingest_client._container_selector._health[account].demoted_until > 0]
+        assert len(demoted) == 1
+        for _ in range(2):
+            assert ingest_client._container_selector.order(containers)[-1].storage_account_name == demoted[0]
+
+        # A stream that can't be rewound isn't uploaded again
+        uploaded.clear()
+        ingest_client._container_selector = _StorageAccountSelector()
+        unseekable = UnseekableStream(b"a,b,c\n")
+        with pytest.raises(KustoBlobError):
+            ingest_client._upload_blob(containers, StreamDescriptor(unseekable), ingestion_properties, unseekable)
+        assert len(uploaded) == 1
+
+        # Without any container there is nothing to upload to
+        ingest_client._resource_manager.get_containers = lambda: []
+        with pytest.raises(KustoClientError, match="temporary storage container"):
+            ingest_client.ingest_from_stream(io.BytesIO(b"a,b,c\n"), ingestion_properties=ingestion_properties)
+
+    @responses.activate
+    @patch("azure.kusto.data.security._AadHelper.acquire_authorization_header", return_value=None)
+    @patch("azure.storage.queue.QueueClient.send_message", autospec=True)
+    def test_ingest_from_blobs(self, mock_put_message_in_queue, mock_aad):
+        responses.add_callback(
+            responses.POST, "https://ingest-somecluster.kusto.windows.net/v1/rest/mgmt", callback=request_callback, content_type="application/json"
+        )
+        ingest_client = QueuedIngestClient("https://ingest-somecluster.kusto.windows.net")
+        queues = [_ResourceUri.parse(STORAGE_QUEUE_URL.replace("storageaccount", account)) for account in ("account1", "account2", "account3")]
+        ingest_client._resource_manager.get_ingestion_queues = lambda: queues
+        # The third account failed recently, so no message is sent to it
+        ingest_client._queue_selector.report_failure("account3")
+        ingestion_properties = IngestionProperties(database="database", table="table", data_format=DataFormat.CSV)
+        blobs = [BlobDescriptor("https://account.blob.core.windows.net/container/blob{}.csv.gz".format(i), i + 1) for i in range(20)]
+
+        results = ingest_client.ingest_from_blobs(blobs, ingestion_properties=ingestion_properties, max_concurrency=4)
+
+        assert [result.source_id for result in results] == [blob.source_id for blob in blobs]
+        assert all(result.status == IngestionStatus.QUEUED for result in results)
+        # The authorization context is fetched once
+        assert len([call for call in responses.calls if "identity token" in str(call.request.body)]) == 1
+
+        messages = {}
+        for call in mock_put_message_in_queue.call_args_list:
+            message = json.loads(call.kwargs["content"])
+            messages[message["BlobPath"]] = (call.args[0].account_name, message)
+        assert sorted(account for account, _ in messages.values()) == ["account1"] * 10 + ["account2"] * 10
+        for blob in blobs:
+            message = messages[blob.path][1]
+            assert message["RawDataSize"] == blob.size
+            assert message["Id"] == str(blob.source_id)
+            assert message["DatabaseName"] == "database"
+            assert message["AdditionalProperties"]["authorizationContext"] == "authorization_context"
+
+        # A failed message doesn't stop the others
+        def send_message(queue_client, content, **kwargs):
+            if json.loads(content)["BlobPath"].endswith("blob3.csv.gz"):
+                raise ConnectionError("Connection reset")
+
+        mock_put_message_in_queue.reset_mock()
+        mock_put_message_in_queue.side_effect = send_message
+        with pytest.raises(KustoBulkEnqueueError) as e:
+            ingest_client.ingest_from_blobs(blobs, ingestion_properties=ingestion_properties)
+        assert mock_put_message_in_queue.call_count == len(blobs)
+        assert e.value.failed_indices == [3]
+        assert isinstance(e.value.errors[3], ConnectionError)
+        assert e.value.results[3] is None
+        assert [result.source_id for index, result in enumerate(e.value.results) if index != 3] == [blob.source_id for blob in blobs if blob is not blobs[3]]
+
+        assert ingest_client.ingest_from_blobs([], ingestion_properties=ingestion_properties) == []
+        with pytest.raises(ValueError):
+            ingest_client.ingest_from_blobs(blobs, ingestion_properties=ingestion_properties, max_concurrency=0)
+
+        ingest_client._resource_manager.get_ingestion_queues = lambda: []
+        with pytest.raises(KustoClientError):
+            ingest_client.ingest_from_blobs(blobs, ingestion_properties=ingestion_properties)
+
     @responses.activate
     @patch("azure.kusto.ingest.managed_streaming_ingest_client.ManagedStreamingIngestClient.MAX_STREAMING_SIZE_IN_BYTES", new=0)
     def test_ingest_from_file_wrong_endpoint(self, ingest_client_class):
@@ -1,3 +1,4 @@
+import gzip
 import io
 import json
 import os
@@ -171,6 +172,36 @@ class TestManagedStreamingIngestClient:
 
         mock_upload_blob_from_stream.assert_called()
 
+    @responses.activate
+    @patch("azure.kusto.ingest.managed_streaming_ingest_client.ManagedStreamingIngestClient.MAX_STREAMING_SIZE_IN_BYTES", new=64 * 1024)
+    @patch("azure.kusto.data.security._AadHelper.acquire_authorization_header", return_value=None)
+    @patch("azure.storage.blob.BlobClient.upload_blob")
+    @patch("azure.storage.queue.QueueClient.send_message")
+    @patch("uuid.uuid4", return_value=MOCKED_UUID_4)
+    def test_fallback_big_stream_is_compressed_while_uploaded(self, mock_uuid, mock_put_message_in_queue, mock_upload_blob_from_stream, mock_aad):
+        responses.add_callback(
+            responses.POST, "https://ingest-somecluster.kusto.windows.net/v1/rest/mgmt", callback=queued_request_callback, content_type="application/json"
+        )
+
+        ingest_client = ManagedStreamingIngestClient.from_engine_kcsb("https://somecluster.kusto.windows.net")
+        ingestion_properties = IngestionProperties(database="database", table="table", data_format=DataFormat.CSV)
+
+        # Random data hardly compresses, so the compressed stream is over the streaming limit as well
+        initial_bytes = os.urandom(5 * 1024 * 1024)
+        stream = io.BytesIO(initial_bytes)
+
+        def check_bytes(data, **kwargs):
+            # Only the streaming limit was compressed before the upload started - the rest is compressed while it's read
+            assert stream.tell() < len(initial_bytes)
+            assert gzip.decompress(data.read()) == initial_bytes
+
+        mock_upload_blob_from_stream.side_effect = check_bytes
+
+        result = ingest_client.ingest_from_stream(stream, ingestion_properties=ingestion_properties)
+
+        assert result.status == IngestionStatus.QUEUED
+        mock_upload_blob_from_stream.assert_called_once()
+
     @responses.activate
     @patch("azure.kusto.data.security._AadHelper.acquire_authorization_header", return_value=None)
     @patch("azure.storage.blob.BlobClient.upload_blob")
@@ -0,0 +1,133 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+
+from azure.kusto.ingest._resource_manager import _ResourceManager
+
+RESOURCE_TYPES = ["SecuredReadyForAggregationQueue", "FailedIngestionsQueue", "SuccessfulIngestionsQueue", "TempStorage", "IngestionsStatusTable"]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.primary_results = [rows]
+
+
+def _result(query: str, generation: int) -> FakeResult:
+    if query == ".get kusto identity token":
+        return FakeResult([{"AuthorizationContext": "context{}".format(generation)}])
+    object_type = {"TempStorage": "blob", "IngestionsStatusTable": "table"}
+    return FakeResult(
+        [
+            {
+                "ResourceTypeName": resource_type,
+                "StorageRoot": "https://account{}.{}.core.windows.net/{}?sas".format(
+                    generation, object_type.get(resource_type, "queue"), resource_type.lower()
+                ),
+            }
+            for resource_type in RESOURCE_TYPES
+        ]
+    )
+
+
+class FakeKustoClient:
+    """Answers the resource manager's commands, once `gate` lets it."""
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.queries = []
+        self.generation = 0
+        self.error = None
+
+    def execute(self, database, query):
+        self.queries.append(query)
+        if self.gate:
+            self.gate()
+        if self.error:
+            raise self.error
+        return _result(query, self.generation)
+
+
+def test_first_fetch_runs_both_commands_at_once():
+    # Each command waits for the other one to start, so fetching them one after the other would time out
+    barrier = threading.Barrier(2, timeout=5)
+    resource_manager = _ResourceManager(FakeKustoClient(gate=barrier.wait))
+
+    assert resource_manager.get_containers()[0].storage_account_name == "account0"
+    assert resource_manager.get_authorization_context() == "context0"
+    assert resource_manager.resources_version == 1
+
+
+def test_stale_resources_are_served_during_a_single_refresh():
+    client = FakeKustoClient()
+    resource_manager = _ResourceManager(client)
+    resource_manager.get_containers()
+    resource_manager.get_authorization_context()
+    client.queries.clear()
+
+    release = threading.Event()
+    client.gate = lambda: release.wait(5)
+    client.generation = 1
+    resource_manager._ingest_client_resources.last_update -= timedelta(hours=2)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        containers = list(executor.map(lambda _: resource_manager.get_containers(), range(8)))
+    assert all(c[0].storage_account_name == "account0" for c in containers)
+    assert client.queries == [".get ingestion resources"]
+
+    release.set()
+    resource_manager._ingest_client_resources.refresh.result()
+    assert resource_manager.get_containers()[0].storage_account_name == "account1"
+    assert resource_manager.get_authorization_context() == "context0"
+    assert resource_manager.resources_version == 2
+
+
+def test_failed_refresh_keeps_serving_stale_resources(caplog):
+    client = FakeKustoClient()
+    resource_manager = _ResourceManager(client)
+    resource_manager.get_containers()
+
+    client.error = ValueError("Service unavailable")
+    resource_manager._ingest_client_resources.last_update -= timedelta(hours=2)
+    assert resource_manager.get_containers()[0].storage_account_name == "account0"
+    with pytest.raises(ValueError):
+        resource_manager._ingest_client_resources.refresh.result()
+    assert "Failed to fetch the ingestion resources from the service: Service unavailable" in caplog.text
+
+    # The next call tries again
+    client.error = None
+    client.generation = 1
+    resource_manager.get_containers()
+    resource_manager._ingest_client_resources.refresh.result()
+    assert resource_manager.get_containers()[0].storage_account_name == "account1"
+
+
+def test_resources_past_max_staleness_are_not_served():
+    client = FakeKustoClient()
+    resource_manager = _ResourceManager(client)
+    resource_manager.get_containers()
+
+    # Once the resources couldn't be refreshed for too long, their SAS tokens may have expired, so callers wait for a fresh fetch
+    client.error = ValueError("Service unavailable")
+    resource_manager._ingest_client_resources.last_update -= timedelta(hours=5)
+    with pytest.raises(ValueError):
+        resource_manager.get_containers()
+
+    client.error = None
+    client.generation = 1
+    assert resource_manager.get_containers()[0].storage_account_name == "account1"
+
+
+def test_failed_first_fetch_raises():
+    client = FakeKustoClient()
+    client.error = ValueError("Service unavailable")
+    resource_manager = _ResourceManager(client)
+
+    with pytest.raises(ValueError):
+        resource_manager.get_containers()
+
+    client.error = None
+    assert resource_manager.get_containers()[0].storage_account_name == "account0"
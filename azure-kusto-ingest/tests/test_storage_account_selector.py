@@ -0,0 +1,85 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License
+from azure.kusto.ingest._resource_manager import _ResourceUri
+from azure.kusto.ingest._storage_account_selector import _StorageAccountSelector
+
+ACCOUNTS = ["account1", "account2", "account3"]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _containers(accounts, per_account=1):
+    return [_ResourceUri(account, "blob", "core.windows.net", "container{}".format(i), "sas") for account in accounts for i in range(per_account)]
+
+
+def _order(selector, resources):
+    return [resource.storage_account_name for resource in selector.order(resources)]
+
+
+def test_one_resource_per_account_in_turn():
+    selector = _StorageAccountSelector()
+    containers = _containers(ACCOUNTS, per_account=3)
+
+    orders = [_order(selector, containers) for _ in range(3)]
+
+    assert all(sorted(order) == ACCOUNTS for order in orders)
+    assert sorted(order[0] for order in orders) == ACCOUNTS
+    assert selector.order([]) == []
+
+
+def test_failed_account_is_demoted_until_it_recovers():
+    clock = FakeClock()
+    selector = _StorageAccountSelector(demotion_seconds=10, max_demotion_seconds=40, clock=clock)
+    containers = _containers(ACCOUNTS)
+
+    selector.report_failure("account1")
+    assert all(_order(selector, containers)[-1] == "account1" for _ in range(3))
+
+    clock.now += 10
+    assert sorted(_order(selector, containers)[0] for _ in range(3)) == ACCOUNTS
+
+    # Consecutive failures double the demotion, up to the maximum
+    for _ in range(5):
+        selector.report_failure("account1")
+    clock.now += 39
+    assert _order(selector, containers)[-1] == "account1"
+    clock.now += 1
+    selector.report_success("account1", 0.1)
+    assert sorted(_order(selector, containers)[0] for _ in range(3)) == ACCOUNTS
+
+
+def test_all_accounts_demoted():
+    clock = FakeClock()
+    selector = _StorageAccountSelector(demotion_seconds=10, clock=clock)
+    containers = _containers(ACCOUNTS)
+
+    selector.report_failure("account2")
+    selector.report_failure("account2")
+    selector.report_failure("account1")
+    selector.report_failure("account3")
+    clock.now += 1
+
+    # The account that recovers first is tried first
+    assert _order(selector, containers)[-1] == "account2"
+    assert sorted(_order(selector, containers)) == ACCOUNTS
+
+
+def test_slow_account_is_tried_last():
+    clock = FakeClock()
+    selector = _StorageAccountSelector(slow_factor=3, latency_freshness_seconds=60, clock=clock)
+    containers = _containers(ACCOUNTS)
+
+    selector.report_success("account1", 0.1)
+    selector.report_success("account2", 1.0)
+    selector.report_success("account3", 0.2)
+    assert all(_order(selector, containers)[-1] == "account2" for _ in range(3))
+
+    # Once the latencies are stale, the slow account gets another chance
+    clock.now += 61
+    assert sorted(_order(selector, containers)[0] for _ in range(3)) == ACCOUNTS